@@ -1,3 +1,203 @@
-from django.contrib import admin
+import json
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .analytics import LETTERS
+from .models import School, StaffMember, Student, Teacher, TenantModel, Term, Course, MeetingSlot, Enrollment
+from . import schedule, services, tenancy
 
-# Register your models here.
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the table statistics for unfiltered changelists.
+
+    An exact COUNT(*) on a large InnoDB table is a full index scan; the
+    estimate from information_schema/pg_class is close enough for page links.
+    A changelist filtered only to the active school counts as unfiltered: its
+    estimate comes from the planner (EXPLAIN) over the school index, since
+    the table statistics cover every school in the database. Other filtered
+    querysets and small tables still get an exact count.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        estimate = None
+        if query is not None and not query.where:
+            estimate = _estimated_rows(queryset.db, queryset.model)
+        elif query is not None and _only_school_filter(queryset):
+            estimate = _explained_rows(queryset)
+        if estimate is not None and estimate >= self.exact_below:
+            return estimate
+        return super().count
+
+
+def _only_school_filter(queryset):
+    """Whether the queryset's only condition is the one TenantManager adds"""
+    school_id = tenancy.current_id()
+    if school_id is None or not issubclass(queryset.model, TenantModel):
+        return False
+    return queryset.query.where == queryset.model._base_manager.filter(school_id=school_id).query.where
+
+
+def _estimated_rows(alias, model):
+    connection = connections[alias]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = ("SELECT TABLE_ROWS FROM information_schema.TABLES "
+               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s")
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+def _explained_rows(queryset):
+    """The planner's row estimate for a queryset, without running it"""
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().values('pk').query.get_compiler(using=queryset.db).as_sql()
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0].lower() for column in cursor.description]
+            row = cursor.fetchone()
+        return int(row[columns.index('rows')]) if row and row[columns.index('rows')] is not None else None
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Student)
+class StudentAdmin(LargeTableAdmin):
+    list_display = ['student_id', 'user', 'phone_number', 'enrollment_date']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    # Prefix searches on unique (indexed) columns only
+    search_fields = ['^student_id', '^user__username']
+
+
+@admin.register(Teacher)
+class TeacherAdmin(LargeTableAdmin):
+    list_display = ['employee_id', 'user', 'subject_specialization', 'hire_date']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    search_fields = ['^employee_id', '^user__username']
+
+
+@admin.register(School)
+class SchoolAdmin(admin.ModelAdmin):
+    list_display = ['slug', 'name', 'domain', 'database', 'created_at']
+    search_fields = ['^slug', 'name']
+
+
+@admin.register(StaffMember)
+class StaffMemberAdmin(admin.ModelAdmin):
+    list_display = ['user', 'school', 'added_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    search_fields = ['^user__username']
+
+
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'start_date', 'end_date', 'is_current', 'closed']
+    list_filter = ['is_current', 'closed']
+
+
+class MeetingSlotInline(admin.TabularInline):
+    model = MeetingSlot
+    extra = 0
+
+
+@admin.register(Course)
+class CourseAdmin(LargeTableAdmin):
+    list_display = ['code', 'name', 'term', 'teacher', 'credits', 'enrolled_count', 'max_seats']
+    list_select_related = ['teacher__user', 'term']
+    list_filter = ['term']
+    autocomplete_fields = ['teacher']
+    readonly_fields = ['enrolled_count']
+    search_fields = ['^code']
+    inlines = [MeetingSlotInline]
+
+    def get_queryset(self, request):
+        # Staff manage every term, not only the current one
+        return Course.all_terms.all()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'max_seats' in form.changed_data:
+            # Raising capacity should hand the new seats to the waitlist
+            services.promote_waitlist(obj.pk)
+        if change and 'term' in form.changed_data:
+            services.sync_course_term(obj)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        schedule.refresh_mask(form.instance)
+
+
+class GradeActionForm(ActionForm):
+    grade = forms.ChoiceField(choices=[('', '---------')] + [(l, l) for l in LETTERS], required=False)
+
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(LargeTableAdmin):
+    list_display = ['id', 'student', 'course', 'term', 'grade', 'enrollment_date']
+    list_select_related = ['student__user', 'course', 'term']
+    list_filter = ['term', 'grade']
+    autocomplete_fields = ['student', 'course']
+    search_fields = ['^student__student_id', '^course__code']
+    action_form = GradeActionForm
+    actions = ['bulk_set_grade', 'bulk_unenroll']
+
+    @admin.action(description='Set grade on selected enrollments')
+    def bulk_set_grade(self, request, queryset):
+        grade = request.POST.get('grade')
+        if not grade:
+            self.message_user(request, 'Choose a grade first.', messages.WARNING)
+            return
+        updated = services.bulk_set_grade(queryset, grade)
+        self.message_user(request, f'Set grade {grade} on {updated} enrollments.')
+
+    @admin.action(description='Unenroll selected enrollments')
+    def bulk_unenroll(self, request, queryset):
+        removed = services.bulk_unenroll(queryset)
+        self.message_user(request, f'Removed {removed} enrollments.')
+
+    def get_queryset(self, request):
+        return Enrollment.all_terms.all()
+
+    def get_readonly_fields(self, request, obj=None):
+        # Moving an enrollment would bypass seat accounting; unenroll instead
+        return ['student', 'course', 'term'] if obj else ['term']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            services.admit(obj)
+        elif 'grade' in form.changed_data:
+            services.set_grade(obj, obj.grade)
+
+    def delete_model(self, request, obj):
+        services.unenroll(obj)
+
+    def delete_queryset(self, request, queryset):
+        services.bulk_unenroll(queryset)
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from functools import wraps
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'MAX_CONCURRENT': 8,      # handlers allowed to touch the database at once
+    'MAX_QUEUE': 64,          # requests allowed to wait for a slot
+    'MAX_QUEUED_PER_USER': 2, # keeps one client from filling the queue
+    'QUEUE_TIMEOUT': 2.0,     # seconds a request may wait before giving up
+    'RATE': 2.0,              # sustained requests per second per user
+    'BURST': 5,               # token bucket size per user
+}
+
+
+class TokenBucket:
+    """Per-key token bucket rate limiter"""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Consume a token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # A bucket idle long enough to refill carries no state worth keeping
+        refill = self.burst / self.rate
+        for key in [k for k, (_, last) in self._buckets.items() if now - last >= refill]:
+            del self._buckets[key]
+
+
+class AdmissionController:
+    """Bounded FIFO admission queue in front of a pool of concurrency slots"""
+
+    def __init__(self, max_concurrent, max_queue, max_queued_per_user, queue_timeout,
+                 rate, burst):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.limiter = TokenBucket(rate, burst)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = deque()
+        self._queued_per_user = {}
+        self._stats = {
+            'admitted': 0, 'rejected_rate': 0, 'rejected_full': 0, 'timed_out': 0,
+            'wait_total': 0.0, 'wait_max': 0.0, 'queue_depth_max': 0,
+        }
+
+    def acquire(self, user_key):
+        """Wait for a slot; returns None when admitted or a Retry-After in seconds"""
+        retry_after = self.limiter.take(user_key)
+        if retry_after:
+            with self._cond:
+                self._stats['rejected_rate'] += 1
+            return retry_after
+
+        started = time.monotonic()
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._admit(0.0)
+                return None
+
+            if (len(self._waiting) >= self.max_queue
+                    or self._queued_per_user.get(user_key, 0) >= self.max_queued_per_user):
+                self._stats['rejected_full'] += 1
+                return self.queue_timeout
+
+            ticket = object()
+            self._waiting.append(ticket)
+            self._queued_per_user[user_key] = self._queued_per_user.get(user_key, 0) + 1
+            self._stats['queue_depth_max'] = max(self._stats['queue_depth_max'], len(self._waiting))
+            try:
+                deadline = started + self.queue_timeout
+                while not (self._waiting[0] is ticket and self._active < self.max_concurrent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timed_out'] += 1
+                        return self.queue_timeout
+                    self._cond.wait(remaining)
+                self._admit(time.monotonic() - started)
+                return None
+            finally:
+                self._waiting.remove(ticket)
+                self._queued_per_user[user_key] -= 1
+                if not self._queued_per_user[user_key]:
+                    del self._queued_per_user[user_key]
+                # The head may have changed; let the next waiter re-check
+                self._cond.notify_all()
+
+    def _admit(self, waited):
+        self._active += 1
+        self._stats['admitted'] += 1
+        self._stats['wait_total'] += waited
+        self._stats['wait_max'] = max(self._stats['wait_max'], waited)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            data = dict(self._stats)
+            data['active'] = self._active
+            data['queue_depth'] = len(self._waiting)
+        data['wait_avg'] = data['wait_total'] / data['admitted'] if data['admitted'] else 0.0
+        return data
+
+
+def _build_controller():
+    conf = {**DEFAULTS, **getattr(settings, 'ADMISSION_CONTROL', {})}
+    return AdmissionController(
+        max_concurrent=conf['MAX_CONCURRENT'],
+        max_queue=conf['MAX_QUEUE'],
+        max_queued_per_user=conf['MAX_QUEUED_PER_USER'],
+        queue_timeout=conf['QUEUE_TIMEOUT'],
+        rate=conf['RATE'],
+        burst=conf['BURST'],
+    )
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = _build_controller()
+    return _controller
+
+
+def admission_controlled(view_func):
+    """Gate a write handler behind the shared admission queue.
+
+    Apply below @api_view/@permission_classes so it runs after authentication.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        controller = get_controller()
+        user_key = request.user.pk if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
+        retry_after = controller.acquire(user_key)
+        if retry_after is not None:
+            response = Response(
+                {'error': 'Too many requests, please retry shortly'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return response
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            controller.release()
+    return wrapper
@@ -0,0 +1,130 @@
+import itertools
+from dataclasses import dataclass
+import numpy as np
+from django.db.models import Q
+from .models import Course, Enrollment, EnrollmentArchive
+
+# Letter grade -> grade points on the usual 4.0 scale
+GRADE_POINTS = {
+    'A+': 4.0, 'A': 4.0, 'A-': 3.7,
+    'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+    'C+': 2.3, 'C': 2.0, 'C-': 1.7,
+    'D+': 1.3, 'D': 1.0, 'D-': 0.7,
+    'F': 0.0,
+}
+LETTERS = list(GRADE_POINTS)
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+@dataclass
+class GradeTable:
+    """Column arrays of graded enrollments; rows with unknown grades are dropped"""
+    student_ids: np.ndarray
+    course_ids: np.ndarray
+    teacher_ids: np.ndarray
+    letters: np.ndarray   # index into LETTERS
+    points: np.ndarray
+    credits: np.ndarray
+
+    def __len__(self):
+        return len(self.letters)
+
+
+def load_grades(enrollments=None, archived=None):
+    """Bulk-load graded enrollments into NumPy arrays.
+
+    Enrollment rows are streamed as flat values_list tuples; credits and
+    teachers of the courses they reference come from a second query over
+    Course and are joined by a sorted-array lookup rather than in SQL.
+    `archived` is an optional EnrollmentArchive queryset read the same way;
+    with no arguments both tables are loaded.
+    """
+    if enrollments is None and archived is None:
+        enrollments, archived = Enrollment.all_terms.all(), EnrollmentArchive.objects.all()
+    sources = [qs.exclude(grade__isnull=True).exclude(grade='').order_by()
+               for qs in (enrollments, archived) if qs is not None]
+    rows = itertools.chain.from_iterable(
+        qs.values_list('student_id', 'course_id', 'grade').iterator(chunk_size=10000)
+        for qs in sources
+    )
+    student_ids, course_ids, grades = [], [], []
+    for student_id, course_id, grade in rows:
+        student_ids.append(student_id)
+        course_ids.append(course_id)
+        grades.append(grade)
+
+    student_ids = np.array(student_ids, dtype=np.int64)
+    course_ids = np.array(course_ids, dtype=np.int64)
+    grades = np.char.upper(np.char.strip(np.array(grades, dtype='U2')))
+
+    # Map each distinct label once, then broadcast back over all rows
+    labels, inverse = np.unique(grades, return_inverse=True)
+    label_letter = np.array([LETTERS.index(l) if l in GRADE_POINTS else -1 for l in labels],
+                            dtype=np.int64)
+    letters = label_letter[inverse] if len(labels) else np.empty(0, dtype=np.int64)
+    known = letters >= 0
+
+    student_ids, course_ids, letters = student_ids[known], course_ids[known], letters[known]
+    points = np.array(list(GRADE_POINTS.values()))[letters]
+
+    # Only the courses the rows reference, matched by a subquery per source
+    referenced = Q()
+    for qs in sources:
+        referenced |= Q(id__in=qs.values('course_id'))
+    course_rows = np.array(list(Course.all_terms.filter(referenced).order_by('id')
+                                .values_list('id', 'credits', 'teacher_id')),
+                           dtype=np.int64).reshape(-1, 3)
+    index = np.searchsorted(course_rows[:, 0], course_ids)
+
+    return GradeTable(
+        student_ids=student_ids,
+        course_ids=course_ids,
+        teacher_ids=course_rows[index, 2],
+        letters=letters,
+        points=points,
+        credits=course_rows[index, 1],
+    )
+
+
+def student_totals(table):
+    """Per-student sums: (student_ids, graded_credits, quality_points) arrays"""
+    ids, group = np.unique(table.student_ids, return_inverse=True)
+    credits = np.bincount(group, weights=table.credits, minlength=len(ids))
+    weighted = np.bincount(group, weights=table.points * table.credits, minlength=len(ids))
+    return ids, credits, weighted
+
+
+def student_gpa(table):
+    """Credit-weighted GPA per student: {student_id: (gpa, credits)}"""
+    ids, credits, weighted = student_totals(table)
+    gpa = np.divide(weighted, credits, out=np.zeros(len(ids)), where=credits > 0)
+    return {int(i): (round(float(g), 2), int(c)) for i, g, c in zip(ids, gpa, credits)}
+
+
+def histogram(table, by='course'):
+    """Letter-grade counts per course or teacher: {id: {letter: count}}"""
+    keys = table.course_ids if by == 'course' else table.teacher_ids
+    ids, group = np.unique(keys, return_inverse=True)
+    counts = np.bincount(group * len(LETTERS) + table.letters,
+                         minlength=len(ids) * len(LETTERS)).reshape(len(ids), len(LETTERS))
+    return {int(i): dict(zip(LETTERS, row.tolist())) for i, row in zip(ids, counts)}
+
+
+def summarize(points, percentiles=DEFAULT_PERCENTILES):
+    """Count, mean and percentiles of an array of grade points"""
+    if not len(points):
+        return {'count': 0, 'average': None, 'percentiles': {}}
+    values = np.percentile(points, percentiles)
+    return {
+        'count': int(len(points)),
+        'average': round(float(points.mean()), 2),
+        'percentiles': {str(p): round(float(v), 2) for p, v in zip(percentiles, values)},
+    }
+
+
+def group_report(table, by='course'):
+    """Histogram plus summary statistics for one course or teacher table"""
+    return {
+        'histogram': next(iter(histogram(table, by).values()), dict.fromkeys(LETTERS, 0)),
+        **summarize(table.points),
+    }
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SchoolappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schoolApp'
+
+    def ready(self):
+        from . import autocomplete, changefeed, tasks  # noqa: F401 (tasks registers job handlers)
+        changefeed.connect()
+        autocomplete.connect()
+        autocomplete.warm_in_background()
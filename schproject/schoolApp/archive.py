@@ -0,0 +1,64 @@
+import time
+from collections import Counter
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from .models import Course, Enrollment, EnrollmentArchive, Term, WaitlistEntry
+from . import tenancy
+
+ARCHIVED_FIELDS = ('id', 'student_id', 'course_id', 'term_id', 'enrollment_date', 'grade')
+
+
+class TermNotClosed(Exception):
+    pass
+
+
+def archive_term(term, batch_size=1000, pause=0.05):
+    """Move a closed term's enrollments into EnrollmentArchive.
+
+    Each batch is copied and deleted in one short transaction, so readers see
+    a row in exactly one of the two tables. Roster rows go with their
+    enrollments (cascade) and archived enrollments stop holding seats, so
+    enrolled_count drops in the same transaction; transcript summaries are
+    unchanged since they count both tables. Safe to rerun after an interruption. Returns the
+    number of enrollments moved.
+    """
+    if not term.closed or term.is_current:
+        raise TermNotClosed(f'Term {term.code} must be closed and not current before archiving')
+
+    WaitlistEntry.objects.filter(course__term=term).delete()
+    moved = 0
+    while True:
+        with tenancy.atomic():
+            rows = list(Enrollment.all_terms.select_for_update()
+                        .filter(term=term).order_by('id')
+                        .values_list(*ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                break
+            EnrollmentArchive.objects.bulk_create(
+                [EnrollmentArchive(**dict(zip(ARCHIVED_FIELDS, row))) for row in rows],
+                ignore_conflicts=True,  # rows copied by an interrupted earlier run
+            )
+            Enrollment.all_terms.filter(id__in=[row[0] for row in rows]).delete()
+            _release_seats(Counter(row[2] for row in rows))
+        moved += len(rows)
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def _release_seats(per_course):
+    """Lower enrolled_count by the archived enrollments of each course, in one
+    UPDATE; a count already below that drops to zero (the column is unsigned
+    on MySQL, so it is never allowed to go negative first)"""
+    whens = []
+    for course_id, n in per_course.items():
+        whens += [When(id=course_id, enrolled_count__gte=n, then=F('enrolled_count') - n),
+                  When(id=course_id, then=Value(0))]
+    Course.all_terms.filter(id__in=per_course).update(
+        enrolled_count=Case(*whens, default=F('enrolled_count'), output_field=PositiveIntegerField()))
+
+
+def archive_closed_terms(batch_size=1000, pause=0.05):
+    """Archive every closed, non-current term that still has hot enrollments"""
+    terms = Term.objects.filter(closed=True, is_current=False,
+                                id__in=Enrollment.all_terms.values('term_id'))
+    return {term.code: archive_term(term, batch_size, pause) for term in terms}
@@ -0,0 +1,267 @@
+import atexit
+import contextvars
+import glob
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from . import tenancy
+from .background import Flusher
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BATCH_SIZE': 500,       # flush once this many entries are journaled
+    'FLUSH_SECONDS': 5,      # or when the oldest unflushed entry is this old
+    'SPOOL_DIR': os.path.join(tempfile.gettempdir(), 'schoolapp-audit'),
+    'FSYNC': True,           # fsync the journal on every append
+}
+
+_request = contextvars.ContextVar('audit_request', default=None)
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+def actor_id():
+    """User behind the current request; DRF copies the user it authenticates
+    onto the Django request, so this sees token users too"""
+    request = _request.get()
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Journal:
+    """Append-only spool of audit entries for one process.
+
+    Entries are appended as JSON lines (and fsynced) when their transaction
+    commits, so a crash can lose none that were acknowledged. A flush seals
+    the current file and inserts it in batches; the file is deleted only
+    after the insert succeeds. Sealed files left by a dead process are
+    adopted by the next flush on the same host. Every entry carries a UUID
+    and inserts ignore duplicates, so replaying a half-flushed file is safe.
+    """
+
+    def __init__(self, spool_dir, fsync=True):
+        self.spool_dir = spool_dir
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._seq = 0
+        self.count = 0
+        self.oldest = None
+
+    def _prefix(self, pid=None):
+        return os.path.join(self.spool_dir, f'audit-{socket.gethostname()}-{pid or os.getpid()}')
+
+    def _open(self):
+        if self._file is not None and self._pid == os.getpid():
+            return self._file
+        # First use, or a forked worker that must not share its parent's file
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._pid = os.getpid()
+        self._file = open(f'{self._prefix()}.jsonl', 'a', encoding='utf-8')
+        self.count, self.oldest = 0, None
+        return self._file
+
+    def append(self, entries):
+        lines = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)
+        with self._lock:
+            f = self._open()
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self.count += len(entries)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+        return self.count
+
+    def due(self, conf):
+        oldest = self.oldest
+        return self.count >= conf['BATCH_SIZE'] or (
+            oldest is not None and time.monotonic() - oldest >= conf['FLUSH_SECONDS'])
+
+    def _seal(self):
+        """Close the live file under a sealed name; nothing to do if it is empty"""
+        with self._lock:
+            if self._file is None or self._pid != os.getpid() or not self.count:
+                return
+            self._file.close()
+            self._seq += 1
+            os.replace(f'{self._prefix()}.jsonl', f'{self._prefix()}.{time.time_ns()}-{self._seq}.sealed')
+            self._file = None
+            self.count, self.oldest = 0, None
+
+    def _adopt_orphans(self):
+        """Take over files of processes on this host that are no longer running"""
+        mine = self._prefix()
+        host_prefix = os.path.join(self.spool_dir, f'audit-{socket.gethostname()}-')
+        for path in glob.glob(f'{host_prefix}*'):
+            pid = path[len(host_prefix):].split('.', 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+            self._seq += 1
+            try:
+                os.replace(path, f'{mine}.{time.time_ns()}-{self._seq}.sealed')
+            except FileNotFoundError:
+                pass  # another process adopted it first
+
+    def flush(self, batch_size=500):
+        """Insert every sealed file of this process; returns entries written"""
+        with self._flush_lock:
+            self._seal()
+            self._adopt_orphans()
+            written = 0
+            for path in sorted(glob.glob(f'{self._prefix()}.*.sealed')):
+                written += _insert(_read(path), batch_size)
+                os.remove(path)
+            return written
+
+
+def _read(path):
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-append; its caller never returned
+                logger.warning('Skipping unreadable audit line in %s', path)
+    return entries
+
+
+def _insert(entries, batch_size):
+    from .models import AuditEntry
+    by_db = {}
+    for entry in entries:
+        entry = dict(entry)
+        by_db.setdefault(entry.pop('db'), []).append(AuditEntry(
+            uuid=uuid.UUID(entry.pop('uuid')), occurred_at=parse_datetime(entry.pop('occurred_at')), **entry))
+    for db, rows in by_db.items():
+        AuditEntry.objects.using(db).bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return len(entries)
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                conf = _conf()
+                _journal = Journal(conf['SPOOL_DIR'], conf['FSYNC'])
+                atexit.register(_flush_at_exit)
+    return _journal
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush audit entries at exit; they stay in the journal')
+
+
+def record(action, enrollment_id, student_id, course_id, changes=None):
+    """Audit one grade or enrollment change.
+
+    The entry is journaled when the current transaction commits (and
+    dropped if it rolls back); inserting it into AuditEntry happens later,
+    in a batch.
+    """
+    record_many([(action, enrollment_id, student_id, course_id, changes)])
+
+
+def record_many(rows):
+    """record() for many (action, enrollment_id, student_id, course_id, changes) rows"""
+    if not rows or not _conf()['ENABLED']:
+        return
+    now = timezone.now().isoformat()
+    actor, school_id, db = actor_id(), tenancy.current_id(), tenancy.db()
+    entries = [
+        {'uuid': str(uuid.uuid4()), 'db': db, 'school_id': school_id, 'occurred_at': now,
+         'actor_id': actor, 'action': action, 'enrollment_id': enrollment_id,
+         'student_id': student_id, 'course_id': course_id, 'changes': changes or {}}
+        for action, enrollment_id, student_id, course_id, changes in rows
+    ]
+    tenancy.on_commit(lambda: get_journal().append(entries))
+
+
+def flush():
+    """Insert journaled entries now; returns the number written"""
+    return get_journal().flush(_conf()['BATCH_SIZE'])
+
+
+# Entries stay in the journal if a background flush fails; the next one retries them
+_flusher = Flusher('audit-flush', flush)
+
+
+def history(student_id=None, course_id=None, enrollment_id=None, action=None, since=None, before=None,
+            limit=50):
+    """Audit entries newest first for a student, course or enrollment.
+
+    Pending entries are flushed first so callers see their own changes.
+    Entries are ordered by id, which follows flush order; `before` is the
+    last id of the previous page and `since` a lower bound on occurred_at.
+    """
+    from .models import AuditEntry
+    if get_journal().count:
+        flush()
+    entries = AuditEntry.objects.all()
+    if tenancy.current_id() is not None:
+        entries = entries.filter(school_id=tenancy.current_id())
+    if student_id is not None:
+        entries = entries.filter(student_id=student_id)
+    if course_id is not None:
+        entries = entries.filter(course_id=course_id)
+    if enrollment_id is not None:
+        entries = entries.filter(enrollment_id=enrollment_id)
+    if action:
+        entries = entries.filter(action=action)
+    if since is not None:
+        entries = entries.filter(occurred_at__gte=since)
+    if before:
+        entries = entries.filter(id__lt=before)
+    return entries.order_by('-id')[:limit]
+
+
+class AuditMiddleware:
+    """Remember the request for actor_id() and, once a batch is due, have
+    the journal flushed in the background"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if get_journal().due(_conf()):
+            _flusher.kick()
+        return response
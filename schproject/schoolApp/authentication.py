@@ -0,0 +1,122 @@
+import binascii
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .models import AuthToken
+from . import routing, tenancy
+
+DEFAULTS = {
+    'TTL_DAYS': 30,              # idle lifetime of a token
+    'RENEW_AFTER_SECONDS': 3600, # extend expiry at most this often (one UPDATE per interval)
+    'MAX_PER_USER': 10,          # oldest devices are signed out beyond this
+}
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_TOKEN', {})}
+
+
+def _ttl():
+    return timedelta(days=_conf()['TTL_DAYS'])
+
+
+DEVICE_REQUIRED = 'A device id is required: send "device" or an X-Device-Id header'
+
+
+def device_id(request):
+    """Stable id of the client installation, from the request body's "device"
+    or the X-Device-Id header; '' if the client sent none. User-Agents are
+    not used: every client built on the same HTTP stack sends the same one."""
+    data = getattr(request, 'data', {})
+    device = data.get('device') if hasattr(data, 'get') else None
+    device = device or request.META.get('HTTP_X_DEVICE_ID', '')
+    return str(device).strip()[:100]
+
+
+def issue_token(user, device=''):
+    """Create a fresh token, signing out any earlier token of the same device.
+
+    Every sign-in rotates the key. Tokens issued without a device id (e.g. by
+    staff creating an account) replace nothing.
+    """
+    now = timezone.now()
+    if device:
+        AuthToken.objects.filter(user=user, device=device).delete()
+    token = AuthToken.objects.create(
+        key=binascii.hexlify(os.urandom(20)).decode(),
+        user=user, device=device, last_used=now, expires_at=now + _ttl(),
+    )
+    routing.pin_token(token.key)
+    stale = list(AuthToken.objects.filter(user=user).order_by('-created')
+                 .values_list('pk', flat=True)[_conf()['MAX_PER_USER']:])
+    if stale:
+        AuthToken.objects.filter(pk__in=stale).delete()
+    return token
+
+
+def revoke_token(key):
+    """Delete one token; returns True if it existed"""
+    return AuthToken.objects.filter(pk=key).delete()[0] > 0
+
+
+def user_for_key(key):
+    """Authenticate a raw key outside DRF; returns the user or None"""
+    try:
+        user, _ = ExpiringTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user
+
+
+def purge_expired(batch_size=1000, pause=0.05):
+    """Delete expired tokens in small primary-key batches to keep locks short.
+
+    Yields the running total after each batch.
+    """
+    total = 0
+    while True:
+        keys = list(AuthToken.objects.filter(expires_at__lte=timezone.now())
+                    .values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return
+        total += AuthToken.objects.filter(pk__in=keys).delete()[0]
+        yield total
+        if pause:
+            time.sleep(pause)
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token auth against AuthToken with sliding expiry.
+
+    A lookup is one primary-key read joined to the user; the expiry is
+    pushed forward at most once per RENEW_AFTER_SECONDS. The user must
+    belong to the request's school (tenancy.is_member).
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        try:
+            token = AuthToken.objects.select_related('user').get(pk=key)
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        now = timezone.now()
+        if token.expires_at <= now:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if not tenancy.is_member(token.user):
+            # Schools sharing a database share users and tokens too
+            raise exceptions.AuthenticationFailed('Token is not valid for this school.')
+
+        renew_after = timedelta(seconds=_conf()['RENEW_AFTER_SECONDS'])
+        if token.last_used is None or now - token.last_used >= renew_after:
+            token.last_used = now
+            token.expires_at = now + _ttl()
+            AuthToken.objects.filter(pk=token.pk).update(last_used=now, expires_at=token.expires_at)
+        routing.stick_if_pinned(token.user)
+        return token.user, token
@@ -0,0 +1,302 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, close_old_connections
+from django.db.models.signals import post_delete, post_save
+from .models import Course, Student
+from . import tenancy
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WARM_ON_STARTUP': True,
+    'REFRESH_SECONDS': 300,   # rebuild after this long, to pick up other processes' writes
+    'MAX_KEYS': 500000,       # per index; beyond this lookups fall back to the database
+    'MAX_KEY_LENGTH': 40,
+    'MAX_LABEL_LENGTH': 80,
+    'LIMIT': 10,
+}
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'AUTOCOMPLETE', {})}
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs searched with bisect.
+
+    Every object is indexed under each of its terms (a course code and name,
+    a student number and full name) and each word of them, so "smi" finds
+    "John Smith" and "john sm" does too. A lookup is one bisect plus a scan
+    of the matching run, stopped at `limit` results.
+    """
+
+    def __init__(self, max_key_length=40):
+        self.max_key_length = max_key_length
+        self._keys = []
+        self._ids = []
+        self._labels = {}
+        self._object_keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _keys_for(self, terms):
+        keys = set()
+        for term in terms:
+            term = normalize(term)
+            if term:
+                keys.add(term[:self.max_key_length])
+                keys.update(word[:self.max_key_length] for word in term.split())
+        return keys
+
+    def _remove(self, object_id):
+        for key in self._object_keys.pop(object_id, ()):
+            i = bisect_left(self._keys, key)
+            while self._ids[i] != object_id:
+                i += 1
+            del self._keys[i], self._ids[i]
+        self._labels.pop(object_id, None)
+
+    def put(self, object_id, label, terms):
+        keys = self._keys_for(terms)
+        with self._lock:
+            self._remove(object_id)
+            for key in sorted(keys):
+                i = bisect_left(self._keys, key)
+                # Ties on key stay ordered by id, so _remove can find its entry
+                while i < len(self._keys) and self._keys[i] == key and self._ids[i] < object_id:
+                    i += 1
+                self._keys.insert(i, key)
+                self._ids.insert(i, object_id)
+            self._object_keys[object_id] = tuple(keys)
+            self._labels[object_id] = label
+
+    def remove(self, object_id):
+        with self._lock:
+            self._remove(object_id)
+
+    def load(self, rows):
+        """Replace the contents with (object_id, label, terms) rows"""
+        pairs, labels, object_keys = [], {}, {}
+        for object_id, label, terms in rows:
+            keys = self._keys_for(terms)
+            pairs.extend((key, object_id) for key in keys)
+            labels[object_id] = label
+            object_keys[object_id] = tuple(keys)
+        pairs.sort()
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._ids = [object_id for _, object_id in pairs]
+            self._labels, self._object_keys = labels, object_keys
+
+    def search(self, prefix, limit=10):
+        """[(id, label)] of objects with a key starting with prefix, in key order"""
+        prefix = normalize(prefix)[:self.max_key_length]
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            i = bisect_left(self._keys, prefix)
+            keys, ids, labels = self._keys, self._ids, self._labels
+            while i < len(keys) and len(results) < limit and keys[i].startswith(prefix):
+                object_id = ids[i]
+                if object_id not in seen:
+                    seen.add(object_id)
+                    results.append((object_id, labels[object_id]))
+                i += 1
+        return results
+
+
+# Per kind: the queryset to index and how to turn it into (id, label, terms)
+def _course_rows(queryset, limit=None):
+    rows = queryset.values_list('pk', 'code', 'name').order_by()
+    for pk, code, name in (rows[:limit] if limit else rows.iterator(chunk_size=5000)):
+        yield pk, f'{code} - {name}', (code, name)
+
+
+def _student_rows(queryset, limit=None):
+    rows = queryset.values_list('pk', 'student_id', 'user__first_name', 'user__last_name').order_by()
+    for pk, number, first, last in (rows[:limit] if limit else rows.iterator(chunk_size=5000)):
+        name = f'{first} {last}'.strip()
+        yield pk, f'{name} ({number})' if name else number, (number, name)
+
+
+KINDS = {
+    'course': (lambda: Course.objects.all(), _course_rows),
+    'student': (lambda: Student.objects.all(), _student_rows),
+}
+
+
+class _Entry:
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+
+# One index per (kind, school id)
+_entries = {}
+_entries_lock = threading.Lock()
+
+
+def _entry(kind):
+    key = (kind, tenancy.current_id())
+    with _entries_lock:
+        if key not in _entries:
+            _entries[key] = _Entry()
+        return _entries[key]
+
+
+def _truncate(rows, max_label_length):
+    for object_id, label, terms in rows:
+        yield object_id, label[:max_label_length], terms
+
+
+def build(kind):
+    """(Re)build one index from the database; returns it, or None when the
+    table is larger than MAX_KEYS allows"""
+    with _entry(kind).lock:
+        return _build(kind)
+
+
+def _build(kind):
+    conf = _conf()
+    entry = _entry(kind)
+    queryset, rows = KINDS[kind]
+    index = PrefixIndex(conf['MAX_KEY_LENGTH'])
+    index.load(_truncate(rows(queryset()), conf['MAX_LABEL_LENGTH']))
+    if len(index) > conf['MAX_KEYS']:
+        logger.warning('Autocomplete index %s has %s keys (MAX_KEYS %s); using the database',
+                       kind, len(index), conf['MAX_KEYS'])
+        index = None
+    entry.index, entry.built_at = index, time.monotonic()
+    return index
+
+
+def _rebuild_stale(kind, tenant):
+    with tenancy.use(tenant):
+        entry = _entry(kind)
+        if not entry.lock.acquire(blocking=False):
+            return  # another thread is already rebuilding
+        try:
+            _build(kind)
+        except DatabaseError:
+            logger.exception('Autocomplete index %s rebuild failed', kind)
+        finally:
+            entry.lock.release()
+            close_old_connections()
+
+
+def _index(kind):
+    """The kind's index, built on first use. A stale one keeps serving while
+    a background thread rebuilds it."""
+    entry = _entry(kind)
+    if not entry.built_at:
+        with entry.lock:
+            return entry.index if entry.built_at else _build(kind)
+    if time.monotonic() - entry.built_at > _conf()['REFRESH_SECONDS']:
+        entry.built_at = time.monotonic()  # one rebuild per interval, even if it fails
+        threading.Thread(target=_rebuild_stale, args=(kind, tenancy.current()), daemon=True).start()
+    return entry.index
+
+
+def complete(kind, prefix, limit=None):
+    """Up to limit (id, label) tuples for a course or student prefix"""
+    conf = _conf()
+    limit = limit or conf['LIMIT']
+    index = _index(kind)
+    if index is not None:
+        return index.search(prefix, limit)
+    if not normalize(prefix):
+        return []
+    queryset, rows = KINDS[kind]
+    return [(object_id, label) for object_id, label, _ in
+            _truncate(rows(queryset().search(prefix.strip()), limit), conf['MAX_LABEL_LENGTH'])]
+
+
+def warm():
+    """Build every school's indexes"""
+    try:
+        for school in tenancy.schools():
+            with tenancy.use(school):
+                for kind in KINDS:
+                    build(kind)
+    except DatabaseError:
+        # Not migrated yet; the first lookup builds it instead
+        logger.info('Autocomplete indexes not warmed', exc_info=True)
+
+
+def warm_in_background():
+    if not _conf()['WARM_ON_STARTUP']:
+        return
+
+    def run():
+        try:
+            warm()
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=run, name='autocomplete-warm', daemon=True).start()
+
+
+def refresh(kind, object_ids, school_id=None):
+    """Re-read objects into their school's index, if built (dropping ones that
+    no longer match), once the current transaction commits"""
+    if not object_ids:
+        return
+    tenant = tenancy.current() or (school_id and tenancy.registry.get(school_id=school_id))
+
+    def apply():
+        with tenancy.use(tenant):
+            _apply(kind, object_ids)
+
+    tenancy.on_commit(apply)
+
+
+def _apply(kind, object_ids):
+    entry = _entry(kind)
+    with entry.lock:
+        index = entry.index
+        if index is None:
+            return
+        queryset, rows = KINDS[kind]
+        found = set()
+        for object_id, label, terms in _truncate(rows(queryset().filter(pk__in=object_ids)),
+                                                 _conf()['MAX_LABEL_LENGTH']):
+            index.put(object_id, label, terms)
+            found.add(object_id)
+        for object_id in set(object_ids) - found:
+            index.remove(object_id)
+
+
+def _on_course_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh('course', [instance.pk], instance.school_id)
+
+
+def _on_student_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh('student', [instance.pk], instance.school_id)
+
+
+def _on_user_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for pk, school_id in Student.objects.filter(user=instance).values_list('pk', 'school_id'):
+            refresh('student', [pk], school_id)
+
+
+def connect():
+    post_save.connect(_on_course_change, sender=Course, dispatch_uid='autocomplete-course-save')
+    post_delete.connect(_on_course_change, sender=Course, dispatch_uid='autocomplete-course-delete')
+    post_save.connect(_on_student_change, sender=Student, dispatch_uid='autocomplete-student-save')
+    post_delete.connect(_on_student_change, sender=Student, dispatch_uid='autocomplete-student-delete')
+    post_save.connect(_on_user_save, sender=User, dispatch_uid='autocomplete-user-save')
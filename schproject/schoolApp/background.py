@@ -0,0 +1,46 @@
+import logging
+import os
+import threading
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Flusher:
+    """Runs a flush function on a daemon thread of its own.
+
+    Request middleware calls kick() once a batch is due and returns at once;
+    kicks that arrive while a flush is running coalesce into one more run.
+    The thread is started on first use in each process, so it survives
+    forking servers.
+    """
+
+    def __init__(self, name, flush):
+        self.name = name
+        self.flush = flush
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def kick(self):
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._wake = threading.Event()
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        wake = self._wake
+        while True:
+            wake.wait()
+            wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('%s failed', self.name)
+            finally:
+                close_old_connections()
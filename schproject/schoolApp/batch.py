@@ -0,0 +1,78 @@
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from .util import IDENTITY_MAP_ATTR, PROFILE_CACHE_ATTR, get_profile
+
+MAX_SUB_REQUESTS = 10
+API_PREFIX = '/api/'
+
+
+def _sub_request(parent, path, query, identity_map):
+    """A GET request for one sub-call carrying the parent's identity.
+
+    DRF honours _force_auth_user/_force_auth_token, so the token is checked
+    once for the whole batch rather than once per sub-call. Serializers of
+    every sub-call share `identity_map`, so an object repeated across them
+    is represented once.
+    """
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {**parent.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+                    'QUERY_STRING': query}
+    request.GET = QueryDict(query)
+    request.COOKIES = parent.COOKIES
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    setattr(request, PROFILE_CACHE_ATTR, getattr(parent._request, PROFILE_CACHE_ATTR))
+    setattr(request, IDENTITY_MAP_ATTR, identity_map)
+    return request
+
+
+def _discard(response):
+    """Release a response's file or iterator. response.close() would also
+    send request_finished, closing this request's database connection."""
+    for close in response._resource_closers:
+        close()
+    response._resource_closers.clear()
+
+
+def _error(path, code, message):
+    return {'path': path, 'status': code, 'body': {'error': message}}
+
+
+def run_batch(request, specs):
+    """Run GET sub-requests against schoolApp routes and collect their results"""
+    # Resolve the caller's role once; sub-requests inherit the cached profile
+    get_profile(request)
+
+    identity_map = {}
+    results = []
+    for spec in specs:
+        raw = spec.get('path', '') if isinstance(spec, dict) else str(spec)
+        path, _, query = raw.partition('?')
+        path = API_PREFIX + path.lstrip('/').removeprefix(API_PREFIX.strip('/') + '/')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            results.append(_error(raw, status.HTTP_404_NOT_FOUND, 'Not found'))
+            continue
+
+        # Async views (the push stream) would hand back a coroutine
+        if (not match.func.__module__.startswith('schoolApp.') or match.url_name == 'batch'
+                or iscoroutinefunction(match.func)):
+            results.append(_error(raw, status.HTTP_400_BAD_REQUEST, 'Route cannot be batched'))
+            continue
+
+        sub = _sub_request(request, path, query, identity_map)
+        sub.resolver_match = match
+        response = match.func(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            # File downloads and streams have no body to embed
+            _discard(response)
+            results.append(_error(raw, status.HTTP_400_BAD_REQUEST, 'Route cannot be batched'))
+            continue
+        results.append({'path': raw, 'status': response.status_code,
+                        'body': getattr(response, 'data', None)})
+    return results
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from .models import ChangeLogCounter, ChangeLogEntry, ChangeLogState, Course, Enrollment, Student, Teacher
+from . import tenancy
+
+TRACKED = {'course': Course, 'enrollment': Enrollment, 'student': Student, 'teacher': Teacher}
+MODEL_NAMES = {model: name for name, model in TRACKED.items()}
+
+PAGE_SIZE = 500
+SEQUENCE_BATCH = 1000
+
+
+def _scope(instance):
+    """(student_id, teacher_id) of the users allowed to see a change"""
+    if isinstance(instance, Enrollment):
+        if Enrollment.course.is_cached(instance):
+            return instance.student_id, instance.course.teacher_id
+        teacher_id = (Course.all_terms.filter(pk=instance.course_id)
+                      .values_list('teacher_id', flat=True).first())
+        return instance.student_id, teacher_id
+    if isinstance(instance, Student):
+        return instance.pk, None
+    return None, None
+
+
+def record(instance, action):
+    student_id, teacher_id = _scope(instance)
+    ChangeLogEntry.objects.create(
+        model=MODEL_NAMES[type(instance)], object_id=instance.pk, action=action,
+        school_id=instance.school_id, student_id=student_id, teacher_id=teacher_id,
+    )
+
+
+def record_bulk(instances, action):
+    """One INSERT for changes made with queryset.update(), which sends no signals"""
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(model=MODEL_NAMES[type(obj)], object_id=obj.pk, action=action,
+                       school_id=obj.school_id, student_id=student_id, teacher_id=teacher_id)
+        for obj in instances
+        for student_id, teacher_id in [_scope(obj)]
+    ], batch_size=1000)
+
+
+def _on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record(instance, ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED)
+
+
+def _on_delete(sender, instance, **kwargs):
+    record(instance, ChangeLogEntry.DELETED)
+
+
+def connect():
+    for model in TRACKED.values():
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'changefeed-save-{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'changefeed-delete-{model.__name__}')
+
+
+def sequence():
+    """Number the committed entries of the active database that have no seq yet.
+
+    Writers insert entries without one; numbering them here, in a short
+    transaction of its own that only ever sees committed rows, makes seq
+    follow commit order, so a slow writer can never commit below a cursor a
+    client has already synced past. Readers call this before reading.
+    """
+    using = tenancy.db()
+    pending = ChangeLogEntry.objects.using(using).filter(seq__isnull=True)
+    while pending.exists():
+        with transaction.atomic(using=using):
+            counter, _ = ChangeLogCounter.objects.using(using).select_for_update().get_or_create(pk=1)
+            # Re-read under the lock: a concurrent call may have numbered them
+            entries = list(pending.order_by('id')[:SEQUENCE_BATCH])
+            for entry in entries:
+                counter.last_seq += 1
+                entry.seq = counter.last_seq
+            ChangeLogEntry.objects.using(using).bulk_update(entries, ['seq'])
+            counter.save(update_fields=['last_seq'])
+
+
+def compacted_through():
+    state = ChangeLogState.objects.filter(pk=1).values_list('compacted_through', flat=True).first()
+    return state or 0
+
+
+def _visible(user, profile):
+    school = Q(school_id=tenancy.current_id()) if tenancy.current_id() is not None else Q()
+    if user.is_staff or user.is_superuser:
+        return school
+    public = Q(student_id__isnull=True, teacher_id__isnull=True)
+    if isinstance(profile, Student):
+        return school & (public | Q(student_id=profile.pk))
+    if isinstance(profile, Teacher):
+        return school & (public | Q(teacher_id=profile.pk))
+    return school & public
+
+
+def latest_seq():
+    """Highest seq of the active school's entries"""
+    sequence()
+    entries = ChangeLogEntry.objects.all()
+    if tenancy.current_id() is not None:
+        entries = entries.filter(school_id=tenancy.current_id())
+    return entries.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def changes_since(user, profile, since, limit=PAGE_SIZE):
+    """Latest change per object after `since` that this caller may see.
+
+    Returns (entries, next_seq, has_more); entries are ChangeLogEntry rows
+    with superseded changes to the same object dropped.
+    """
+    sequence()
+    rows = list(
+        ChangeLogEntry.objects.filter(_visible(user, profile), seq__gt=since)
+        .order_by('seq')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        latest.pop((row.model, row.object_id), None)
+        latest[(row.model, row.object_id)] = row
+    next_seq = rows[-1].seq if rows else since
+    return list(latest.values()), next_seq, has_more
+
+
+def compact(older_than_days=30, batch_size=5000):
+    """Delete entries older than the retention window in short batches.
+
+    The highest deleted seq is stored as a watermark; clients whose cursor
+    falls below it must do a full refresh. Returns the number deleted.
+    """
+    sequence()
+    deleted = 0
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    expired = ChangeLogEntry.objects.filter(created_at__lt=cutoff, seq__isnull=False).order_by('seq').values_list('seq', flat=True)
+    while True:
+        chunk = list(expired[:batch_size])
+        if not chunk:
+            break
+        with transaction.atomic():
+            deleted += ChangeLogEntry.objects.filter(seq__in=chunk).delete()[0]
+            state, _ = ChangeLogState.objects.select_for_update().get_or_create(pk=1)
+            state.compacted_through = max(state.compacted_through, chunk[-1])
+            state.save(update_fields=['compacted_through'])
+    return deleted
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from functools import wraps
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+CACHE_ALIAS = 'idempotency'
+LOCK_TIMEOUT = 60  # seconds a first attempt may take before a retry can run it again
+MAX_KEY_LENGTH = 255
+# Outcomes that depend on the moment (timeouts, conflicts, locks, admission
+# control shedding load) rather than on the request; a retry may succeed
+TRANSIENT_STATUSES = {408, 409, 423, 425, 429}
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path} {payload}'.encode()).hexdigest()
+
+
+def _scope(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"anon:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response({'error': f'{HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """Replay the stored response when a client retries with the same Idempotency-Key.
+
+    The first response per (caller, key) is cached for the store's TIMEOUT;
+    the bounded cache evicts old keys. Only final outcomes are stored: server
+    errors and TRANSIENT_STATUSES (such as a 429 from @admission_controlled)
+    are not, so a retry runs the view again. Apply below
+    @api_view/@permission_classes.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_func(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} is too long'}, status=status.HTTP_400_BAD_REQUEST)
+
+        store = caches[CACHE_ALIAS]
+        cache_key = 'idem:' + hashlib.sha256(f'{_scope(request)}:{key}'.encode()).hexdigest()
+        fingerprint = _fingerprint(request)
+
+        stored = store.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+        if not store.add(cache_key + ':lock', True, LOCK_TIMEOUT):
+            return Response({'error': 'A request with this Idempotency-Key is in progress'},
+                            status=status.HTTP_409_CONFLICT)
+
+        try:
+            # The first attempt may have finished between the read and the lock
+            stored = store.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            response = view_func(request, *args, **kwargs)
+            if response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES:
+                store.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                })
+            return response
+        finally:
+            store.delete(cache_key + ':lock')
+    return wrapper
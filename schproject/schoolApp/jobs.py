@@ -0,0 +1,228 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from django.db import DatabaseError, close_old_connections, connection, connections, router, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.utils import timezone
+from .models import Job, TaskLock
+from . import tenancy
+
+logger = logging.getLogger(__name__)
+
+# A worker refreshes its running job's heartbeat this often. Running jobs
+# without a heartbeat for STALE_AFTER seconds are assumed to belong to a dead
+# worker and become claimable again.
+HEARTBEAT_SECONDS = 30
+STALE_AFTER = 5 * 60
+
+_registry = {}
+
+
+class Task:
+    """A registered background function; call .enqueue() to schedule it"""
+
+    def __init__(self, func, name, priority, max_attempts, concurrency):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, priority=None, delay=0, **kwargs):
+        """Insert a job row; it becomes visible to workers when the caller's transaction commits.
+        The job runs with the caller's school active.
+
+        Jobs live in 'default'. A school on another database can't insert
+        one in the same transaction as its own writes, so inside a
+        transaction there the insert waits for that commit (and is dropped
+        on rollback); the returned Job has no id until then.
+        """
+        job = Job(
+            task=self.name, args=list(args), kwargs=kwargs,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            school_id=tenancy.current_id(),
+        )
+        school_db = tenancy.db()
+        if school_db != router.db_for_write(Job) and connections[school_db].in_atomic_block:
+            tenancy.on_commit(job.save)
+        else:
+            job.save()
+        return job
+
+
+def task(name=None, priority=0, max_attempts=3, concurrency=None):
+    """Register a function as a background task.
+
+    concurrency caps how many jobs of this task may run at once across all
+    workers sharing the database.
+    """
+    def register(func):
+        t = Task(func, name or func.__name__, priority, max_attempts, concurrency)
+        _registry[t.name] = t
+        return t
+    return register
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def _saturated(name):
+    """Whether a concurrency-limited task already has its cap of running jobs.
+
+    Must be called inside the claiming transaction: the task's TaskLock row
+    stays locked until it commits, so workers claiming the same task count
+    and claim one at a time. The running rows are read with a locking read
+    too, which sees the latest committed state even where the transaction's
+    snapshot is older (MySQL's REPEATABLE READ).
+    """
+    t = _registry.get(name)
+    if t is None or not t.concurrency:
+        return False
+    TaskLock.objects.select_for_update().get_or_create(task=name)
+    running = Job.objects.select_for_update().filter(status=Job.RUNNING, task=name)
+    return len(running.values_list('id', flat=True)) >= t.concurrency
+
+
+def claim(worker):
+    """Atomically take the next runnable job, or None"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_AFTER)
+    with transaction.atomic():
+        # Jobs claimed before heartbeats existed only have started_at
+        abandoned = Job.objects.filter(status=Job.RUNNING).filter(
+            Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True, started_at__lt=stale)
+        )
+        # A job whose attempts keep killing their worker must not retry forever
+        abandoned.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, finished_at=now, worker='',
+            last_error='The worker stopped sending heartbeats during the last attempt')
+        abandoned.update(status=Job.QUEUED, worker='')
+
+        saturated = set()
+        while True:
+            job = (Job.objects.select_for_update(skip_locked=True)
+                   .filter(status=Job.QUEUED, run_after__lte=now)
+                   .exclude(task__in=saturated)
+                   .order_by('-priority', 'run_after', 'id')
+                   .first())
+            if job is None:
+                return None
+            if not _saturated(job.task):
+                break
+            saturated.add(job.task)
+        job.status = Job.RUNNING
+        job.started_at = job.heartbeat_at = now
+        job.worker = worker
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'worker', 'attempts'])
+    return job
+
+
+def _heartbeat(job, stop):
+    """Refresh a running job's heartbeat until stop is set, on its own connection"""
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker) \
+                    .update(heartbeat_at=timezone.now())
+            except DatabaseError:
+                logger.warning('Heartbeat of job %s failed', job.id, exc_info=True)
+    finally:
+        connection.close()
+
+
+def run(job):
+    """Execute a claimed job and record the outcome, retrying with backoff"""
+    t = _registry.get(job.task)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job, stop), name=f'job-{job.id}-heartbeat', daemon=True)
+    beat.start()
+    try:
+        if t is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        with tenancy.use(job.school_id):
+            result = t.func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        logger.warning('Job %s (%s) attempt %s failed', job.id, job.task, job.attempts)
+    else:
+        job.status = Job.DONE
+        job.result = result if isinstance(result, (dict, list, int, float, str, type(None))) else str(result)
+        job.finished_at = timezone.now()
+    finally:
+        stop.set()
+        beat.join()
+    # A job reclaimed from this worker (it missed heartbeats) belongs to
+    # whoever claimed it next; its outcome here is dropped
+    if not Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+            status=job.status, run_after=job.run_after, finished_at=job.finished_at,
+            result=job.result, last_error=job.last_error):
+        logger.warning('Job %s (%s) was reclaimed while running; outcome dropped', job.id, job.task)
+    return job
+
+
+def work(threads=1, once=False, idle_sleep=1.0, stop=None):
+    """Run jobs on `threads` worker threads until stopped (or the queue drains if once)"""
+    stop = stop or threading.Event()
+    base = f'{socket.gethostname()}:{os.getpid()}'
+
+    def loop(n):
+        name = f'{base}:{n}'
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim(name)
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(idle_sleep)
+                    continue
+                run(job)
+        finally:
+            close_old_connections()
+
+    workers = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(threads)]
+    for w in workers:
+        w.start()
+    try:
+        for w in workers:
+            while w.is_alive():
+                w.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+def stats(window=timedelta(minutes=5), school_id=None):
+    """Queue depth per status, queue latency and throughput over the last
+    window, for one school's jobs if school_id is given"""
+    since = timezone.now() - window
+    jobs = Job.objects.filter(school_id=school_id) if school_id is not None else Job.objects.all()
+    counts = dict(jobs.values_list('status').annotate(n=Count('id')).order_by())
+    recent = jobs.filter(status=Job.DONE, finished_at__gte=since)
+    wait = ExpressionWrapper(F('started_at') - F('run_after'), output_field=DurationField())
+    latency = recent.aggregate(avg=Avg(wait))['avg']
+    finished = recent.count()
+    return {
+        'queued': counts.get(Job.QUEUED, 0),
+        'running': counts.get(Job.RUNNING, 0),
+        'done': counts.get(Job.DONE, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'ready': jobs.filter(status=Job.QUEUED, run_after__lte=timezone.now()).count(),
+        'queue_latency_avg': latency.total_seconds() if latency is not None else None,
+        'throughput_per_min': round(finished / (window.total_seconds() / 60), 2),
+    }
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from schoolApp import archive
+from schoolApp.models import Term
+
+
+class Command(BaseCommand):
+    help = 'Move enrollments of closed terms into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', help='Code of one closed term (default: every closed term)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['term']:
+            try:
+                term = Term.objects.get(code=options['term'])
+                moved = {term.code: archive.archive_term(term, options['batch_size'], options['pause'])}
+            except Term.DoesNotExist:
+                raise CommandError(f"No term {options['term']!r}")
+            except archive.TermNotClosed as e:
+                raise CommandError(str(e))
+        else:
+            moved = archive.archive_closed_terms(options['batch_size'], options['pause'])
+        for code, count in moved.items():
+            self.stdout.write(f'{code}: {count} enrollments archived')
+        self.stdout.write(self.style.SUCCESS(f'Archived {sum(moved.values())} enrollments'))
@@ -0,0 +1,43 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from schoolApp import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "students also took" course neighbours from the enrollment history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int)
+        parser.add_argument('--min-shared', type=int)
+        parser.add_argument('--synthetic', type=int, metavar='ENROLLMENTS',
+                            help='Time the computation on this many random enrollments instead; '
+                                 'nothing is written')
+        parser.add_argument('--courses', type=int, default=5000, help='Course count for --synthetic')
+        parser.add_argument('--per-student', type=int, default=10, help='Courses per student for --synthetic')
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            return self.benchmark(options)
+        started = time.perf_counter()
+        rows = recommendations.rebuild(options['top_k'], options['min_shared'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} course neighbours in {time.perf_counter() - started:.1f}s'))
+
+    def benchmark(self, options):
+        conf = recommendations._conf()
+        total, courses = options['synthetic'], options['courses']
+        rng = np.random.default_rng(0)
+        # Zipf-ish popularity so some courses are far larger than others
+        popularity = 1 / np.arange(1, courses + 1) ** 0.8
+        pairs = np.column_stack([
+            np.arange(total, dtype=np.int64) // options['per_student'],
+            rng.choice(courses, size=total, p=popularity / popularity.sum()).astype(np.int64),
+        ])
+        started = time.perf_counter()
+        course_ids, *_ = recommendations.similar_courses(
+            pairs, None, options['top_k'] or conf['TOP_K'],
+            conf['MIN_SHARED'] if options['min_shared'] is None else options['min_shared'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} enrollments, {courses} courses: {len(course_ids)} neighbours '
+            f'in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from schoolApp import changefeed
+
+
+class Command(BaseCommand):
+    help = 'Delete change-log entries older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Retention window in days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = changefeed.compact(options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} entries; clients behind seq {changefeed.compacted_through()} must resync'
+        ))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.contrib.auth.models import User
+from schoolApp.models import School, StaffMember
+from schoolApp import tenancy
+
+
+class Command(BaseCommand):
+    help = 'Register a school, migrating its database first when it is not the default one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug')
+        parser.add_argument('name')
+        parser.add_argument('--domain', help='Host name that selects this school')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='DATABASES alias for its rows')
+        parser.add_argument('--staff', action='append', default=[], metavar='USERNAME',
+                            help='Existing user in that database to make a staff member; repeatable')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        if database not in settings.DATABASES:
+            raise CommandError(f'Unknown database alias {database!r}')
+        if School.objects.using(DEFAULT_DB_ALIAS).filter(slug=options['slug']).exists():
+            raise CommandError(f'School {options["slug"]!r} already exists')
+
+        if database != DEFAULT_DB_ALIAS:
+            call_command('migrate', database=database, verbosity=0)
+        school = School.objects.using(DEFAULT_DB_ALIAS).create(
+            slug=options['slug'], name=options['name'], domain=options['domain'] or None, database=database)
+        if database != DEFAULT_DB_ALIAS:
+            # Copy of the registry row for the foreign keys in that database
+            school.save(using=database)
+        tenancy.registry.invalidate()
+        with tenancy.use(school):
+            for username in options['staff']:
+                user = User.objects.filter(username=username).first()
+                if user is None:
+                    raise CommandError(f'No user {username!r} in {database}')
+                StaffMember.objects.create(user=user)
+        self.stdout.write(self.style.SUCCESS(f'Created school {school.slug} (id {school.id}) on {database}'))
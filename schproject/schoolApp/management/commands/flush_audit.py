@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from schoolApp import audit
+
+
+class Command(BaseCommand):
+    help = 'Insert journaled audit entries now, adopting journals of crashed processes on this host'
+
+    def handle(self, *args, **options):
+        written = audit.flush()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} audit entries'))
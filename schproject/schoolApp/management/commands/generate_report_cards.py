@@ -0,0 +1,40 @@
+from contextlib import ExitStack
+from django.core.management.base import BaseCommand, CommandError
+from schoolApp import reportcards, tenancy
+from schoolApp.models import Term
+
+
+class Command(BaseCommand):
+    help = 'Render a PDF report card (or transcript) per student into a zip file or directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?',
+                            help='A .zip path or a directory (default: a new zip under OUTPUT_DIR)')
+        parser.add_argument('--term', help='Term code (default: the current term)')
+        parser.add_argument('--transcripts', action='store_true',
+                            help='Full transcripts over every term instead of one term\'s report cards')
+        parser.add_argument('--school', help='School slug (default: DEFAULT_SCHOOL)')
+        parser.add_argument('--student', type=int, action='append', dest='student_ids', metavar='ID',
+                            help='Only this student id; repeatable')
+        parser.add_argument('--workers', type=int, help='Render processes (default: one per CPU)')
+        parser.add_argument('--chunk-size', type=int, help='Students loaded per round of queries')
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            # use() resolves the school on entry, so enter it inside the try
+            try:
+                stack.enter_context(tenancy.use(options['school'] or tenancy.default_id()))
+            except tenancy.UnknownSchool as e:
+                raise CommandError(str(e))
+            if options['term'] and not Term.objects.filter(code=options['term']).exists():
+                raise CommandError(f"Unknown term {options['term']!r}")
+            output = options['output'] or reportcards.output_path(options['term'], options['transcripts'])
+            stats = reportcards.generate(output, options['term'], options['transcripts'],
+                                         options['student_ids'], options['workers'], options['chunk_size'])
+        self.stdout.write(
+            f"{stats['documents']} documents, {stats['pages']} pages, {stats['bytes'] / 1e6:.1f} MB "
+            f"in {stats['seconds']:.1f}s on {stats['workers']} workers")
+        self.stdout.write(
+            f"{stats['pages_per_sec']} pages/sec, {stats['pages_per_sec_per_worker']} pages/sec per worker, "
+            f"{stats['pages_per_cpu_second']} pages per CPU-second of rendering")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {stats['output']}"))
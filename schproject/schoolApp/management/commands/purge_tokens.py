@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from schoolApp.authentication import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired API tokens in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        total = 0
+        for total in purge_expired(options['batch_size'], options['pause']):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Deleted {total} tokens so far')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired tokens'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from schoolApp import prereqs
+
+
+class Command(BaseCommand):
+    help = 'Recompute the transitive prerequisite closure from the direct prerequisite edges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            rows = prereqs.rebuild(batch_size=options['batch_size'])
+        except prereqs.PrerequisiteCycle as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} prerequisite closure rows'))
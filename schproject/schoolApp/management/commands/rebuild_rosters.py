@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from schoolApp import rosters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-course enrolled counts and roster rows, or check them with --check'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report differences from the source tables')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Limit the rebuild to this course id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            problems = rosters.check()
+            for name, rows in problems.items():
+                self.stdout.write(f"{name}: {len(rows)}")
+                for row in rows[:20]:
+                    self.stdout.write(f"  {row}")
+            if any(problems.values()):
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS('Rosters are consistent'))
+            return
+
+        written = rosters.rebuild(options['courses'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} roster entries'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from schoolApp import transcripts
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-student transcript summaries (GPA, credits, course count)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='students',
+                            help='Limit the rebuild to this student id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuilt = transcripts.rebuild(options['students'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} transcript summaries'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from schoolApp import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (start one process per host, or several)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Worker threads in this process')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is ready')
+        parser.add_argument('--stats', action='store_true', help='Print queue statistics and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in jobs.stats().items():
+                self.stdout.write(f'{key}: {value}')
+            return
+        jobs.work(threads=options['threads'], once=options['once'])
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from schoolApp import schedule
+from schoolApp.models import Course, Student
+
+
+class Command(BaseCommand):
+    help = 'List students whose current enrollments meet at the same time'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = schedule.conflict_report()
+        elapsed = time.perf_counter() - started
+
+        codes = dict(Course.all_terms.filter(
+            id__in={c for pairs in report.values() for pair in pairs for c in pair}
+        ).values_list('id', 'code'))
+        numbers = dict(Student.objects.filter(id__in=report).values_list('id', 'student_id'))
+        for student_id, pairs in sorted(report.items()):
+            shown = ', '.join(f'{codes[a]}/{codes[b]}' for a, b in pairs)
+            self.stdout.write(f'{numbers.get(student_id, student_id)}: {shown}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(report)} students with conflicts (computed in {elapsed:.2f}s)'
+        ))
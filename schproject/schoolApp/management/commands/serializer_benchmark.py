@@ -0,0 +1,69 @@
+import datetime
+import time
+import tracemalloc
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from schoolApp.models import Course, Enrollment, Student, Teacher
+from schoolApp.serializers import EnrollmentSerializer
+
+
+def build_roster(students, courses):
+    """Unsaved enrollments of one teacher's roster, related objects pre-attached
+    as select_related would leave them"""
+    now = timezone.now()
+    teacher_user = User(id=1, username='teacher', email='t@example.com', date_joined=now)
+    teacher = Teacher(id=1, user=teacher_user, employee_id='E1', subject_specialization='math', hire_date=now)
+    course_objs = [Course(id=c, name=f'Course {c}', code=f'C{c}', teacher=teacher, credits=3,
+                          enrolled_count=students, created_at=now) for c in range(1, courses + 1)]
+    enrollments = []
+    for s in range(1, students + 1):
+        user = User(id=s + 1, username=f'student{s}', email=f's{s}@example.com', date_joined=now)
+        student = Student(id=s, user=user, student_id=f'S{s}', date_of_birth=datetime.date(2000, 1, 1),
+                          enrollment_date=now)
+        for course in course_objs:
+            enrollments.append(Enrollment(id=len(enrollments) + 1, student=student, course=course,
+                                          enrollment_date=now, grade='A'))
+    return enrollments
+
+
+class Command(BaseCommand):
+    help = 'Compare serializing a large roster with and without the nested-object identity map'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300)
+        parser.add_argument('--courses', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, enrollments, identity_map, repeat):
+        best = None
+        for _ in range(repeat):
+            context = {} if identity_map else {'identity_map': False}
+            started = time.perf_counter()
+            EnrollmentSerializer(enrollments, many=True, context=context).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        context = {} if identity_map else {'identity_map': False}
+        tracemalloc.start()
+        data = EnrollmentSerializer(enrollments, many=True, context=context).data
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return best, peak, data
+
+    def handle(self, *args, **options):
+        enrollments = build_roster(options['students'], options['courses'])
+        self.stdout.write(f'{len(enrollments)} enrollments ({options["students"]} students x '
+                          f'{options["courses"]} courses), best of {options["repeat"]}')
+
+        plain_time, plain_peak, plain = self.measure(enrollments, False, options['repeat'])
+        mapped_time, mapped_peak, mapped = self.measure(enrollments, True, options['repeat'])
+        if plain != mapped:
+            self.stderr.write('Outputs differ')
+            return
+
+        self.stdout.write(f'without identity map: {plain_time * 1000:8.1f}ms  peak {plain_peak / 1024:8.0f}KiB')
+        self.stdout.write(f'with identity map:    {mapped_time * 1000:8.1f}ms  peak {mapped_peak / 1024:8.0f}KiB')
+        self.stdout.write(self.style.SUCCESS(
+            f'{plain_time / mapped_time:.1f}x faster, {1 - mapped_peak / plain_peak:.0%} less memory'
+        ))
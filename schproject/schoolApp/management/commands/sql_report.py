@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from schoolApp import sqllog
+from schoolApp.models import QueryFingerprint
+
+ORDERINGS = {'total': '-total_ms', 'max': '-max_ms', 'count': '-count'}
+
+
+class Command(BaseCommand):
+    help = 'Show the most expensive SQL fingerprints recorded by the slow-query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--order', choices=sorted(ORDERINGS), default='total')
+        parser.add_argument('--view', help='Only queries issued by this URL name')
+        parser.add_argument('--width', type=int, default=160, help='Truncate SQL to this many characters')
+        parser.add_argument('--reset', action='store_true', help='Delete all recorded statistics')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = QueryFingerprint.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} rows'))
+            return
+        sqllog.flush()  # this process's buffer, e.g. when run from a shell
+
+        rows = QueryFingerprint.objects.order_by(ORDERINGS[options['order']])
+        if options['view']:
+            rows = rows.filter(url_name=options['view'])
+        for row in rows[:options['top']]:
+            avg = row.total_ms / row.count if row.count else 0
+            self.stdout.write(
+                f"{row.fingerprint[:12]}  total {row.total_ms:10.1f}ms  count {row.count:8d}  "
+                f"avg {avg:8.2f}ms  max {row.max_ms:8.1f}ms  {row.url_name or '-'}  {row.caller or '-'}"
+            )
+            self.stdout.write(f"    {row.sql[:options['width']]}")
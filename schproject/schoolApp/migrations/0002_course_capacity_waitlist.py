@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_enrolled_count(apps, schema_editor):
+    Course = apps.get_model('schoolApp', 'Course')
+    Enrollment = apps.get_model('schoolApp', 'Enrollment')
+    db = schema_editor.connection.alias
+    counts = (Enrollment.objects.using(db).filter(course=OuterRef('pk'))
+              .values('course').annotate(n=Count('id')).values('n'))
+    Course.objects.using(db).update(enrolled_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='max_seats',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.student')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['course', 'created_at'], name='schoolApp_w_course__05b1b6_idx')],
+                'unique_together': {('student', 'course')},
+            },
+        ),
+        migrations.RunPython(backfill_enrolled_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_roster(apps, schema_editor):
+    Enrollment = apps.get_model('schoolApp', 'Enrollment')
+    RosterEntry = apps.get_model('schoolApp', 'RosterEntry')
+    db = schema_editor.connection.alias
+    enrollments = Enrollment.objects.using(db).select_related('student__user').iterator(chunk_size=1000)
+    RosterEntry.objects.using(db).bulk_create((
+        RosterEntry(
+            enrollment_id=e.id, course_id=e.course_id, student_id=e.student_id,
+            student_number=e.student.student_id, first_name=e.student.user.first_name,
+            last_name=e.student.user.last_name, email=e.student.user.email,
+            grade=e.grade, enrollment_date=e.enrollment_date,
+        ) for e in enrollments
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0002_course_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_number', models.CharField(max_length=20)),
+                ('first_name', models.CharField(blank=True, max_length=150)),
+                ('last_name', models.CharField(blank=True, max_length=150)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('grade', models.CharField(blank=True, max_length=2, null=True)),
+                ('enrollment_date', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.course')),
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='roster_entry', to='schoolApp.enrollment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.student')),
+            ],
+            options={
+                'ordering': ['last_name', 'first_name', 'id'],
+                'indexes': [models.Index(fields=['course', 'last_name', 'first_name'], name='schoolApp_r_course__254df1_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_roster, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0003_roster_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transcript', serialize=False, to='schoolApp.student')),
+                ('course_count', models.PositiveIntegerField(default=0)),
+                ('total_credits', models.PositiveIntegerField(default=0)),
+                ('graded_credits', models.PositiveIntegerField(default=0)),
+                ('quality_points', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0004_transcript_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compacted_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('C', 'Created'), ('U', 'Updated'), ('D', 'Deleted')], max_length=1)),
+                ('student_id', models.BigIntegerField(blank=True, null=True)),
+                ('teacher_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student_id', 'seq'], name='schoolApp_c_student_753415_idx'), models.Index(fields=['teacher_id', 'seq'], name='schoolApp_c_teacher_857d75_idx'), models.Index(fields=['created_at'], name='schoolApp_c_created_f0ecd0_idx')],
+            },
+        ),
+    ]
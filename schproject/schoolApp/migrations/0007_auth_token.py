@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:05
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_drf_tokens(apps, schema_editor):
+    # Existing clients keep their keys; they start a fresh idle window
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('schoolApp', 'AuthToken')
+    db = schema_editor.connection.alias
+    now = timezone.now()
+    expires_at = now + timedelta(days=getattr(settings, 'AUTH_TOKEN', {}).get('TTL_DAYS', 30))
+    AuthToken.objects.using(db).bulk_create((
+        AuthToken(key=t.key, user_id=t.user_id, last_used=now, expires_at=expires_at)
+        for t in Token.objects.using(db).iterator(chunk_size=1000)
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0006_job'),
+        ('authtoken', '0003_tokenproxy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('device', models.CharField(blank=True, max_length=100)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'device'], name='schoolApp_a_user_id_876eb6_idx')],
+            },
+        ),
+        migrations.RunPython(copy_drf_tokens, migrations.RunPython.noop),
+    ]
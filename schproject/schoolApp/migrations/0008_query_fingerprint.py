@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0007_auth_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('url_name', models.CharField(blank=True, max_length=100)),
+                ('caller', models.CharField(blank=True, max_length=200)),
+                ('sql', models.TextField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_ms'], name='schoolApp_q_total_m_f1aac2_idx')],
+                'unique_together': {('fingerprint', 'url_name', 'caller')},
+            },
+        ),
+    ]
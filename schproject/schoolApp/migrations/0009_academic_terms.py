@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0008_query_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Term',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('is_current', models.BooleanField(default=False)),
+                ('closed', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EnrollmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('enrollment_date', models.DateTimeField()),
+                ('grade', models.CharField(blank=True, max_length=2, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schoolApp.student')),
+                ('term', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='schoolApp.term')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='term',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='schoolApp.term'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='term',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='schoolApp.term'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['term', 'student'], name='schoolApp_e_term_id_fc2d2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollmentarchive',
+            index=models.Index(fields=['student', 'term'], name='schoolApp_e_student_c113cd_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0010_course_meetings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoursePrerequisite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_links', to='schoolApp.course')),
+                ('prerequisite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='required_for_links', to='schoolApp.course')),
+            ],
+            options={
+                'unique_together': {('course', 'prerequisite')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PrerequisiteClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schoolApp.course')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schoolApp.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'course'], name='schoolApp_p_ancesto_1cd2fb_idx')],
+                'unique_together': {('course', 'ancestor')},
+            },
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TENANT_MODELS = ('Student', 'Teacher', 'Course', 'Enrollment')
+
+
+def create_default_school(apps, schema_editor):
+    # The existing single-school data becomes the 'default' school
+    db = schema_editor.connection.alias
+    School = apps.get_model('schoolApp', 'School')
+    models_ = [apps.get_model('schoolApp', name) for name in TENANT_MODELS]
+    if db != 'default' and not any(m.objects.using(db).exists() for m in models_):
+        return
+    school, _ = School.objects.using(db).get_or_create(
+        slug='default', defaults={'name': 'Default school', 'database': db})
+    for model in models_:
+        model.objects.using(db).filter(school__isnull=True).update(school=school)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0012_course_neighbors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='School',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+                ('domain', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('database', models.CharField(default='default', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='code',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='student_id',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='teacher',
+            name='employee_id',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='schoolApp.school'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.RunPython(create_default_school, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='course',
+            name='school',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='school',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='school',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AlterField(
+            model_name='teacher',
+            name='school',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['school', 'term'], name='schoolApp_e_school__489e13_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='course',
+            constraint=models.UniqueConstraint(fields=('school', 'code'), name='unique_course_code_per_school'),
+        ),
+        migrations.AddConstraint(
+            model_name='student',
+            constraint=models.UniqueConstraint(fields=('school', 'student_id'), name='unique_student_id_per_school'),
+        ),
+        migrations.AddConstraint(
+            model_name='teacher',
+            constraint=models.UniqueConstraint(fields=('school', 'employee_id'), name='unique_employee_id_per_school'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0013_schools'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(unique=True)),
+                ('school_id', models.BigIntegerField(blank=True, null=True)),
+                ('occurred_at', models.DateTimeField()),
+                ('actor_id', models.IntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('enrolled', 'Enrolled'), ('unenrolled', 'Unenrolled'), ('grade', 'Grade changed')], max_length=20)),
+                ('enrollment_id', models.BigIntegerField()),
+                ('student_id', models.BigIntegerField()),
+                ('course_id', models.BigIntegerField()),
+                ('changes', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student_id', 'id'], name='schoolApp_a_student_6a5680_idx'), models.Index(fields=['course_id', 'id'], name='schoolApp_a_course__3af38e_idx'), models.Index(fields=['enrollment_id', 'id'], name='schoolApp_a_enrollm_cd73a8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_existing_staff(apps, schema_editor):
+    # Staff accounts predating per-school membership keep access to the school
+    # they could reach before: the default school, or the only school in a
+    # database of its own
+    db = schema_editor.connection.alias
+    School = apps.get_model('schoolApp', 'School')
+    StaffMember = apps.get_model('schoolApp', 'StaffMember')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    schools = School.objects.using(db).filter(database=db)
+    school = schools.filter(slug='default').first() or (schools.first() if schools.count() == 1 else None)
+    if school is None:
+        return
+    staff = (User.objects.using(db).filter(is_staff=True, student__isnull=True, teacher__isnull=True)
+             .values_list('id', flat=True))
+    StaffMember.objects.using(db).bulk_create([StaffMember(school=school, user_id=pk) for pk in staff])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0014_audit_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('school', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolApp.school')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='school_staff', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='staffmember',
+            constraint=models.UniqueConstraint(fields=('school', 'user'), name='unique_staff_member_per_school'),
+        ),
+        migrations.RunPython(add_existing_staff, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-19 19:43
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TRACKED = {'course': 'Course', 'enrollment': 'Enrollment', 'student': 'Student', 'teacher': 'Teacher'}
+
+
+def backfill_school(apps, schema_editor):
+    # Take the school from the row each entry describes; entries for rows
+    # since deleted predate multiple schools in practice and get the default
+    db = schema_editor.connection.alias
+    ChangeLogEntry = apps.get_model('schoolApp', 'ChangeLogEntry')
+    School = apps.get_model('schoolApp', 'School')
+    for name, model_name in TRACKED.items():
+        model = apps.get_model('schoolApp', model_name)
+        ChangeLogEntry.objects.using(db).filter(model=name, school_id__isnull=True).update(
+            school_id=Subquery(model.objects.using(db).filter(pk=OuterRef('object_id')).values('school_id')[:1]))
+    default = School.objects.using(db).filter(slug='default', database=db).values_list('id', flat=True).first()
+    if default is not None:
+        ChangeLogEntry.objects.using(db).filter(school_id__isnull=True).update(school_id=default)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0015_staff_member'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogentry',
+            name='school_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['school_id', 'seq'], name='schoolApp_c_school__9b851f_idx'),
+        ),
+        migrations.RunPython(backfill_school, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-19 21:10
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing(apps, schema_editor):
+    # Everything already in the log has committed: keep its numbering
+    db = schema_editor.connection.alias
+    ChangeLogEntry = apps.get_model('schoolApp', 'ChangeLogEntry')
+    ChangeLogCounter = apps.get_model('schoolApp', 'ChangeLogCounter')
+    ChangeLogEntry.objects.using(db).update(seq=F('id'))
+    last = ChangeLogEntry.objects.using(db).aggregate(last=Max('id'))['last'] or 0
+    ChangeLogCounter.objects.using(db).create(pk=1, last_seq=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0018_push_event'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name='changelogentry', name='schoolApp_c_school__9b851f_idx'),
+        migrations.RemoveIndex(model_name='changelogentry', name='schoolApp_c_student_753415_idx'),
+        migrations.RemoveIndex(model_name='changelogentry', name='schoolApp_c_teacher_857d75_idx'),
+        migrations.RenameField(model_name='changelogentry', old_name='seq', new_name='id'),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeLogCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['school_id', 'seq'], name='schoolApp_c_school__9b851f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['student_id', 'seq'], name='schoolApp_c_student_753415_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['teacher_id', 'seq'], name='schoolApp_c_teacher_857d75_idx'),
+        ),
+    ]
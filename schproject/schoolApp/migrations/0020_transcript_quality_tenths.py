@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-19 21:40
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def to_tenths(apps, schema_editor):
+    TranscriptSummary = apps.get_model('schoolApp', 'TranscriptSummary')
+    TranscriptSummary.objects.using(schema_editor.connection.alias).update(
+        quality_tenths=Round(F('quality_points') * 10))
+
+
+def to_points(apps, schema_editor):
+    TranscriptSummary = apps.get_model('schoolApp', 'TranscriptSummary')
+    TranscriptSummary.objects.using(schema_editor.connection.alias).update(
+        quality_points=F('quality_tenths') / 10.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolApp', '0019_change_log_commit_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcriptsummary',
+            name='quality_tenths',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(to_tenths, to_points),
+        migrations.RemoveField(
+            model_name='transcriptsummary',
+            name='quality_points',
+        ),
+    ]
@@ -1,46 +1,539 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from . import tenancy
 
-class Student(models.Model):
+# Query sets: the access paths the views use, so each one is a single joined
+# query. Methods taking a user accept a User or a user id and filter through
+# the join instead of fetching the profile first.
+
+class TenantManager(models.Manager):
+    """Limits rows to the active school (schoolApp.tenancy); unscoped when
+    none is active, e.g. in management commands"""
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        school_id = tenancy.current_id()
+        return queryset if school_id is None else queryset.filter(school_id=school_id)
+
+class TermScopedQuerySet(models.QuerySet):
+    def current_term(self):
+        """Rows of the current term, plus rows not assigned to any term.
+        The term is resolved in a subquery, so querysets built at import stay correct."""
+        return self.filter(Q(term__in=Term.objects.filter(is_current=True).values('id'))
+                           | Q(term__isnull=True))
+    
+    def in_term(self, term):
+        return self.filter(term=term)
+    
+    def open_terms(self):
+        """Rows whose term still accepts changes (e.g. late grades after a new term starts)"""
+        return self.filter(Q(term__isnull=True) | Q(term__closed=False))
+
+class CurrentTermManager(TenantManager):
+    """Default manager of term-partitioned models; use `all_terms` for history"""
+    def get_queryset(self):
+        return super().get_queryset().current_term()
+
+class StudentQuerySet(models.QuerySet):
+    def with_user(self):
+        return self.select_related('user')
+    
+    def for_user(self, user):
+        return self.filter(user=user)
+    
+    def search(self, query):
+        return self.filter(
+            Q(user__first_name__icontains=query) | Q(user__last_name__icontains=query)
+            | Q(student_id__icontains=query)
+        )
+
+class TeacherQuerySet(models.QuerySet):
+    def with_user(self):
+        return self.select_related('user')
+    
+    def for_user(self, user):
+        return self.filter(user=user)
+
+class CourseQuerySet(TermScopedQuerySet):
+    def with_teacher(self):
+        return self.select_related('teacher__user').prefetch_related('meetings')
+    
+    def taught_by(self, teacher):
+        return self.filter(teacher=teacher)
+    
+    def for_teacher(self, user):
+        return self.filter(teacher__user=user)
+    
+    def search(self, query):
+        return self.filter(Q(name__icontains=query) | Q(code__icontains=query))
+
+class EnrollmentQuerySet(TermScopedQuerySet):
+    def with_serialization_graph(self):
+        """Everything EnrollmentSerializer touches: one joined query plus one for meeting slots"""
+        return self.select_related('student__user', 'course__teacher__user').prefetch_related('course__meetings')
+    
+    def for_student(self, student):
+        return self.filter(student=student)
+    
+    def for_course(self, course):
+        return self.filter(course=course)
+    
+    def taught_by(self, teacher):
+        return self.filter(course__teacher=teacher)
+    
+    def for_teacher(self, user):
+        return self.filter(course__teacher__user=user)
+    
+    def roster(self, course):
+        return self.for_course(course).with_serialization_graph().order_by(
+            'student__user__last_name', 'student__user__first_name', 'id'
+        )
+    
+    def newest_first(self):
+        return self.order_by('-enrollment_date', '-id')
+
+class RosterEntryQuerySet(models.QuerySet):
+    def for_course(self, course):
+        return self.filter(course=course)
+    
+    def for_teacher(self, user):
+        return self.filter(course__teacher__user=user)
+
+class School(models.Model):
+    """A tenant. Lives in the default database; `database` names the
+    DATABASES alias holding the school's own rows (see schoolApp.tenancy)."""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, unique=True)
+    domain = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    database = models.CharField(max_length=50, default='default')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.slug
+
+class TenantModel(models.Model):
+    """Rows belonging to one school, filled in from the active school on save"""
+    school = models.ForeignKey(School, on_delete=models.PROTECT, related_name='+', editable=False)
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        if self.school_id is None:
+            self.school_id = tenancy.current_id() or tenancy.default_id()
+        super().save(*args, **kwargs)
+
+class Term(models.Model):
+    """An academic term. Courses and enrollments of the current term form the
+    hot working set; enrollments of closed terms are moved to EnrollmentArchive
+    by schoolApp.archive."""
+    name = models.CharField(max_length=50)
+    code = models.CharField(max_length=20, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    is_current = models.BooleanField(default=False)
+    closed = models.BooleanField(default=False)  # no more grade changes; ready to archive
+    
+    class Meta:
+        ordering = ['start_date']
+    
+    def __str__(self):
+        return self.code
+    
+    @classmethod
+    def current_id(cls):
+        return cls.objects.filter(is_current=True).values_list('id', flat=True).first()
+    
+    def save(self, *args, **kwargs):
+        # Only one term is current at a time
+        if self.is_current:
+            Term.objects.filter(is_current=True).exclude(pk=self.pk).update(is_current=False)
+        super().save(*args, **kwargs)
+
+class Student(TenantModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    student_id = models.CharField(max_length=20, unique=True)
+    student_id = models.CharField(max_length=20)
     phone_number = models.CharField(max_length=15, blank=True)
     date_of_birth = models.DateField()
     address = models.TextField(blank=True)
     enrollment_date = models.DateTimeField(auto_now_add=True)
     
+    objects = TenantManager.from_queryset(StudentQuerySet)()
+    
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['school', 'student_id'], name='unique_student_id_per_school')]
+    
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.student_id}"
 
-class Teacher(models.Model):
+class Teacher(TenantModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    employee_id = models.CharField(max_length=20, unique=True)
+    employee_id = models.CharField(max_length=20)
     phone_number = models.CharField(max_length=15, blank=True)
     subject_specialization = models.CharField(max_length=100)
     hire_date = models.DateTimeField(auto_now_add=True)
     
+    objects = TenantManager.from_queryset(TeacherQuerySet)()
+    
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['school', 'employee_id'], name='unique_employee_id_per_school')]
+    
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.subject_specialization}"
 
-class Course(models.Model):
+class StaffMember(TenantModel):
+    """Grants a user without a Student or Teacher profile (office staff,
+    administrators) access to a school; see tenancy.is_member"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='school_staff')
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = TenantManager()
+    
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['school', 'user'], name='unique_staff_member_per_school')]
+    
+    def __str__(self):
+        return f"{self.user_id} @ {self.school_id}"
+
+class Course(TenantModel):
     name = models.CharField(max_length=100)
-    code = models.CharField(max_length=10, unique=True)
+    code = models.CharField(max_length=10)
     description = models.TextField(blank=True)
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, blank=True, null=True)
     credits = models.IntegerField(default=3)
+    # Seat capacity; null means unlimited. enrolled_count is kept in step with
+    # Enrollment rows by schoolApp.services so capacity checks are one UPDATE.
+    max_seats = models.PositiveIntegerField(blank=True, null=True)
+    enrolled_count = models.PositiveIntegerField(default=0)
+    # Bitmask of the weekly grid covered by the course's MeetingSlots, kept by
+    # schoolApp.schedule so conflict checks are integer ANDs
+    schedule_bits = models.BinaryField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CurrentTermManager.from_queryset(CourseQuerySet)()
+    all_terms = TenantManager.from_queryset(CourseQuerySet)()
+    
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['school', 'code'], name='unique_course_code_per_school')]
+    
     def __str__(self):
         return f"{self.code} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.term_id is None:
+            self.term_id = Term.current_id()
+        super().save(*args, **kwargs)
 
-class Enrollment(models.Model):
+class CoursePrerequisite(models.Model):
+    """Direct prerequisite edge; maintain through schoolApp.prereqs so the closure stays in step"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='prerequisite_links')
+    prerequisite = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='required_for_links')
+    
+    class Meta:
+        unique_together = ('course', 'prerequisite')
+    
+    def __str__(self):
+        return f"{self.prerequisite_id} -> {self.course_id}"
+
+class PrerequisiteClosure(models.Model):
+    """Every course reachable through prerequisite edges (direct or not),
+    precomputed by schoolApp.prereqs so a check is one lookup"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    ancestor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    
+    class Meta:
+        unique_together = ('course', 'ancestor')
+        indexes = [models.Index(fields=['ancestor', 'course'])]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} ->* {self.course_id}"
+
+class CourseNeighbor(models.Model):
+    """Top-K "students also took" courses per course, rewritten in bulk by
+    schoolApp.recommendations"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbors')
+    rank = models.PositiveSmallIntegerField()  # 1 = most similar
+    neighbor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()  # cosine similarity of the two courses' student sets
+    shared_students = models.PositiveIntegerField()
+    
+    class Meta:
+        unique_together = ('course', 'rank')
+    
+    def __str__(self):
+        return f"{self.course_id} #{self.rank}: {self.neighbor_id} ({self.score:.3f})"
+
+class MeetingSlot(models.Model):
+    """One weekly meeting of a course"""
+    DAY_CHOICES = [(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+                   (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')]
+    
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='meetings')
+    day = models.PositiveSmallIntegerField(choices=DAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    
+    class Meta:
+        ordering = ['day', 'start_time']
+    
+    def __str__(self):
+        return f"{self.course_id} {self.get_day_display()} {self.start_time}-{self.end_time}"
+
+class Enrollment(TenantModel):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    # Copied from the course so term scoping needs no join
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, blank=True, null=True)
     enrollment_date = models.DateTimeField(auto_now_add=True)
     grade = models.CharField(max_length=2, blank=True, null=True)
     
+    objects = CurrentTermManager.from_queryset(EnrollmentQuerySet)()
+    all_terms = TenantManager.from_queryset(EnrollmentQuerySet)()
+    
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [models.Index(fields=['term', 'student']), models.Index(fields=['school', 'term'])]
     
     def __str__(self):
         return f"{self.student.user.username} - {self.course.code}"
+    
+    def save(self, *args, **kwargs):
+        # Term and school come from the course
+        if self._state.adding and (self.term_id is None or self.school_id is None):
+            term_id, school_id = (Course.all_terms.filter(pk=self.course_id)
+                                  .values_list('term_id', 'school_id').first() or (None, None))
+            self.term_id = self.term_id or term_id
+            self.school_id = self.school_id or school_id
+        super().save(*args, **kwargs)
+
+class EnrollmentArchive(models.Model):
+    """Enrollments of closed terms, moved out of Enrollment by schoolApp.archive.
+    Keeps the original enrollment id."""
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, blank=True, null=True)
+    enrollment_date = models.DateTimeField()
+    grade = models.CharField(max_length=2, blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['student', 'term'])]
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id} ({self.term_id})"
+
+class WaitlistEntry(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('student', 'course')
+        ordering = ['created_at', 'id']
+        indexes = [models.Index(fields=['course', 'created_at'])]
+    
+    def __str__(self):
+        return f"{self.student.student_id} - {self.course.code} (waitlist)"
+
+class RosterEntry(models.Model):
+    """Flattened copy of an enrollment with the student's display fields,
+    kept in step by schoolApp.rosters so rosters are read without joins"""
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, related_name='roster_entry')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    student_number = models.CharField(max_length=20)
+    first_name = models.CharField(max_length=150, blank=True)
+    last_name = models.CharField(max_length=150, blank=True)
+    email = models.EmailField(blank=True)
+    grade = models.CharField(max_length=2, blank=True, null=True)
+    enrollment_date = models.DateTimeField()
+    
+    objects = RosterEntryQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['last_name', 'first_name', 'id']
+        indexes = [models.Index(fields=['course', 'last_name', 'first_name'])]
+    
+    def __str__(self):
+        return f"{self.student_number} - {self.course_id}"
+
+class TranscriptSummary(models.Model):
+    """Running per-student totals maintained by schoolApp.transcripts"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='transcript')
+    course_count = models.PositiveIntegerField(default=0)
+    total_credits = models.PositiveIntegerField(default=0)
+    graded_credits = models.PositiveIntegerField(default=0)
+    # Sum of grade points x credits, in tenths of a point: kept as an integer
+    # so the running deltas add up exactly
+    quality_tenths = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def gpa(self):
+        if not self.graded_credits:
+            return None
+        return round(self.quality_tenths / (10 * self.graded_credits), 2)
+    
+    def __str__(self):
+        return f"{self.student_id} - GPA {self.gpa}"
+
+class ChangeLogEntry(models.Model):
+    """Append-only record of row changes, read by the /sync/ endpoint"""
+    CREATED = 'C'
+    UPDATED = 'U'
+    DELETED = 'D'
+    ACTION_CHOICES = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+    
+    # Position in the feed, given by changefeed.sequence() once the writing
+    # transaction has committed, so it follows commit order; null until then
+    seq = models.BigIntegerField(blank=True, null=True, unique=True)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES)
+    school_id = models.BigIntegerField(blank=True, null=True)
+    # Scoping columns: null means visible to every authenticated user of the school
+    student_id = models.BigIntegerField(blank=True, null=True)
+    teacher_id = models.BigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['school_id', 'seq']),
+            models.Index(fields=['student_id', 'seq']),
+            models.Index(fields=['teacher_id', 'seq']),
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.seq} {self.action} {self.model}:{self.object_id}"
+
+class ChangeLogState(models.Model):
+    """Single row remembering how far the change log has been compacted"""
+    compacted_through = models.BigIntegerField(default=0)
+
+class ChangeLogCounter(models.Model):
+    """Single row holding the last seq handed out by changefeed.sequence()"""
+    last_seq = models.BigIntegerField(default=0)
+
+class PushEvent(models.Model):
+    """An event published through schoolApp.push.ChangeLogBroker, read back
+    by every process to reach the streams connected to it"""
+    seq = models.BigAutoField(primary_key=True)
+    users = models.JSONField(default=list)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class Job(models.Model):
+    """A unit of background work, claimed and run by manage.py run_jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+    
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)  # higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # refreshed by the worker while running
+    finished_at = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    school = models.ForeignKey(School, on_delete=models.CASCADE, blank=True, null=True)  # active while it runs
+    result = models.JSONField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.id} {self.task} ({self.status})"
+
+class TaskLock(models.Model):
+    """One row per concurrency-limited task, locked while a worker counts
+    that task's running jobs and claims one"""
+    task = models.CharField(max_length=100, primary_key=True)
+    
+    def __str__(self):
+        return self.task
+
+class AuthToken(models.Model):
+    """API token for one device; expires unless used (see schoolApp.authentication)"""
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auth_tokens')
+    device = models.CharField(max_length=100, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['user', 'device'])]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.device or 'default'}"
+
+class QueryFingerprint(models.Model):
+    """Aggregated timings of one normalized SQL statement per view and call site,
+    flushed periodically by schoolApp.sqllog"""
+    fingerprint = models.CharField(max_length=32)
+    url_name = models.CharField(max_length=100, blank=True)
+    caller = models.CharField(max_length=200, blank=True)
+    sql = models.TextField()  # normalized statement
+    count = models.PositiveBigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    last_seen = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('fingerprint', 'url_name', 'caller')
+        indexes = [models.Index(fields=['-total_ms'])]
+    
+    def __str__(self):
+        return f"{self.fingerprint} {self.url_name} ({self.count})"
+
+class AuditEntry(models.Model):
+    """Append-only record of a grade or enrollment change, written in batches
+    by schoolApp.audit. Ids are plain columns so history outlives the rows."""
+    ENROLLED = 'enrolled'
+    UNENROLLED = 'unenrolled'
+    GRADE_CHANGED = 'grade'
+    ACTION_CHOICES = [(ENROLLED, 'Enrolled'), (UNENROLLED, 'Unenrolled'), (GRADE_CHANGED, 'Grade changed')]
+    
+    uuid = models.UUIDField(unique=True)  # makes replaying a journal idempotent
+    school_id = models.BigIntegerField(blank=True, null=True)
+    occurred_at = models.DateTimeField()
+    actor_id = models.IntegerField(blank=True, null=True)  # auth user; None for system changes
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    enrollment_id = models.BigIntegerField()
+    student_id = models.BigIntegerField()
+    course_id = models.BigIntegerField()
+    changes = models.JSONField(default=dict, blank=True)  # {field: [before, after]}
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'id']),
+            models.Index(fields=['course_id', 'id']),
+            models.Index(fields=['enrollment_id', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.occurred_at} {self.action} enrollment {self.enrollment_id}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Audit entries are append-only')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Audit entries are append-only')
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from django.db.models import Q
+from .models import Course, CoursePrerequisite, Enrollment, EnrollmentArchive, PrerequisiteClosure
+from . import tenancy
+
+
+class PrerequisiteCycle(ValueError):
+    pass
+
+
+def _passed(enrollments):
+    """Enrollments that count as completing the course"""
+    return enrollments.exclude(Q(grade__isnull=True) | Q(grade='') | Q(grade__iexact='F'))
+
+
+def unmet(student, course_id):
+    """Codes of the course's prerequisites (transitively) the student has not passed.
+
+    One query: the closure rows of the course minus the student's passed
+    courses in Enrollment and EnrollmentArchive, as subqueries.
+    """
+    passed = _passed(Enrollment.all_terms.filter(student=student)).values('course_id')
+    passed_archived = _passed(EnrollmentArchive.objects.filter(student=student)).values('course_id')
+    return list(PrerequisiteClosure.objects.filter(course_id=course_id)
+                .exclude(ancestor_id__in=passed).exclude(ancestor_id__in=passed_archived)
+                .order_by('ancestor__code').values_list('ancestor__code', flat=True))
+
+
+def unmet_many(student_ids, course_id):
+    """unmet() for many students at once in two queries; returns {student_id: [codes]}
+    for the students missing something"""
+    required = dict(PrerequisiteClosure.objects.filter(course_id=course_id)
+                    .values_list('ancestor_id', 'ancestor__code'))
+    if not required:
+        return {}
+    passed = set(
+        _passed(Enrollment.all_terms.filter(student_id__in=student_ids, course_id__in=required))
+        .values_list('student_id', 'course_id').order_by()
+        .union(_passed(EnrollmentArchive.objects.filter(student_id__in=student_ids, course_id__in=required))
+               .values_list('student_id', 'course_id').order_by())
+    )
+    missing = {}
+    for student_id in student_ids:
+        codes = sorted(code for ancestor, code in required.items() if (student_id, ancestor) not in passed)
+        if codes:
+            missing[student_id] = codes
+    return missing
+
+
+def _lock(*course_ids):
+    list(Course.all_terms.select_for_update().filter(pk__in=course_ids).values_list('pk'))
+
+
+def add(course_id, prerequisite_id):
+    """Add an edge and the closure rows it creates.
+
+    Every course that (transitively) requires course_id gains prerequisite_id
+    and everything prerequisite_id requires. Refuses edges that would close a
+    cycle.
+    """
+    with tenancy.atomic():
+        _lock(course_id, prerequisite_id)
+        if course_id == prerequisite_id or PrerequisiteClosure.objects.filter(
+                course_id=prerequisite_id, ancestor_id=course_id).exists():
+            raise PrerequisiteCycle(f'Course {prerequisite_id} already requires course {course_id}')
+        _, created = CoursePrerequisite.objects.get_or_create(course_id=course_id, prerequisite_id=prerequisite_id)
+        if not created:
+            return 0
+        below = [course_id] + list(PrerequisiteClosure.objects.filter(ancestor_id=course_id)
+                                   .values_list('course_id', flat=True))
+        above = [prerequisite_id] + list(PrerequisiteClosure.objects.filter(course_id=prerequisite_id)
+                                         .values_list('ancestor_id', flat=True))
+        rows = PrerequisiteClosure.objects.bulk_create(
+            [PrerequisiteClosure(course_id=c, ancestor_id=a) for c in below for a in above],
+            ignore_conflicts=True, batch_size=1000,
+        )
+    return len(rows)
+
+
+def remove(course_id, prerequisite_id):
+    """Drop an edge and recompute the closure of the courses that depended on it"""
+    with tenancy.atomic():
+        _lock(course_id, prerequisite_id)
+        if not CoursePrerequisite.objects.filter(course_id=course_id, prerequisite_id=prerequisite_id).delete()[0]:
+            return
+        affected = [course_id] + list(PrerequisiteClosure.objects.filter(ancestor_id=course_id)
+                                      .values_list('course_id', flat=True))
+        _write_closure(affected, _edges())
+
+
+def set_prerequisites(course_id, prerequisite_ids):
+    """Make the course's direct prerequisites exactly prerequisite_ids"""
+    wanted = set(prerequisite_ids)
+    with tenancy.atomic():
+        current = set(CoursePrerequisite.objects.filter(course_id=course_id)
+                      .values_list('prerequisite_id', flat=True))
+        for prerequisite_id in current - wanted:
+            remove(course_id, prerequisite_id)
+        for prerequisite_id in sorted(wanted - current):
+            add(course_id, prerequisite_id)
+
+
+def _edges():
+    edges = defaultdict(set)
+    for course_id, prerequisite_id in CoursePrerequisite.objects.values_list('course_id', 'prerequisite_id'):
+        edges[course_id].add(prerequisite_id)
+    return edges
+
+
+def _ancestors(course_id, edges, memo, path=()):
+    if course_id in memo:
+        return memo[course_id]
+    if course_id in path:
+        raise PrerequisiteCycle(f"Prerequisite cycle through courses {list(path) + [course_id]}")
+    found = set()
+    for prerequisite_id in edges.get(course_id, ()):
+        found.add(prerequisite_id)
+        found |= _ancestors(prerequisite_id, edges, memo, path + (course_id,))
+    memo[course_id] = found
+    return found
+
+
+def _write_closure(course_ids, edges, batch_size=1000):
+    memo = {}
+    rows = [PrerequisiteClosure(course_id=c, ancestor_id=a)
+            for c in course_ids for a in _ancestors(c, edges, memo)]
+    PrerequisiteClosure.objects.filter(course_id__in=course_ids).delete()
+    PrerequisiteClosure.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild(batch_size=1000):
+    """Recompute the whole closure from the edges; raises PrerequisiteCycle if there is one"""
+    edges = _edges()
+    with tenancy.atomic():
+        PrerequisiteClosure.objects.all().delete()
+        return _write_closure(list(edges), edges, batch_size)
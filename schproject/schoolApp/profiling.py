@@ -0,0 +1,190 @@
+import cProfile
+import itertools
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+DEFAULTS = {
+    'HEADER': 'X-Profile',      # staff send "X-Profile: 1" to profile one request
+    'QUERY_PARAM': 'profile',   # or ?profile=1
+    'SAMPLE_EVERY': 0,          # also profile 1 in N requests from anyone; 0 disables
+    'BUFFER_SIZE': 20,          # profiles kept in memory, oldest dropped first
+    'TOP_FUNCTIONS': 30,
+    'TOP_ALLOCATIONS': 15,
+    'TOP_QUERIES': 10,
+}
+
+# Every serializer's .data goes through this property, so its cumulative time
+# in the profile is the serialization time of the request.
+_SERIALIZER_DATA = BaseSerializer.data.fget.__code__
+_SERIALIZER_KEY = (_SERIALIZER_DATA.co_filename, _SERIALIZER_DATA.co_firstlineno, 'data')
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+class ProfileStore:
+    """Bounded ring buffer of captured profiles"""
+
+    def __init__(self, size):
+        self._profiles = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            profile['id'] = next(self._ids)
+            self._profiles.append(profile)
+        return profile['id']
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((p for p in self._profiles if p['id'] == profile_id), None)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._profiles))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore(_conf()['BUFFER_SIZE'])
+    return _store
+
+
+def summary(profile):
+    """A profile without its raw stats, for listings"""
+    return {k: v for k, v in profile.items() if k not in ('pstats', 'functions', 'allocations', 'queries')}
+
+
+def detail(profile):
+    return {k: v for k, v in profile.items() if k != 'pstats'}
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, context['connection'].alias, sql))
+
+
+def _staff_requested(request, conf):
+    if not (request.headers.get(conf['HEADER']) or request.GET.get(conf['QUERY_PARAM'])):
+        return False
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # DRF authenticates inside the view; resolve API tokens here
+        from .authentication import user_for_key
+        header = request.headers.get('Authorization', '')
+        user = user_for_key(header[6:]) if header.startswith('Token ') else None
+    return bool(user and user.is_staff)
+
+
+class ProfilingMiddleware:
+    """Capture cProfile, tracemalloc and SQL timings for selected requests.
+
+    A request is profiled when a staff user asks for it (header or query
+    flag) or when it is the Nth since the last sample. cProfile and
+    tracemalloc are process-wide, so only one request is profiled at a time;
+    others that would have been sampled simply run normally.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def __call__(self, request):
+        conf = _conf()
+        sampled = conf['SAMPLE_EVERY'] and next(self._counter) % conf['SAMPLE_EVERY'] == 0
+        if not (sampled or _staff_requested(request, conf)):
+            return self.get_response(request)
+        if not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request, conf, 'sampled' if sampled else 'requested')
+        finally:
+            self._busy.release()
+
+    def _profile(self, request, conf, trigger):
+        timer = _QueryTimer()
+        profiler = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        started_at = time.time()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+        stats = pstats.Stats(profiler)
+        allocations = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]).compare_to(baseline, 'lineno')
+        slowest = sorted(timer.queries, key=lambda q: q[0], reverse=True)[:conf['TOP_QUERIES']]
+        match = request.resolver_match
+
+        profile_id = get_store().add({
+            'path': request.path,
+            'method': request.method,
+            'url_name': match.url_name if match else None,
+            'status': response.status_code,
+            'trigger': trigger,
+            'started_at': started_at,
+            'duration': round(duration, 6),
+            'sql_count': len(timer.queries),
+            'sql_time': round(sum(q[0] for q in timer.queries), 6),
+            'serializer_time': round(stats.stats.get(_SERIALIZER_KEY, (0, 0, 0, 0))[3], 6),
+            'memory_allocated': sum(s.size_diff for s in allocations if s.size_diff > 0),
+            'queries': [{'time': round(t, 6), 'db': alias, 'sql': sql} for t, alias, sql in slowest],
+            'functions': _top_functions(stats, conf['TOP_FUNCTIONS']),
+            'allocations': [
+                {'where': str(s.traceback), 'size_diff': s.size_diff, 'count_diff': s.count_diff}
+                for s in allocations[:conf['TOP_ALLOCATIONS']]
+            ],
+            # Same format as pstats.Stats.dump_stats(), loadable with pstats/snakeviz
+            'pstats': marshal.dumps(stats.stats),
+        })
+        response['X-Profile-Id'] = str(profile_id)
+        return response
+
+
+def _top_functions(stats, limit):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {'function': pstats.func_std_string(func), 'calls': nc, 'tottime': round(tt, 6),
+         'cumtime': round(ct, 6)}
+        for func, (cc, nc, tt, ct, callers) in rows
+    ]
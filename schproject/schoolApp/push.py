@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.module_loading import import_string
+from . import tenancy
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'schoolApp.push.LocalBroker',
+    'HEARTBEAT_SECONDS': 15,
+    'QUEUE_SIZE': 100,         # events buffered per connection before dropping
+    'POLL_SECONDS': 1.0,       # ChangeLogBroker only
+}
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'PUSH', {})}
+
+
+class Subscription:
+    """One open event stream: an asyncio queue bound to its event loop"""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def offer(self, event):
+        # Runs on the subscriber's loop; a full queue means a stalled client
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class LocalBroker:
+    """In-process fan-out from publishers (any thread) to open streams.
+
+    Only reaches clients connected to this process; multi-process
+    deployments should use a backend that shares events between processes.
+    """
+
+    def __init__(self, queue_size=100, **options):
+        self.queue_size = queue_size
+        self._subs = {}
+        self._lock = threading.Lock()
+        self._stats = {'connections': 0, 'published': 0, 'delivered': 0,
+                       'latency_total': 0.0, 'latency_max': 0.0}
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subs.setdefault(user_id, set()).add(sub)
+            self._stats['connections'] += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.user_id]
+            self._stats['connections'] -= 1
+
+    def publish(self, user_ids, event):
+        self.deliver(user_ids, event)
+
+    def deliver(self, user_ids, event):
+        """Hand an event to every local stream of the given users"""
+        event = {**event, '_published': time.monotonic()}
+        with self._lock:
+            self._stats['published'] += 1
+            targets = [sub for uid in set(user_ids) for sub in self._subs.get(uid, ())]
+        for sub in targets:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+
+    def record_delivery(self, event):
+        latency = time.monotonic() - event['_published']
+        with self._lock:
+            self._stats['delivered'] += 1
+            self._stats['latency_total'] += latency
+            self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['users_connected'] = len(self._subs)
+        data['latency_avg'] = data['latency_total'] / data['delivered'] if data['delivered'] else 0.0
+        return data
+
+
+class ChangeLogBroker(LocalBroker):
+    """Fan-out for multi-process deployments without an external broker.
+
+    publish() writes the event to the PushEvent table of the active school's
+    database and each process tails that table in every school database,
+    delivering to its own streams, so an event published in one worker
+    reaches clients connected to any other with the same payload
+    LocalBroker would have sent. A database that cannot be read is logged
+    and retried with exponential backoff, up to MAX_BACKOFF seconds, while
+    the others keep being polled.
+    """
+    MAX_BACKOFF = 60
+    # seq is allocated at insert time, so an event can become visible after
+    # one with a higher seq; events this recent are re-read on every poll
+    LATE_SECONDS = 5
+    RETAIN_SECONDS = 300
+
+    def __init__(self, poll_seconds=1.0, **options):
+        super().__init__(**options)
+        self.poll_seconds = poll_seconds
+        self._cursors = {}     # database alias -> last delivered seq
+        self._recent = {}      # database alias -> {seq: created_at} delivered within LATE_SECONDS
+        self._failures = {}    # database alias -> (consecutive failures, retry at)
+        self._pruned = {}      # database alias -> monotonic time of the last prune
+        self._thread = None
+
+    def subscribe(self, user_id):
+        sub = super().subscribe(user_id)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='push-changelog', daemon=True)
+                self._thread.start()
+        return sub
+
+    def publish(self, user_ids, event):
+        from .models import PushEvent
+        PushEvent.objects.using(tenancy.db()).create(users=sorted(set(user_ids)), payload=event)
+
+    def _run(self):
+        from django.db import close_old_connections
+        while True:
+            try:
+                self.poll_all()
+            finally:
+                close_old_connections()
+            time.sleep(self.poll_seconds)
+
+    def _databases(self):
+        try:
+            return sorted({DEFAULT_DB_ALIAS} | {t.database for t in tenancy.schools()})
+        except Exception:
+            # The school registry lives in 'default'; keep to the databases already known
+            logger.warning('Could not load the school registry', exc_info=True)
+            return sorted(self._cursors) or [DEFAULT_DB_ALIAS]
+
+    def poll_all(self):
+        """One pass over every school database not waiting out a backoff"""
+        for alias in self._databases():
+            failures, retry_at = self._failures.get(alias, (0, 0))
+            if time.monotonic() < retry_at:
+                continue
+            try:
+                self._poll(alias)
+            except Exception:
+                failures += 1
+                delay = min(self.poll_seconds * 2 ** failures, self.MAX_BACKOFF)
+                self._failures[alias] = (failures, time.monotonic() + delay)
+                logger.warning('Polling the push events of %r failed (%d in a row); retrying in %.0fs',
+                               alias, failures, delay, exc_info=True)
+            else:
+                self._failures.pop(alias, None)
+
+    def _poll(self, alias):
+        from django.db.models import Max
+        from django.utils import timezone
+        from .models import PushEvent
+
+        events = PushEvent.objects.using(alias)
+        late_since = timezone.now() - timedelta(seconds=self.LATE_SECONDS)
+        if alias not in self._cursors:
+            # Start at the current end, counting recent events as delivered
+            self._cursors[alias] = events.aggregate(seq=Max('seq'))['seq'] or 0
+            self._recent[alias] = dict(events.filter(created_at__gte=late_since)
+                                       .values_list('seq', 'created_at'))
+            return
+        cursor, recent = self._cursors[alias], self._recent[alias]
+        rows = [e for e in events.filter(seq__lte=cursor, created_at__gte=late_since).order_by('seq')
+                if e.seq not in recent]
+        rows += list(events.filter(seq__gt=cursor).order_by('seq')[:1000])
+        for row in rows:
+            recent[row.seq] = row.created_at
+            self.deliver(row.users, row.payload)
+        if rows:
+            self._cursors[alias] = max(cursor, rows[-1].seq)
+        for seq in [seq for seq, created in recent.items() if created < late_since]:
+            del recent[seq]
+        if time.monotonic() - self._pruned.get(alias, 0) > self.RETAIN_SECONDS:
+            self._pruned[alias] = time.monotonic()
+            events.filter(created_at__lt=timezone.now() - timedelta(seconds=self.RETAIN_SECONDS)).delete()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                conf = _conf()
+                _broker = import_string(conf['BACKEND'])(
+                    queue_size=conf['QUEUE_SIZE'], poll_seconds=conf['POLL_SECONDS'])
+    return _broker
+
+
+def publish(user_ids, event):
+    get_broker().publish(user_ids, event)
+
+
+def format_sse(event):
+    payload = {k: v for k, v in event.items() if not k.startswith('_')}
+    return f"event: {payload.get('type', 'message')}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def stream(user_id):
+    """Async generator of SSE frames for one connected user"""
+    broker = get_broker()
+    heartbeat = _conf()['HEARTBEAT_SECONDS']
+    sub = broker.subscribe(user_id)
+    try:
+        yield ': connected\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            broker.record_delivery(event)
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(sub)
@@ -0,0 +1,118 @@
+import itertools
+from django.conf import settings
+from django.db.models import Q, Sum
+import numpy as np
+from scipy import sparse
+from .models import Course, CourseNeighbor, Enrollment, EnrollmentArchive
+from . import tenancy
+
+DEFAULTS = {
+    'TOP_K': 10,        # neighbours stored per course
+    'MIN_SHARED': 3,    # ignore pairs with fewer students in common
+    'CHUNK_SIZE': 20000,
+}
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'RECOMMENDATIONS', {})}
+
+
+def load_pairs(chunk_size=None):
+    """Every (student_id, course_id) ever enrolled, current and archived, as
+    one int64 array of shape (n, 2) streamed straight out of values_list"""
+    chunk_size = chunk_size or _conf()['CHUNK_SIZE']
+    archived = EnrollmentArchive.objects.all()
+    if tenancy.current_id() is not None:
+        archived = archived.filter(course__school_id=tenancy.current_id())
+    rows = itertools.chain.from_iterable(
+        qs.values_list('student_id', 'course_id').order_by().iterator(chunk_size=chunk_size)
+        for qs in (Enrollment.all_terms.all(), archived)
+    )
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def similar_courses(pairs, candidates=None, top_k=10, min_shared=3):
+    """Top-K most similar courses for every course in pairs.
+
+    Builds the sparse student x course incidence matrix X, so X.T @ X holds
+    the number of students shared by each pair of courses (its diagonal is
+    each course's size). Similarity is cosine: shared / sqrt(size_a * size_b).
+    Neighbours are limited to the `candidates` course ids when given. The
+    per-course ranking is one lexsort over all pairs rather than a loop.
+    Returns (course_ids, ranks, neighbor_ids, scores, shared) arrays.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if not len(pairs):
+        return empty, empty, empty, np.empty(0), empty
+    student_ids, student_index = np.unique(pairs[:, 0], return_inverse=True)
+    course_ids, course_index = np.unique(pairs[:, 1], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (student_index, course_index)),
+        shape=(len(student_ids), len(course_ids)),
+    )
+    incidence.data[:] = 1  # a repeated course counts once per student
+
+    cooccurrence = (incidence.T @ incidence).tocoo()
+    sizes = np.asarray(incidence.sum(axis=0)).ravel()
+    keep = (cooccurrence.row != cooccurrence.col) & (cooccurrence.data >= min_shared)
+    if candidates is not None:
+        keep &= np.isin(course_ids, np.asarray(list(candidates), dtype=np.int64))[cooccurrence.col]
+    rows, cols, shared = cooccurrence.row[keep], cooccurrence.col[keep], cooccurrence.data[keep]
+    scores = shared / np.sqrt(sizes[rows].astype(np.float64) * sizes[cols])
+
+    order = np.lexsort((course_ids[cols], -scores, rows))
+    rows, cols, shared, scores = rows[order], cols[order], shared[order], scores[order]
+    starts = np.searchsorted(rows, rows)  # first position of each row's run
+    ranks = np.arange(len(rows)) - starts + 1
+    top = ranks <= top_k
+    return (course_ids[rows[top]], ranks[top], course_ids[cols[top]], scores[top],
+            shared[top].astype(np.int64))
+
+
+def rebuild(top_k=None, min_shared=None, batch_size=5000):
+    """Recompute CourseNeighbor from the whole enrollment history.
+
+    Only courses of the current term are recommended. With a school active
+    only its courses are recomputed. The rows are replaced
+    in one transaction so readers see either the old or the new neighbours.
+    Returns the number of rows written.
+    """
+    conf = _conf()
+    top_k = top_k or conf['TOP_K']
+    min_shared = conf['MIN_SHARED'] if min_shared is None else min_shared
+    candidates = Course.objects.values_list('id', flat=True)
+    course_ids, ranks, neighbor_ids, scores, shared = similar_courses(
+        load_pairs(), list(candidates), top_k, min_shared)
+    rows = (
+        CourseNeighbor(course_id=c, rank=r, neighbor_id=n, score=round(s, 6), shared_students=k)
+        for c, r, n, s, k in zip(course_ids.tolist(), ranks.tolist(), neighbor_ids.tolist(),
+                                 scores.tolist(), shared.tolist())
+    )
+    with tenancy.atomic():
+        CourseNeighbor.objects.filter(course__in=Course.all_terms.values('id')).delete()
+        CourseNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(course_ids)
+
+
+def for_course(course_id, limit=None):
+    """Stored neighbours of a course, best first: one lookup on (course, rank)"""
+    rows = (CourseNeighbor.objects.filter(course_id=course_id).order_by('rank')
+            .values_list('neighbor_id', 'neighbor__code', 'neighbor__name', 'score', 'shared_students'))
+    if limit:
+        rows = rows[:limit]
+    return [{'course': c, 'code': code, 'name': name, 'score': score, 'shared_students': shared}
+            for c, code, name, score, shared in rows]
+
+
+def for_student(student, limit=10):
+    """Neighbours of every course the student has taken, scores summed, minus
+    the courses they already took; one query"""
+    taken = Q(course_id__in=Enrollment.all_terms.filter(student=student).values('course_id')) \
+        | Q(course_id__in=EnrollmentArchive.objects.filter(student=student).values('course_id'))
+    taken_neighbor = Q(neighbor_id__in=Enrollment.all_terms.filter(student=student).values('course_id')) \
+        | Q(neighbor_id__in=EnrollmentArchive.objects.filter(student=student).values('course_id'))
+    rows = (CourseNeighbor.objects.filter(taken).exclude(taken_neighbor)
+            .values('neighbor_id', 'neighbor__code', 'neighbor__name')
+            .annotate(total=Sum('score')).order_by('-total', 'neighbor_id')[:limit])
+    return [{'course': r['neighbor_id'], 'code': r['neighbor__code'], 'name': r['neighbor__name'],
+             'score': round(r['total'], 6)} for r in rows]
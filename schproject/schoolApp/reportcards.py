@@ -0,0 +1,291 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from . import tenancy
+
+DEFAULTS = {
+    'CHUNK_SIZE': 500,       # students loaded per round of queries
+    'BATCH_SIZE': 25,        # documents handed to a worker at a time
+    'WORKERS': None,         # render processes; None means one per CPU
+    'START_METHOD': 'spawn', # workers never touch the database, but forking a threaded server is unsafe
+    'OUTPUT_DIR': os.path.join(tempfile.gettempdir(), 'schoolapp-reportcards'),
+}
+
+REPORT_CARD = 'report_card'
+TRANSCRIPT = 'transcript'
+
+ROW_FIELDS = ('student_id', 'course__code', 'course__name', 'course__credits',
+              'course__teacher__user__first_name', 'course__teacher__user__last_name',
+              'term__code', 'term__start_date', 'grade')
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'REPORT_CARDS', {})}
+
+
+# Loading: four queries per chunk of students, whatever its size. Models are
+# imported inside the loaders so spawned render workers can import this module
+# without setting Django up.
+
+def student_ids_for(term=None, student_ids=None):
+    """Students who get a document: those enrolled in `term` (a Term) or, for
+    transcripts, every student of the active school"""
+    from .models import Enrollment, EnrollmentArchive, Student
+    students = Student.objects.all()
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+    if term is not None:
+        students = students.filter(id__in=Enrollment.all_terms.filter(term=term).values('student_id')) \
+            | students.filter(id__in=EnrollmentArchive.objects.filter(term=term).values('student_id'))
+    return list(students.order_by('id').values_list('id', flat=True).distinct())
+
+
+def load_cards(student_ids, term=None):
+    """Plain-dict documents for a chunk of students, ready to pickle to a
+    worker: one query each for students, current enrollments, archived
+    enrollments and transcript summaries. Grade points and GPAs are worked
+    out here too, leaving the workers only drawing to do."""
+    from .models import Enrollment, EnrollmentArchive, Student, TranscriptSummary
+    from .transcripts import grade_points
+    students = Student.objects.filter(id__in=student_ids).values_list(
+        'id', 'student_id', 'user__first_name', 'user__last_name')
+    enrollments = Enrollment.all_terms.filter(student_id__in=student_ids)
+    archived = EnrollmentArchive.objects.filter(student_id__in=student_ids)
+    if term is not None:
+        enrollments, archived = enrollments.filter(term=term), archived.filter(term=term)
+    summaries = {student_id: (credits, quality) for student_id, credits, quality in (
+        TranscriptSummary.objects.filter(student_id__in=student_ids)
+        .values_list('student_id', 'graded_credits', 'quality_tenths'))}
+
+    cards = {}
+    for pk, number, first_name, last_name in students:
+        credits, quality = summaries.get(pk, (0, 0))
+        cards[pk] = {
+            'id': pk,
+            'student_number': number,
+            'name': f'{first_name} {last_name}'.strip(),
+            'cumulative_gpa': round(quality / (10 * credits), 2) if credits else None,
+            'rows': [],
+        }
+    for qs in (enrollments, archived):
+        for (student_id, code, name, credits, teacher_first, teacher_last,
+             term_code, term_start, grade) in qs.values_list(*ROW_FIELDS).order_by():
+            cards[student_id]['rows'].append({
+                'code': code, 'name': name, 'credits': credits,
+                'teacher': f'{teacher_first} {teacher_last}'.strip(),
+                'term': term_code or '', 'term_start': term_start, 'grade': grade or '',
+                'points': grade_points(grade),
+            })
+    for card in cards.values():
+        rows = card['rows']
+        rows.sort(key=lambda r: (r['term_start'] is None, r['term_start'] or 0, r['code']))
+        graded = sum(r['credits'] for r in rows if r['points'] is not None)
+        quality = sum(r['points'] * r['credits'] for r in rows if r['points'] is not None)
+        card['credits'] = sum(r['credits'] for r in rows)
+        card['gpa'] = round(quality / graded, 2) if graded else None
+        for row in rows:
+            del row['term_start']
+            row['points'] = '' if row['points'] is None else f"{row['points']:.1f}"
+    return [cards[pk] for pk in student_ids if pk in cards]
+
+
+# Rendering: pure functions of the loaded dicts, run in worker processes
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+ROW_HEIGHT = 16
+COLUMNS = {
+    REPORT_CARD: [('Code', 'code', 0), ('Course', 'name', 70), ('Teacher', 'teacher', 260),
+                  ('Credits', 'credits', 390), ('Grade', 'grade', 440), ('Points', 'points', 490)],
+    TRANSCRIPT: [('Term', 'term', 0), ('Code', 'code', 70), ('Course', 'name', 140),
+                 ('Credits', 'credits', 390), ('Grade', 'grade', 440), ('Points', 'points', 490)],
+}
+TITLES = {REPORT_CARD: 'Report card', TRANSCRIPT: 'Transcript'}
+
+
+def render(card, kind=REPORT_CARD, school='', term=''):
+    """One student's document as PDF bytes; returns (pdf, pages)"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1, invariant=1)
+    pdf.setTitle(f"{TITLES[kind]} - {card['student_number']}")
+    columns = COLUMNS[kind]
+    pages = 0
+
+    def header():
+        nonlocal pages
+        pages += 1
+        y = PAGE_HEIGHT - MARGIN
+        pdf.setFont('Helvetica-Bold', 16)
+        pdf.drawString(MARGIN, y, school)
+        pdf.setFont('Helvetica', 11)
+        pdf.drawRightString(PAGE_WIDTH - MARGIN, y, f'{TITLES[kind]} {term}'.strip())
+        y -= 24
+        pdf.drawString(MARGIN, y, f"{card['name']} ({card['student_number']})")
+        pdf.drawRightString(PAGE_WIDTH - MARGIN, y, f'Page {pages}')
+        y -= 28
+        pdf.setFont('Helvetica-Bold', 10)
+        for label, _, x in columns:
+            pdf.drawString(MARGIN + x, y, label)
+        pdf.line(MARGIN, y - 4, PAGE_WIDTH - MARGIN, y - 4)
+        pdf.setFont('Helvetica', 10)
+        return y - ROW_HEIGHT
+
+    y = header()
+    for row in card['rows']:
+        if y < MARGIN + 3 * ROW_HEIGHT:
+            pdf.showPage()
+            y = header()
+        for _, field, x in columns:
+            pdf.drawString(MARGIN + x, y, str(row[field])[:34])
+        y -= ROW_HEIGHT
+
+    y -= ROW_HEIGHT
+    pdf.setFont('Helvetica-Bold', 10)
+    gpa = '-' if card['gpa'] is None else f"{card['gpa']:.2f}"
+    pdf.drawString(MARGIN, y, f"Credits: {card['credits']}    GPA: {gpa}")
+    if kind == REPORT_CARD and card['cumulative_gpa'] is not None:
+        pdf.drawRightString(PAGE_WIDTH - MARGIN, y, f"Cumulative GPA: {card['cumulative_gpa']:.2f}")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue(), pages
+
+
+def render_many(cards, kind, school, term):
+    """Render a batch; returns ([(filename, pdf), ...], pages, cpu_seconds)"""
+    started = time.process_time()
+    documents, pages = [], 0
+    for card in cards:
+        pdf, n = render(card, kind, school, term)
+        # Different student numbers can sanitize to the same name; the pk keeps them apart
+        documents.append((get_valid_filename(f"{card['student_number']}-{card['id']}.pdf"), pdf))
+        pages += n
+    return documents, pages, time.process_time() - started
+
+
+# Output: a zip archive or a directory, written as batches come back
+
+class _ZipSink:
+    def __init__(self, path):
+        # PDF pages are already compressed; storing avoids deflating them twice
+        self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        self.zip.writestr(name, data)
+
+    def close(self):
+        self.zip.close()
+
+
+class _DirSink:
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, name, data):
+        with open(os.path.join(self.path, name), 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+def generate(output, term=None, transcripts=False, student_ids=None, workers=None,
+             chunk_size=None, batch_size=None):
+    """Write a PDF per student to `output` (a .zip path or a directory).
+
+    `term` is a term code; report cards cover that term (the current one by
+    default), transcripts every term. The database is read in the calling
+    process, a chunk of students at a time; rendering runs in a pool of
+    `workers` processes with at most two batches per worker in flight, so
+    memory stays bounded however many students there are. Returns counts and
+    throughput, including pages/sec per worker and per CPU-second of rendering.
+    """
+    from .models import School, Term
+    conf = _conf()
+    workers = workers or conf['WORKERS'] or os.cpu_count() or 1
+    chunk_size = chunk_size or conf['CHUNK_SIZE']
+    batch_size = batch_size or conf['BATCH_SIZE']
+    kind = TRANSCRIPT if transcripts else REPORT_CARD
+    term_obj = None
+    if term:
+        term_obj = Term.objects.get(code=term)
+    elif not transcripts:
+        term_obj = Term.objects.filter(is_current=True).first()
+    school = School.objects.using(DEFAULT_DB_ALIAS).filter(id=tenancy.current_id() or tenancy.default_id()) \
+        .values_list('name', flat=True).first() or ''
+    term_label = term_obj.code if term_obj else ''
+
+    ids = student_ids_for(term_obj if kind == REPORT_CARD else None, student_ids)
+    sink = _ZipSink(output) if str(output).endswith('.zip') else _DirSink(output)
+    stats = {'documents': 0, 'pages': 0, 'bytes': 0, 'render_cpu_seconds': 0.0}
+
+    def collect(result):
+        documents, pages, cpu = result
+        for name, pdf in documents:
+            sink.write(name, pdf)
+            stats['bytes'] += len(pdf)
+        stats['documents'] += len(documents)
+        stats['pages'] += pages
+        stats['render_cpu_seconds'] += cpu
+
+    def batches():
+        for start in range(0, len(ids), chunk_size):
+            cards = load_cards(ids[start:start + chunk_size], term_obj if kind == REPORT_CARD else None)
+            for offset in range(0, len(cards), batch_size):
+                yield cards[offset:offset + batch_size]
+
+    started = time.perf_counter()
+    try:
+        if workers == 1:
+            for cards in batches():
+                collect(render_many(cards, kind, school, term_label))
+        else:
+            context = multiprocessing.get_context(conf['START_METHOD'])
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                pending = set()
+                for cards in batches():
+                    pending.add(pool.submit(render_many, cards, kind, school, term_label))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                for future in wait(pending).done:
+                    collect(future.result())
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - started
+
+    pages_per_sec = stats['pages'] / elapsed if elapsed else 0.0
+    cpu = stats['render_cpu_seconds']
+    return {
+        'kind': kind,
+        'term': term_label or None,
+        'output': str(output),
+        **stats,
+        'render_cpu_seconds': round(cpu, 3),
+        'seconds': round(elapsed, 3),
+        'workers': workers,
+        'pages_per_sec': round(pages_per_sec, 1),
+        'pages_per_sec_per_worker': round(pages_per_sec / workers, 1),
+        'pages_per_cpu_second': round(stats['pages'] / cpu, 1) if cpu else None,
+    }
+
+
+def output_path(term=None, transcripts=False):
+    """Fresh zip path for a batch of the active school under OUTPUT_DIR"""
+    tenant = tenancy.current()
+    directory = os.path.join(_conf()['OUTPUT_DIR'], tenant.slug if tenant else 'default')
+    os.makedirs(directory, exist_ok=True)
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S-%f')
+    name = f"{TRANSCRIPT if transcripts else REPORT_CARD}s-{term or 'current'}-{stamp}.zip"
+    return os.path.join(directory, get_valid_filename(name))
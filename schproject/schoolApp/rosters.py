@@ -0,0 +1,82 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import Course, Enrollment, RosterEntry
+from . import tenancy
+
+
+def _entry_for(enrollment):
+    student = enrollment.student
+    user = student.user
+    return RosterEntry(
+        enrollment_id=enrollment.id,
+        course_id=enrollment.course_id,
+        student_id=student.id,
+        student_number=student.student_id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        grade=enrollment.grade,
+        enrollment_date=enrollment.enrollment_date,
+    )
+
+
+def add(enrollment):
+    """Materialize the roster row for a new enrollment"""
+    entry = _entry_for(enrollment)
+    entry.save()
+    return entry
+
+
+def update_grade(enrollment):
+    RosterEntry.objects.filter(enrollment_id=enrollment.id).update(grade=enrollment.grade)
+
+
+def _actual_counts():
+    return Coalesce(Subquery(
+        Enrollment.all_terms.filter(course=OuterRef('pk'))
+        .values('course').annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def rebuild(course_ids=None, batch_size=1000):
+    """Recompute enrolled_count and roster rows from Enrollment.
+
+    Works one chunk of courses at a time so each transaction stays short.
+    Returns the number of roster rows written.
+    """
+    if course_ids is None:
+        course_ids = list(Course.all_terms.order_by('id').values_list('id', flat=True))
+    written = 0
+    for start in range(0, len(course_ids), batch_size):
+        chunk = course_ids[start:start + batch_size]
+        with tenancy.atomic():
+            Course.all_terms.filter(id__in=chunk).update(enrolled_count=_actual_counts())
+            RosterEntry.objects.filter(course_id__in=chunk).delete()
+            enrollments = Enrollment.all_terms.filter(course_id__in=chunk).select_related('student__user')
+            entries = RosterEntry.objects.bulk_create(
+                (_entry_for(e) for e in enrollments.iterator(chunk_size=batch_size)),
+                batch_size=batch_size,
+            )
+            written += len(entries)
+    return written
+
+
+def check():
+    """Compare the materialized data with the source tables.
+
+    Returns a dict of problem lists; all empty means consistent.
+    """
+    bad_counts = list(
+        Course.all_terms.annotate(actual=_actual_counts())
+        .exclude(enrolled_count=F('actual'))
+        .values_list('id', 'enrolled_count', 'actual')
+    )
+    missing = list(
+        Enrollment.all_terms.filter(roster_entry__isnull=True).values_list('id', flat=True)
+    )
+    stale = list(
+        RosterEntry.objects.exclude(
+            Q(grade=F('enrollment__grade')) | Q(grade__isnull=True, enrollment__grade__isnull=True)
+        ).values_list('enrollment_id', flat=True)
+    )
+    return {'counts': bad_counts, 'missing_entries': missing, 'stale_entries': stale}
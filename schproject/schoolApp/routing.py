@@ -0,0 +1,148 @@
+import contextvars
+import hashlib
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+DEFAULTS = {
+    'ALIASES': [],               # DATABASES aliases that replicate 'default'
+    'STICKY_SECONDS': 5,         # reads stay on the primary this long after a client's write
+    'HEALTH_CHECK_INTERVAL': 10, # seconds between connection checks per replica
+}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias chosen for the current request's reads; None means the primary
+_read_db = contextvars.ContextVar('schoolapp_read_db', default=None)
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_REPLICAS', {})}
+
+
+class ReplicaHealth:
+    """Caches whether each replica accepts connections"""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias, interval):
+        now = time.monotonic()
+        with self._lock:
+            ok, checked = self._state.get(alias, (True, None))
+            if checked is not None and now - checked < interval:
+                return ok
+        try:
+            connections[alias].ensure_connection()
+            ok = True
+        except Exception:
+            ok = False
+        with self._lock:
+            self._state[alias] = (ok, now)
+        return ok
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """A healthy replica alias, or None to read from the primary"""
+    conf = _conf()
+    candidates = [a for a in conf['ALIASES'] if health.is_healthy(a, conf['HEALTH_CHECK_INTERVAL'])]
+    return random.choice(candidates) if candidates else None
+
+
+def _pin_key(identity):
+    return 'replica-pin:' + hashlib.sha1(identity.encode()).hexdigest()
+
+
+def client_key(request):
+    """Identify the caller before DRF authentication has run"""
+    authorization = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(authorization) == 2:
+        # Normalized the way TokenAuthentication parses it
+        return _pin_key(f'{authorization[0].lower()} {authorization[1]}')
+    return _pin_key(request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+                    or request.META.get('REMOTE_ADDR', ''))
+
+
+def user_key(user_id):
+    return _pin_key(f'user {user_id}')
+
+
+def pin(*keys):
+    """Keep reads for these callers on the primary for STICKY_SECONDS"""
+    cache.set_many(dict.fromkeys(keys, True), _conf()['STICKY_SECONDS'])
+
+
+def pin_token(key):
+    """Pin a freshly issued token, so the client's first requests with it
+    do not authenticate against a replica that has not seen it yet"""
+    pin(_pin_key(f'token {key}'))
+
+
+def stick_if_pinned(user):
+    """Once authentication knows the user, move this request's remaining
+    reads to the primary if that user wrote recently (from any client)"""
+    if _read_db.get() is not None and cache.get(user_key(user.pk)):
+        _read_db.set(None)
+
+
+class ReplicaRouter:
+    """Send reads to the replica picked for this request, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_db.get()
+        if alias is None or transaction.get_connection('default').in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default' or db not in _conf()['ALIASES']
+
+
+class ReplicaRoutingMiddleware:
+    """Route safe-method schoolApp requests to a replica.
+
+    A client that has just written is pinned to the primary for
+    STICKY_SECONDS so it reads its own writes despite replication lag. The
+    pin is keyed on the credential the request carried and, once DRF has
+    authenticated it, on the user; tokens are pinned when issued.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_db.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_db.reset(token)
+        if request.method not in SAFE_METHODS:
+            # DRF copies the user it authenticated onto the Django request
+            user = getattr(request, 'user', None)
+            keys = [client_key(request)]
+            if user is not None and user.is_authenticated:
+                keys.append(user_key(user.pk))
+            pin(*keys)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS:
+            return None
+        if not getattr(view_func, '__module__', '').startswith('schoolApp.'):
+            return None
+        if not _conf()['ALIASES'] or cache.get(client_key(request)):
+            return None
+        _read_db.set(choose_replica())
+        return None
@@ -0,0 +1,124 @@
+import numpy as np
+from django.db.models import Q
+from .models import Course, Enrollment, MeetingSlot
+from . import tenancy
+
+# The week as a grid of 5-minute cells; a course's meetings are a bitmask
+# over it, and two schedules clash iff their masks share a bit.
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+MASK_BYTES = (WEEK_SLOTS + 7) // 8
+
+
+class InvalidMeeting(ValueError):
+    pass
+
+
+def _cell(day, t, round_up=False):
+    minutes = t.hour * 60 + t.minute
+    cell = minutes // SLOT_MINUTES
+    if round_up and minutes % SLOT_MINUTES:
+        cell += 1
+    return day * SLOTS_PER_DAY + cell
+
+
+def mask_for(meetings):
+    """Bitmask of (day, start_time, end_time) meetings"""
+    bits = 0
+    for day, start, end in meetings:
+        if not 0 <= day <= 6:
+            raise InvalidMeeting(f'Invalid day {day}')
+        if end <= start:
+            raise InvalidMeeting(f'Meeting must end after it starts ({start}-{end})')
+        first, last = _cell(day, start), _cell(day, end, round_up=True)
+        bits |= ((1 << (last - first)) - 1) << first
+    return bits
+
+
+def to_bytes(bits):
+    return bits.to_bytes(MASK_BYTES, 'little') if bits else None
+
+
+def from_bytes(data):
+    return int.from_bytes(data, 'little') if data else 0
+
+
+def set_meetings(course, meetings):
+    """Replace a course's meeting slots and its schedule mask"""
+    meetings = [(m['day'], m['start_time'], m['end_time']) for m in meetings]
+    bits = mask_for(meetings)
+    with tenancy.atomic():
+        MeetingSlot.objects.filter(course=course).delete()
+        MeetingSlot.objects.bulk_create(
+            MeetingSlot(course=course, day=day, start_time=start, end_time=end)
+            for day, start, end in meetings
+        )
+        Course.all_terms.filter(pk=course.pk).update(schedule_bits=to_bytes(bits))
+    course.schedule_bits = to_bytes(bits)
+    return bits
+
+
+def refresh_mask(course):
+    """Recompute the mask from the stored slots (e.g. after editing them in the admin)"""
+    bits = mask_for(course.meetings.values_list('day', 'start_time', 'end_time'))
+    Course.all_terms.filter(pk=course.pk).update(schedule_bits=to_bytes(bits))
+    return bits
+
+
+def conflicts(student, course_id):
+    """Codes of the student's current courses that meet at the same time as course_id.
+
+    A single indexed query loads the masks of the target course and of the
+    student's current-term courses (the per-student index); the check itself
+    is one integer AND per course.
+    """
+    rows = (Course.objects.filter(Q(pk=course_id) | Q(enrollment__student=student))
+            .exclude(schedule_bits=None)
+            .values_list('id', 'code', 'schedule_bits'))
+    masks = {pk: (code, from_bytes(bits)) for pk, code, bits in rows}
+    target = masks.pop(int(course_id), (None, 0))[1]
+    return [code for code, bits in masks.values() if bits & target]
+
+
+def conflict_report(enrollments=None):
+    """All students whose current enrollments overlap, computed in bulk.
+
+    Course masks are unpacked into a (courses x cells) bit matrix; one matrix
+    product gives the course-pair overlap matrix, and every pair of courses
+    taken by the same student is looked up in it with array indexing. Returns {student_id: [(course_id, course_id), ...]}.
+    """
+    if enrollments is None:
+        enrollments = Enrollment.objects.all()
+    courses = list(Course.all_terms.exclude(schedule_bits=None)
+                   .filter(id__in=enrollments.values('course_id'))
+                   .values_list('id', 'schedule_bits'))
+    if not courses:
+        return {}
+    course_ids = np.array([c for c, _ in courses], dtype=np.int64)
+    packed = np.frombuffer(b''.join(bytes(b) for _, b in courses), dtype=np.uint8).reshape(len(courses), MASK_BYTES)
+    grid = np.unpackbits(packed, axis=1, bitorder='little').astype(np.float32)
+    overlap = (grid @ grid.T) > 0
+    np.fill_diagonal(overlap, False)
+
+    index = {c: i for i, c in enumerate(course_ids.tolist())}
+    rows = np.array([(s, index[c]) for s, c in enrollments.filter(course_id__in=course_ids)
+                     .values_list('student_id', 'course_id').order_by('student_id').iterator(chunk_size=10000)],
+                    dtype=np.int64).reshape(-1, 2)
+    students, cols = rows[:, 0], rows[:, 1]
+    # Self-join each student's run of enrollments without a Python loop per
+    # student: compare every row with the row d places after it, for each d
+    # up to the longest run.
+    report = {}
+    d = 1
+    while d < len(students):
+        same = students[:-d] == students[d:]
+        if not same.any():
+            break
+        first, second = cols[:-d], cols[d:]
+        hits = np.flatnonzero(same & overlap[first, second])
+        for k in hits:
+            report.setdefault(int(students[k]), []).append(
+                (int(course_ids[first[k]]), int(course_ids[second[k]])))
+        d += 1
+    return report
@@ -1,9 +1,49 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Student, Teacher, Course, Enrollment
+from .util import IDENTITY_MAP_ATTR
+from .models import (
+    Student, Teacher, Course, MeetingSlot, Enrollment, RosterEntry, TranscriptSummary, AuditEntry,
+)
 
-class UserSerializer(serializers.ModelSerializer):
+def unique_in_school(queryset, field, value, instance=None, message=None):
+    """Uniqueness of a code within the active school; the default manager is
+    already school-scoped, and the database constraint includes the school"""
+    existing = queryset.filter(**{field: value})
+    if instance is not None:
+        existing = existing.exclude(pk=instance.pk)
+    if existing.exists():
+        raise serializers.ValidationError(message or f'A record with this {field} already exists.')
+    return value
+
+class IdentityMapMixin:
+    """Serialize each nested object once per response.
+
+    Rows of a roster share the same course, teacher and user; the first
+    representation of (serializer class, pk) is reused for the rest. The map
+    lives in the root serializer's context, so serializers built with the
+    same context dict share it; a request carrying one (a batched sub-call)
+    lends it to every serializer of the batch. Pass
+    context={'identity_map': False} to turn it off. Top-level objects are not
+    memoized since callers may modify them.
+    """
+    def to_representation(self, instance):
+        if not getattr(self, 'field_name', None):
+            return super().to_representation(instance)
+        identity_map = self.context.get('identity_map')
+        if identity_map is None:
+            identity_map = getattr(self.context.get('request'), IDENTITY_MAP_ATTR, None)
+            if identity_map is None:
+                identity_map = self.context['identity_map'] = {}
+        if identity_map is False:
+            return super().to_representation(instance)
+        key = (type(self), instance.pk)
+        data = identity_map.get(key)
+        if data is None:
+            data = identity_map[key] = super().to_representation(instance)
+        return data
+
+class UserSerializer(IdentityMapMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined']
@@ -183,6 +223,9 @@ class StudentCreateSerializer(serializers.ModelSerializer):
         model = Student
         fields = ['user', 'student_id', 'phone_number', 'date_of_birth', 'address']
     
+    def validate_student_id(self, value):
+        return unique_in_school(Student.objects.all(), 'student_id', value, self.instance, 'Student ID already exists')
+    
     def create(self, validated_data):
         user_data = validated_data.pop('user')
         user_serializer = UserRegistrationSerializer(data=user_data)
@@ -200,6 +243,9 @@ class TeacherCreateSerializer(serializers.ModelSerializer):
         model = Teacher
         fields = ['user', 'employee_id', 'phone_number', 'subject_specialization']
     
+    def validate_employee_id(self, value):
+        return unique_in_school(Teacher.objects.all(), 'employee_id', value, self.instance, 'Employee ID already exists')
+    
     def create(self, validated_data):
         user_data = validated_data.pop('user')
         user_serializer = UserRegistrationSerializer(data=user_data)
@@ -210,31 +256,56 @@ class TeacherCreateSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError(user_serializer.errors)
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(IdentityMapMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = Student
         fields = ['id', 'user', 'student_id', 'phone_number', 'date_of_birth', 'address', 'enrollment_date']
+    
+    def validate_student_id(self, value):
+        return unique_in_school(Student.objects.all(), 'student_id', value, self.instance, 'Student ID already exists')
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(IdentityMapMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = Teacher
         fields = ['id', 'user', 'employee_id', 'phone_number', 'subject_specialization', 'hire_date']
+    
+    def validate_employee_id(self, value):
+        return unique_in_school(Teacher.objects.all(), 'employee_id', value, self.instance, 'Employee ID already exists')
 
 class CourseCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ['name', 'code', 'description', 'teacher', 'credits']
+        fields = ['name', 'code', 'description', 'teacher', 'term', 'credits', 'max_seats']
+    
+    def validate_code(self, value):
+        return unique_in_school(Course.all_terms.all(), 'code', value, self.instance, 'Course code already exists')
 
-class CourseSerializer(serializers.ModelSerializer):
+class MeetingSlotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MeetingSlot
+        fields = ['day', 'start_time', 'end_time']
+    
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError('end_time must be after start_time')
+        return attrs
+
+class CourseSerializer(IdentityMapMixin, serializers.ModelSerializer):
     teacher = TeacherSerializer(read_only=True)
+    meetings = MeetingSlotSerializer(many=True, read_only=True)
     
     class Meta:
         model = Course
-        fields = ['id', 'name', 'code', 'description', 'teacher', 'credits', 'created_at']
+        fields = ['id', 'name', 'code', 'description', 'teacher', 'term', 'credits', 'max_seats',
+                  'meetings', 'enrolled_count', 'created_at']
+        read_only_fields = ['enrolled_count']
+    
+    def validate_code(self, value):
+        return unique_in_school(Course.all_terms.all(), 'code', value, self.instance, 'Course code already exists')
 
 class EnrollmentCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -247,4 +318,24 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Enrollment
-        fields = ['id', 'student', 'course', 'enrollment_date', 'grade']
+        fields = ['id', 'student', 'course', 'term', 'enrollment_date', 'grade']
+        read_only_fields = ['term']
+
+class RosterEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RosterEntry
+        fields = ['enrollment', 'course', 'student', 'student_number', 'first_name', 'last_name',
+                  'email', 'grade', 'enrollment_date']
+
+class TranscriptSummarySerializer(serializers.ModelSerializer):
+    gpa = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = TranscriptSummary
+        fields = ['gpa', 'course_count', 'total_credits', 'graded_credits', 'updated_at']
+
+class AuditEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEntry
+        fields = ['id', 'occurred_at', 'actor_id', 'action', 'enrollment_id', 'student_id', 'course_id',
+                  'changes']
@@ -0,0 +1,304 @@
+from django.db import IntegrityError
+from django.db.models import F, Q
+from .models import AuditEntry, ChangeLogEntry, Course, Enrollment, RosterEntry, Student, WaitlistEntry
+from . import audit, changefeed, prereqs, push, rosters, schedule, tenancy, transcripts
+
+
+class EnrollmentError(Exception):
+    """Raised when an enrollment request cannot be satisfied"""
+    status_code = 400
+
+
+class CourseNotFound(EnrollmentError):
+    status_code = 404
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+class AlreadyWaitlisted(EnrollmentError):
+    pass
+
+
+class ScheduleConflict(EnrollmentError):
+    status_code = 409
+
+
+class PrerequisitesNotMet(EnrollmentError):
+    status_code = 403
+
+
+def _seat_available():
+    return Q(max_seats__isnull=True) | Q(enrolled_count__lt=F('max_seats'))
+
+
+def _enrollment_event(action, enrollment_id, course_id):
+    return {'type': 'enrollment', 'action': action, 'enrollment': enrollment_id, 'course': course_id}
+
+
+def _notify(events):
+    """Push events to the affected users once the transaction commits.
+
+    events is a list of (student_id, course_id, payload); the course's teacher
+    is notified too unless course_id is None.
+    """
+    def send():
+        student_users = dict(Student.objects.filter(id__in={e[0] for e in events})
+                             .values_list('id', 'user_id'))
+        teacher_users = dict(Course.all_terms.filter(id__in={e[1] for e in events if e[1]})
+                             .values_list('id', 'teacher__user_id'))
+        for student_id, course_id, payload in events:
+            users = [student_users.get(student_id), teacher_users.get(course_id)]
+            push.publish([u for u in users if u], payload)
+    if events:
+        tenancy.on_commit(send)
+
+
+def _next_promotable(course_id, passed_over):
+    """Lock the oldest waitlist entry of a course whose student can take the
+    seat now, or return None.
+
+    The same checks as enroll() apply: a student with a timetable clash or
+    missing prerequisites is passed over (their entry id is added to
+    passed_over) and keeps their place for a later seat. Call inside a
+    transaction.
+    """
+    while True:
+        entry = (WaitlistEntry.objects.select_for_update(skip_locked=True)
+                 .filter(course_id=course_id)
+                 .exclude(id__in=passed_over)
+                 .order_by('created_at', 'id')
+                 .first())
+        if entry is None:
+            return None
+        # Serialized with the student's own enrollments, as in enroll()
+        list(Student.objects.select_for_update().filter(pk=entry.student_id).values_list('pk'))
+        if not schedule.conflicts(entry.student_id, course_id) and not prereqs.unmet(entry.student_id, course_id):
+            return entry
+        passed_over.add(entry.id)
+
+
+def enroll(student, course_id, check_prerequisites=True):
+    """Enroll a student, or waitlist them if the course is full.
+
+    The seat is claimed with a single conditional UPDATE on the course row, so
+    concurrent requests can never push enrolled_count past max_seats. The
+    enrollment insert runs in the same transaction; a duplicate rolls the seat
+    back. A course meeting at the same time as one of the student's current
+    courses raises ScheduleConflict, and missing prerequisites raise
+    PrerequisitesNotMet (callers that checked in bulk can skip that).
+    Returns (obj, waitlisted).
+    """
+    if Enrollment.all_terms.filter(student=student, course_id=course_id).exists():
+        raise AlreadyEnrolled('Already enrolled in this course')
+    # Prerequisite and waitlist rows carry no school: settle the course first
+    if not Course.objects.filter(pk=course_id).exists():
+        raise CourseNotFound('Course not found')
+    if check_prerequisites:
+        missing = prereqs.unmet(student, course_id)
+        if missing:
+            raise PrerequisitesNotMet(f"Missing prerequisites: {', '.join(missing)}")
+
+    try:
+        with tenancy.atomic():
+            # Serialize this student's enrollments so two concurrent requests
+            # can't both pass the timetable check
+            list(Student.objects.select_for_update().filter(pk=student.pk).values_list('pk'))
+            clashes = schedule.conflicts(student, course_id)
+            if clashes:
+                raise ScheduleConflict(f"Schedule conflict with {', '.join(clashes)}")
+            
+            claimed = Course.objects.filter(_seat_available(), pk=course_id).update(
+                enrolled_count=F('enrolled_count') + 1
+            )
+            if claimed:
+                WaitlistEntry.objects.filter(student=student, course_id=course_id).delete()
+                enrollment = Enrollment.all_terms.create(student=student, course_id=course_id)
+                rosters.add(enrollment)
+                transcripts.record_enrollment(enrollment)
+                audit.record(AuditEntry.ENROLLED, enrollment.id, student.id, enrollment.course_id)
+                _notify([(student.id, course_id, _enrollment_event('created', enrollment.id, course_id))])
+                return enrollment, False
+
+            entry = WaitlistEntry.objects.create(student=student, course_id=course_id)
+            _notify([(student.id, None, {'type': 'waitlist', 'action': 'created', 'course': course_id})])
+            return entry, True
+    except IntegrityError:
+        if Enrollment.all_terms.filter(student=student, course_id=course_id).exists():
+            raise AlreadyEnrolled('Already enrolled in this course')
+        raise AlreadyWaitlisted('Already on the waitlist for this course')
+
+
+def enroll_many(students, course_id):
+    """Enroll several students in one course.
+
+    Prerequisites are checked for everyone up front in a constant number of
+    queries. Returns {student_id: (obj or None, waitlisted, error)}.
+    """
+    students = list(students)
+    if not Course.objects.filter(pk=course_id).exists():
+        return {s.id: (None, False, CourseNotFound('Course not found')) for s in students}
+    missing = prereqs.unmet_many([s.id for s in students], course_id)
+    results = {}
+    for student in students:
+        if student.id in missing:
+            results[student.id] = (None, False, PrerequisitesNotMet(
+                f"Missing prerequisites: {', '.join(missing[student.id])}"))
+            continue
+        try:
+            obj, waitlisted = enroll(student, course_id, check_prerequisites=False)
+        except EnrollmentError as e:
+            results[student.id] = (None, False, e)
+        else:
+            results[student.id] = (obj, waitlisted, None)
+    return results
+
+
+def admit(enrollment):
+    """Save a new enrollment regardless of capacity (staff override)"""
+    with tenancy.atomic():
+        enrollment.save()
+        Course.all_terms.filter(pk=enrollment.course_id).update(enrolled_count=F('enrolled_count') + 1)
+        WaitlistEntry.objects.filter(student_id=enrollment.student_id, course_id=enrollment.course_id).delete()
+        rosters.add(enrollment)
+        transcripts.record_enrollment(enrollment)
+        audit.record(AuditEntry.ENROLLED, enrollment.id, enrollment.student_id, enrollment.course_id,
+                     {'grade': [None, enrollment.grade]} if enrollment.grade else None)
+        _notify([(enrollment.student_id, enrollment.course_id,
+                  _enrollment_event('created', enrollment.id, enrollment.course_id))])
+    return enrollment
+
+
+def unenroll(enrollment):
+    """Delete an enrollment and hand its seat to the first waitlisted student
+    who can take it"""
+    with tenancy.atomic():
+        # The caller's copy may predate a bulk grade change; the transcript
+        # must take back the grade that was actually counted
+        stored = list(Enrollment.all_terms.select_for_update().filter(pk=enrollment.pk)
+                      .values_list('grade', flat=True))
+        if not stored:
+            return None
+        enrollment.grade = stored[0]
+        Enrollment.all_terms.filter(pk=enrollment.pk).delete()
+        transcripts.record_unenrollment(enrollment)
+        audit.record(AuditEntry.UNENROLLED, enrollment.id, enrollment.student_id, enrollment.course_id,
+                     {'grade': [enrollment.grade, None]} if enrollment.grade else None)
+        _notify([(enrollment.student_id, enrollment.course_id,
+                  _enrollment_event('deleted', enrollment.id, enrollment.course_id))])
+
+        # Lock the entry so two concurrent drops don't promote the same student
+        entry = _next_promotable(enrollment.course_id, set())
+        if entry is None:
+            Course.all_terms.filter(pk=enrollment.course_id, enrolled_count__gt=0).update(
+                enrolled_count=F('enrolled_count') - 1
+            )
+            return None
+
+        entry.delete()
+        promoted = Enrollment.all_terms.create(student_id=entry.student_id, course_id=entry.course_id)
+        rosters.add(promoted)
+        transcripts.record_enrollment(promoted)
+        audit.record(AuditEntry.ENROLLED, promoted.id, promoted.student_id, promoted.course_id)
+        _notify([(promoted.student_id, promoted.course_id,
+                  _enrollment_event('created', promoted.id, promoted.course_id))])
+        return promoted
+
+
+def promote_waitlist(course_id):
+    """Move waitlisted students into any free seats, oldest eligible entry first"""
+    promoted, passed_over = [], set()
+    while True:
+        with tenancy.atomic():
+            entry = _next_promotable(course_id, passed_over)
+            if entry is None:
+                break
+            claimed = Course.all_terms.filter(_seat_available(), pk=course_id).update(
+                enrolled_count=F('enrolled_count') + 1
+            )
+            if not claimed:
+                break
+            entry.delete()
+            enrollment = Enrollment.all_terms.create(student_id=entry.student_id, course_id=course_id)
+            rosters.add(enrollment)
+            transcripts.record_enrollment(enrollment)
+            audit.record(AuditEntry.ENROLLED, enrollment.id, enrollment.student_id, enrollment.course_id)
+            _notify([(enrollment.student_id, course_id,
+                      _enrollment_event('created', enrollment.id, course_id))])
+        promoted.append(enrollment)
+    return promoted
+
+
+def bulk_unenroll(enrollments):
+    """Set-based unenroll of a queryset, then refill the freed seats.
+
+    Counts and rosters of the affected courses and transcripts of the affected
+    students are recomputed from the source tables rather than row by row.
+    Returns the number of enrollments removed.
+    """
+    rows = list(enrollments.values_list('pk', 'course_id', 'student_id', 'grade'))
+    if not rows:
+        return 0
+    course_ids = sorted({course_id for _, course_id, _, _ in rows})
+    student_ids = sorted({student_id for _, _, student_id, _ in rows})
+    with tenancy.atomic():
+        enrollments.delete()
+        rosters.rebuild(course_ids)
+        transcripts.rebuild(student_ids)
+        audit.record_many([(AuditEntry.UNENROLLED, pk, student_id, course_id,
+                            {'grade': [grade, None]} if grade else None)
+                           for pk, course_id, student_id, grade in rows])
+        _notify([(student_id, course_id, _enrollment_event('deleted', pk, course_id))
+                 for pk, course_id, student_id, _ in rows])
+    for course_id in course_ids:
+        promote_waitlist(course_id)
+    return len(rows)
+
+
+def bulk_set_grade(enrollments, grade):
+    """Set-based grade update of a queryset. Returns the number of rows changed."""
+    rows = list(enrollments.values_list('pk', 'student_id', 'course_id', 'grade'))
+    pks = [pk for pk, _, _, _ in rows]
+    with tenancy.atomic():
+        updated = Enrollment.all_terms.filter(pk__in=pks).update(grade=grade)
+        audit.record_many([(AuditEntry.GRADE_CHANGED, pk, student_id, course_id, {'grade': [old, grade]})
+                           for pk, student_id, course_id, old in rows if old != grade])
+        RosterEntry.objects.filter(enrollment_id__in=pks).update(grade=grade)
+        changefeed.record_bulk(Enrollment.all_terms.filter(pk__in=pks).select_related('course'),
+                               ChangeLogEntry.UPDATED)
+        transcripts.rebuild(sorted({student_id for _, student_id, _, _ in rows}))
+        _notify([(student_id, None, {'type': 'grade', 'enrollment': pk, 'course': course_id, 'grade': grade})
+                 for pk, student_id, course_id, _ in rows])
+    return updated
+
+
+def set_grade(enrollment, grade):
+    """Record a grade on an enrollment, its roster row and the student's transcript"""
+    with tenancy.atomic():
+        old_grade = (Enrollment.all_terms.select_for_update()
+                     .values_list('grade', flat=True).get(pk=enrollment.pk))
+        enrollment.grade = grade
+        enrollment.save(update_fields=['grade'])
+        rosters.update_grade(enrollment)
+        transcripts.record_grade_change(enrollment, old_grade)
+        if old_grade != grade:
+            audit.record(AuditEntry.GRADE_CHANGED, enrollment.pk, enrollment.student_id, enrollment.course_id,
+                         {'grade': [old_grade, grade]})
+        _notify([(enrollment.student_id, None, {
+            'type': 'grade', 'enrollment': enrollment.pk, 'course': enrollment.course_id, 'grade': grade,
+        })])
+    return enrollment
+
+
+def sync_course_term(course):
+    """Carry a course's term over to its enrollments after the course is moved"""
+    return Enrollment.all_terms.filter(course=course).exclude(term_id=course.term_id).update(term_id=course.term_id)
+
+
+def waitlist_position(entry):
+    """1-based position of a waitlist entry in its course queue"""
+    return WaitlistEntry.objects.filter(
+        Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id),
+        course_id=entry.course_id,
+    ).count() + 1
@@ -0,0 +1,171 @@
+import atexit
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .background import Flusher
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_MS': 100,          # log individual queries slower than this
+    'FLUSH_SECONDS': 30,     # write aggregates to QueryFingerprint this often
+    'MAX_PENDING': 2000,     # flush early once this many keys are buffered
+}
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_url_name = contextvars.ContextVar('sqllog_url_name', default='')
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%s|\?|:\w+|\$\d+')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_VALUES = re.compile(r'\bVALUES\s*(?:\((?:[^()]*)\)\s*,?\s*)+', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'SQL_LOG', {})}
+
+
+def normalize(sql):
+    """Strip literals and placeholders so equivalent statements compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES.sub('VALUES (...) ', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def caller():
+    """file:line of the innermost schoolApp frame that led to the query"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            rel = os.path.relpath(filename, os.path.dirname(_APP_DIR))
+            return f'{rel}:{frame.f_lineno} {frame.f_code.co_name}'[:200]
+        frame = frame.f_back
+    return ''
+
+
+class Aggregator:
+    """In-process per-(fingerprint, view, caller) totals, flushed in batches"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, key, sql, ms):
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [sql, 1, ms, ms]
+            else:
+                entry[1] += 1
+                entry[2] += ms
+                entry[3] = max(entry[3], ms)
+            return len(self._pending)
+
+    def due(self, conf):
+        return (time.monotonic() - self._last_flush >= conf['FLUSH_SECONDS']
+                or len(self._pending) >= conf['MAX_PENDING'])
+
+    def flush(self):
+        from .models import QueryFingerprint
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        now = timezone.now()
+        for (fp, url_name, where), (sql, count, total, slowest) in pending.items():
+            lookup = QueryFingerprint.objects.filter(fingerprint=fp, url_name=url_name, caller=where)
+            changes = {'count': F('count') + count, 'total_ms': F('total_ms') + total,
+                       'max_ms': Greatest(F('max_ms'), slowest), 'last_seen': now}
+            if lookup.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    QueryFingerprint.objects.create(
+                        fingerprint=fp, url_name=url_name, caller=where, sql=sql,
+                        count=count, total_ms=total, max_ms=slowest, last_seen=now)
+            except IntegrityError:
+                # Another process created it since our UPDATE
+                lookup.update(**changes)
+        return len(pending)
+
+
+_aggregator = Aggregator()
+_flusher = Flusher('sqllog-flush', _aggregator.flush)
+atexit.register(lambda: _aggregator.flush() if _aggregator._pending else None)
+
+
+def record(execute, sql, params, many, context):
+    """execute_wrapper that times a query and files it under its fingerprint"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        normalized = normalize(sql)
+        fp = fingerprint(normalized)
+        url_name, where = _url_name.get(), caller()
+        _aggregator.add((fp, url_name, where), normalized, ms)
+        if ms >= _conf()['SLOW_MS']:
+            logger.warning('Slow query %.1fms [%s] view=%s caller=%s: %s',
+                           ms, fp[:12], url_name or '-', where or '-', sql[:1000])
+
+
+def flush():
+    """Write buffered aggregates now; returns the number of keys written"""
+    return _aggregator.flush()
+
+
+class SlowQueryMiddleware:
+    """Time every query a request issues and attribute it to the URL name.
+
+    Aggregates are flushed on a background thread once due, so no request
+    waits for the write; its queries are not recorded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        conf = _conf()
+        if not conf['ENABLED']:
+            return self.get_response(request)
+        token = _url_name.set('')
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _url_name.reset(token)
+        if _aggregator.due(conf):
+            _flusher.kick()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _url_name.set((match.view_name if match else '')[:100])
+        return None
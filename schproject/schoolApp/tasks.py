@@ -0,0 +1,45 @@
+from .jobs import task
+from . import archive, changefeed, recommendations, reportcards, rosters, schedule, transcripts
+
+
+@task(priority=5)
+def init_transcript(student_id):
+    """Create a new student's transcript summary after registration"""
+    return transcripts.rebuild([student_id])
+
+
+@task(concurrency=1)
+def rebuild_rosters(course_ids=None):
+    return rosters.rebuild(course_ids)
+
+
+@task(concurrency=1)
+def rebuild_transcripts(student_ids=None):
+    return transcripts.rebuild(student_ids)
+
+
+@task(priority=-5, concurrency=1)
+def compact_changelog(days=30):
+    return changefeed.compact(days)
+
+
+@task(priority=-5, concurrency=1)
+def archive_closed_terms():
+    return archive.archive_closed_terms()
+
+
+@task(priority=-5)
+def schedule_conflict_report():
+    return {str(student_id): pairs for student_id, pairs in schedule.conflict_report().items()}
+
+
+@task(priority=-5, concurrency=1)
+def build_recommendations():
+    return recommendations.rebuild()
+
+
+@task(priority=-5, concurrency=1, max_attempts=1)
+def generate_report_cards(term=None, transcripts=False, student_ids=None, workers=None):
+    """Render a zip of report cards (or transcripts) under REPORT_CARDS['OUTPUT_DIR']"""
+    output = reportcards.output_path(term, transcripts)
+    return reportcards.generate(output, term, transcripts, student_ids, workers)
@@ -0,0 +1,255 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import JsonResponse
+
+DEFAULTS = {
+    'HEADER': 'X-School',          # slug of the school a request is for
+    'DEFAULT_SCHOOL': 'default',   # slug used when neither header nor host names one
+    'CACHE_SECONDS': 60,           # how long each process trusts its copy of the registry
+}
+
+# Models stored once in the registry database rather than per school
+GLOBAL_MODELS = {'schoolApp.school', 'schoolApp.job', 'schoolApp.queryfingerprint'}
+
+_current = contextvars.ContextVar('schoolapp_tenant', default=None)
+
+
+def _conf():
+    return {**DEFAULTS, **getattr(settings, 'TENANCY', {})}
+
+
+class UnknownSchool(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """The registry facts about a school a request needs"""
+    id: int
+    slug: str
+    database: str
+
+
+class Registry:
+    """Per-process copy of the School table (kept in the default database),
+    reloaded every CACHE_SECONDS"""
+
+    def __init__(self):
+        self._by_slug = {}
+        self._by_domain = {}
+        self._by_id = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from .models import School
+        rows = School.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'slug', 'domain', 'database')
+        by_slug, by_domain, by_id = {}, {}, {}
+        for school_id, slug, domain, database in rows:
+            tenant = Tenant(school_id, slug, database)
+            by_slug[slug] = by_id[school_id] = tenant
+            if domain:
+                by_domain[domain.lower()] = tenant
+        self._by_slug, self._by_domain, self._by_id = by_slug, by_domain, by_id
+
+    def _fresh(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > _conf()['CACHE_SECONDS']:
+                self._load()
+                self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def get(self, slug=None, domain=None, school_id=None):
+        self._fresh()
+        if school_id is not None:
+            return self._by_id.get(school_id)
+        if slug is not None:
+            return self._by_slug.get(slug)
+        return self._by_domain.get((domain or '').lower())
+
+    def all(self):
+        self._fresh()
+        return list(self._by_id.values())
+
+
+registry = Registry()
+
+
+def current():
+    """The Tenant of the active school, or None outside any school"""
+    return _current.get()
+
+
+def current_id():
+    tenant = _current.get()
+    return tenant.id if tenant else None
+
+
+def default_id():
+    """id of the DEFAULT_SCHOOL, for rows created outside a request"""
+    slug = _conf()['DEFAULT_SCHOOL']
+    tenant = registry.get(slug=slug) if slug else None
+    return tenant.id if tenant else None
+
+
+def db():
+    """Database alias holding the active school's rows"""
+    tenant = _current.get()
+    return tenant.database if tenant else DEFAULT_DB_ALIAS
+
+
+def _as_tenant(school):
+    if school is None or isinstance(school, Tenant):
+        return school
+    if isinstance(school, int):
+        tenant = registry.get(school_id=school)
+    elif isinstance(school, str):
+        tenant = registry.get(slug=school)
+    else:
+        tenant = Tenant(school.id, school.slug, school.database)
+    if tenant is None:
+        raise UnknownSchool(f'Unknown school {school!r}')
+    return tenant
+
+
+@contextmanager
+def use(school):
+    """Scope queries and writes to a school (a School, Tenant, id or slug);
+    None lifts the scoping"""
+    token = _current.set(_as_tenant(school))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def schools():
+    return registry.all()
+
+
+def atomic(savepoint=True):
+    """transaction.atomic() on the active school's database"""
+    return transaction.atomic(using=db(), savepoint=savepoint)
+
+
+def on_commit(func):
+    transaction.on_commit(func, using=db())
+
+
+def resolve(request):
+    """The school a request is for: the X-School header, else the host's
+    domain, else DEFAULT_SCHOOL. Raises UnknownSchool for a header naming no
+    school."""
+    conf = _conf()
+    slug = request.headers.get(conf['HEADER'])
+    if slug:
+        tenant = registry.get(slug=slug)
+        if tenant is None:
+            raise UnknownSchool(f'Unknown school {slug!r}')
+        return tenant
+    tenant = registry.get(domain=request.get_host().rsplit(':', 1)[0])
+    if tenant is None and conf['DEFAULT_SCHOOL']:
+        tenant = registry.get(slug=conf['DEFAULT_SCHOOL'])
+    return tenant
+
+
+class TenantMiddleware:
+    """Activate the request's school for everything after it, including
+    session and token authentication, which read the school's database"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            tenant = resolve(request)
+        except UnknownSchool as e:
+            return JsonResponse({'error': str(e)}, status=404)
+        request.school = tenant
+        token = _current.set(tenant)
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+
+
+def _member_key(tenant_id, user_id):
+    return f'school-member:{tenant_id}:{user_id}'
+
+
+def is_member(user, tenant=None):
+    """Whether the user may act in a school (the active one by default):
+    superusers anywhere, everyone else through a Student, Teacher or
+    StaffMember row of that school. Answers are cached (in the default
+    cache, so the entries expire and stay bounded) for CACHE_SECONDS."""
+    from .models import StaffMember, Student, Teacher
+    tenant = _current.get() if tenant is None else tenant
+    if tenant is None or user.is_superuser:
+        return True
+    key = _member_key(tenant.id, user.pk)
+    member = cache.get(key)
+    if member is None:
+        with use(tenant):
+            member = any(model.objects.filter(user_id=user.pk).exists()
+                         for model in (Student, Teacher, StaffMember))
+        cache.set(key, member, _conf()['CACHE_SECONDS'])
+    return member
+
+
+class MembershipMiddleware:
+    """Refuse session-authenticated users outside the request's school.
+    Token requests are checked by ExpiringTokenAuthentication, since DRF
+    authenticates them after the middleware has run."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and not is_member(user, getattr(request, 'school', None)):
+            return JsonResponse({'error': 'Not a member of this school'}, status=403)
+        return self.get_response(request)
+
+
+class TenantRouter:
+    """Send a school's rows to the database named in its School entry.
+
+    Every model except GLOBAL_MODELS lives in the school's database, users
+    and tokens included, so relations never cross databases. Schools in
+    'default' return None here and fall through to the next router (read
+    replicas). Each school database holds a copy of its own School row for
+    the foreign keys; `manage.py create_school` sets that up.
+    """
+
+    def _route(self, model, hints):
+        if model._meta.label_lower in GLOBAL_MODELS:
+            return None
+        tenant = _current.get()
+        if tenant is not None:
+            return tenant.database if tenant.database != DEFAULT_DB_ALIAS else None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS):
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {obj1._state.db, obj2._state.db}
+        school_databases = {t.database for t in registry.all()} - {DEFAULT_DB_ALIAS}
+        if len(databases) > 1 and databases & school_databases:
+            return False
+        return None
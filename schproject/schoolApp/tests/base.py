@@ -0,0 +1,52 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+from schoolApp import tenancy
+from schoolApp.models import Course, School, StaffMember, Student, Teacher
+
+
+def make_school(slug='default', database='default', **fields):
+    # Migrations already create the 'default' school
+    school, _ = School.objects.using('default').get_or_create(
+        slug=slug, defaults={'name': fields.pop('name', slug.title()), 'database': database, **fields})
+    if database != 'default':
+        school.save(using=database)
+    tenancy.registry.invalidate()
+    cache.clear()
+    return school
+
+
+def make_student(number, **fields):
+    user = User.objects.create_user(f'student{number}', f's{number}@example.com', 'pass12345',
+                                    first_name=fields.pop('first_name', 'Student'), last_name=str(number))
+    return Student.objects.create(user=user, student_id=f'S{number}',
+                                  date_of_birth=fields.pop('date_of_birth', datetime.date(2005, 1, 1)), **fields)
+
+
+def make_teacher(number=1, **fields):
+    user = User.objects.create_user(f'teacher{number}', f't{number}@example.com', 'pass12345',
+                                    first_name='Teacher', last_name=str(number))
+    return Teacher.objects.create(user=user, employee_id=f'E{number}',
+                                  subject_specialization=fields.pop('subject_specialization', 'math'), **fields)
+
+
+def make_course(code, teacher, **fields):
+    return Course.objects.create(name=fields.pop('name', code), code=code, teacher=teacher, **fields)
+
+
+def make_staff(username='staff'):
+    user = User.objects.create_user(username, f'{username}@example.com', 'pass12345', is_staff=True)
+    StaffMember.objects.create(user=user)
+    return user
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+# Journaled audit entries would outlive the test database
+no_audit = override_settings(AUDIT_LOG={'ENABLED': False})
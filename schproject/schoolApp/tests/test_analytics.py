@@ -0,0 +1,45 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from schoolApp import analytics, services
+from schoolApp.models import Enrollment
+from .base import make_course, make_school, make_student, make_teacher, no_audit
+
+
+@no_audit
+class GradeAnalyticsTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.first_teacher, self.second_teacher = make_teacher(1), make_teacher(2)
+        self.x = make_course('X100', self.first_teacher, credits=3)
+        self.y = make_course('Y100', self.second_teacher, credits=4)
+        self.first, self.second, self.third = make_student(1), make_student(2), make_student(3)
+        for student, course, grade in [(self.first, self.x, 'A'), (self.first, self.y, 'C+'),
+                                       (self.second, self.y, 'b- '), (self.third, self.x, None),
+                                       (self.third, self.y, 'P')]:
+            enrollment, _ = services.enroll(student, course.id)
+            if grade:
+                services.set_grade(enrollment, grade)
+
+    def test_gpa_and_histograms(self):
+        table = analytics.load_grades()
+        # Ungraded and unknown grades are dropped
+        self.assertEqual(len(table), 3)
+        self.assertEqual(analytics.student_gpa(table), {
+            self.first.id: (3.03, 7),    # (4.0 x 3 + 2.3 x 4) / 7
+            self.second.id: (2.7, 4),
+        })
+        by_course = analytics.histogram(table, by='course')
+        self.assertEqual({k: v for k, v in by_course[self.y.id].items() if v}, {'B-': 1, 'C+': 1})
+        by_teacher = analytics.histogram(table, by='teacher')
+        self.assertEqual(set(by_teacher), {self.first_teacher.id, self.second_teacher.id})
+        report = analytics.group_report(analytics.load_grades(Enrollment.all_terms.for_course(self.y.id)))
+        self.assertEqual((report['count'], report['average']), (2, 2.5))
+
+    def test_only_referenced_courses_are_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            table = analytics.load_grades(Enrollment.all_terms.filter(student=self.second))
+        self.assertEqual(table.credits.tolist(), [4])
+        self.assertEqual(table.teacher_ids.tolist(), [self.second_teacher.id])
+        course_query = queries.captured_queries[-1]['sql']
+        self.assertIn('IN (SELECT', course_query)
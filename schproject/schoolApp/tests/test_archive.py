@@ -0,0 +1,50 @@
+import datetime
+from django.test import TestCase
+from schoolApp import archive, rosters, services, transcripts
+from schoolApp.models import Course, EnrollmentArchive, Term
+from .base import client_for, make_course, make_school, make_staff, make_student, make_teacher, no_audit
+
+
+@no_audit
+class ArchiveTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.spring = Term.objects.create(name='Spring', code='S26', start_date=datetime.date(2026, 1, 10),
+                                          end_date=datetime.date(2026, 5, 30), is_current=True)
+        self.course = make_course('M101', make_teacher(), max_seats=5)
+        self.students = [make_student(i) for i in range(3)]
+        for student in self.students:
+            services.enroll(student, self.course.id)
+
+    def _close_spring(self):
+        Term.objects.create(name='Fall', code='F26', start_date=datetime.date(2026, 9, 1),
+                            end_date=datetime.date(2026, 12, 20), is_current=True)
+        Term.objects.filter(pk=self.spring.pk).update(closed=True)
+        self.spring.refresh_from_db()
+
+    def test_open_term_is_refused(self):
+        with self.assertRaises(archive.TermNotClosed):
+            archive.archive_term(self.spring)
+
+    def test_archiving_releases_seats_and_keeps_rosters_consistent(self):
+        self._close_spring()
+        self.assertEqual(archive.archive_term(self.spring, batch_size=2, pause=0), 3)
+        self.assertEqual(EnrollmentArchive.objects.count(), 3)
+        self.assertEqual(Course.all_terms.get(pk=self.course.pk).enrolled_count, 0)
+        self.assertEqual(rosters.check(), {'counts': [], 'missing_entries': [], 'stale_entries': []})
+
+    def test_grade_analytics_include_archived_terms(self):
+        for student, grade in zip(self.students, ['A', 'B', 'C']):
+            services.set_grade(student.enrollment_set.get(), grade)
+        self._close_spring()
+        archive.archive_term(self.spring, pause=0)
+        client = client_for(make_staff())
+
+        response = client.get(f'/api/analytics/students/{self.students[0].id}/gpa/')
+        self.assertEqual(response.data['gpa'], 4.0)
+        self.assertEqual(response.data['gpa'], transcripts.summary_for(self.students[0]).gpa)
+        response = client.get(f'/api/analytics/courses/{self.course.id}/grades/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        response = client.get(f'/api/analytics/teachers/{self.course.teacher_id}/grades/')
+        self.assertEqual(response.data['count'], 3)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from schoolApp.models import AuthToken
+from .base import make_school, make_student, no_audit
+
+
+@no_audit
+class TokenTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.student = make_student(1)
+
+    def login(self, device=None, **headers):
+        data = {'username': 'student1', 'password': 'pass12345'}
+        if device is not None:
+            data['device'] = device
+        return APIClient().post('/api/auth/login/', data, format='json', **headers)
+
+    def client_with(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        return client
+
+    def test_device_id_is_required(self):
+        response = self.login(HTTP_USER_AGENT='Dart/3.3 (dart:io)')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AuthToken.objects.exists())
+        self.assertEqual(self.login(HTTP_X_DEVICE_ID='phone-1').status_code, 200)
+
+    def test_login_rotates_the_devices_key(self):
+        first = self.login('phone').data['token']
+        second = self.login('phone').data['token']
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.client_with(first).get('/api/auth/profile/').status_code, 401)
+        self.assertEqual(self.client_with(second).get('/api/auth/profile/').status_code, 200)
+
+    def test_logout_signs_out_only_that_device(self):
+        phone = self.login('phone').data['token']
+        tablet = self.login('tablet').data['token']
+        self.assertEqual(self.client_with(phone).post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client_with(phone).get('/api/auth/profile/').status_code, 401)
+        self.assertEqual(self.client_with(tablet).get('/api/auth/profile/').status_code, 200)
+
+    def test_expired_token_is_refused(self):
+        key = self.login('phone').data['token']
+        AuthToken.objects.filter(pk=key).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client_with(key).get('/api/auth/profile/').status_code, 401)
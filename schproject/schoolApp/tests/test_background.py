@@ -0,0 +1,62 @@
+import threading
+from unittest import mock
+from django.test import TestCase, override_settings
+from schoolApp import audit, sqllog
+from schoolApp.background import Flusher
+from .base import client_for, make_school, make_student
+
+
+class FlusherTests(TestCase):
+    def test_flush_runs_off_the_calling_thread(self):
+        ran = threading.Event()
+        threads = []
+
+        def flush():
+            threads.append(threading.current_thread())
+            ran.set()
+
+        flusher = Flusher('test-flush', flush)
+        flusher.kick()
+        self.assertTrue(ran.wait(5))
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_failures_do_not_stop_the_thread(self):
+        ran = threading.Event()
+        calls = iter([RuntimeError('database away'), None])
+
+        def flaky():
+            outcome = next(calls)
+            if outcome is not None:
+                raise outcome
+            ran.set()
+
+        flusher = Flusher('test-flush', flaky)
+        with self.assertLogs('schoolApp.background', 'ERROR'):
+            for _ in range(100):
+                flusher.kick()
+                if ran.wait(0.05):
+                    break
+        self.assertTrue(ran.is_set())
+
+
+class MiddlewareFlushTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.client = client_for(make_student(1).user)
+
+    @override_settings(SQL_LOG={'ENABLED': True, 'FLUSH_SECONDS': 0})
+    def test_query_statistics_are_handed_off(self):
+        self.addCleanup(sqllog._aggregator._pending.clear)
+        with mock.patch.object(sqllog._flusher, 'kick') as kick, \
+                mock.patch.object(sqllog._aggregator, 'flush') as flush:
+            self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+        kick.assert_called()
+        flush.assert_not_called()
+
+    def test_audit_journal_is_handed_off(self):
+        with mock.patch.object(audit.Journal, 'due', return_value=True), \
+                mock.patch.object(audit._flusher, 'kick') as kick, \
+                mock.patch.object(audit.Journal, 'flush') as flush:
+            self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+        kick.assert_called()
+        flush.assert_not_called()
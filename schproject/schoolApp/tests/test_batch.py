@@ -0,0 +1,42 @@
+import os
+import tempfile
+from django.test import TestCase
+from schoolApp import tasks
+from schoolApp.models import Job
+from .base import client_for, make_course, make_school, make_staff, make_student, make_teacher, no_audit
+
+
+@no_audit
+class BatchTests(TestCase):
+    def setUp(self):
+        self.school = make_school()
+        self.teacher = make_teacher()
+        make_course('M101', self.teacher)
+        make_course('M102', self.teacher)
+        self.client = client_for(make_student(1).user)
+
+    def batch(self, *paths):
+        response = self.client.post('/api/batch/', {'requests': list(paths)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['responses']
+
+    def test_sub_calls_share_one_identity_map(self):
+        first, second = self.batch('courses/', 'courses/')
+        self.assertEqual([first['status'], second['status']], [200, 200])
+        teachers = [course['teacher'] for course in first['body']['results'] + second['body']['results']]
+        self.assertTrue(all(teacher is teachers[0] for teacher in teachers))
+
+    def test_async_views_are_refused(self):
+        events, courses = self.batch('events/', 'courses/')
+        self.assertEqual(events['status'], 400)
+        self.assertEqual(courses['status'], 200)
+
+    def test_streaming_responses_are_refused(self):
+        fd, path = tempfile.mkstemp(suffix='.zip')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        job = tasks.generate_report_cards.enqueue()
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE, result={'output': path}, school=self.school)
+        self.client = client_for(make_staff())
+        [download] = self.batch(f'report-cards/{job.id}/download/')
+        self.assertEqual(download['status'], 400)
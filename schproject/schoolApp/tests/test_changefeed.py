@@ -0,0 +1,45 @@
+from django.test import TestCase
+from schoolApp import changefeed, tenancy
+from schoolApp.models import ChangeLogEntry
+from .base import make_course, make_school, make_staff, make_teacher
+
+
+class SequenceTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.staff = make_staff()
+
+    def sync(self, since):
+        with tenancy.use('default'):
+            entries, next_seq, _ = changefeed.changes_since(self.staff, None, since)
+        return {(e.model, e.object_id) for e in entries}, next_seq
+
+    def test_slow_writer_is_not_skipped(self):
+        with tenancy.use('default'):
+            teacher = make_teacher()
+            slow = make_course('S100', teacher)
+            fast = make_course('F100', teacher)
+            # The slow writer's entry was inserted first but has not committed
+            # yet when the client syncs
+            entry = ChangeLogEntry.objects.get(model='course', object_id=slow.id)
+            entry.delete()
+        seen, cursor = self.sync(0)
+        self.assertIn(('course', fast.id), seen)
+        self.assertNotIn(('course', slow.id), seen)
+
+        with tenancy.use('default'):
+            entry.save(force_insert=True)  # the commit, keeping its earlier id
+        seen, _ = self.sync(cursor)
+        self.assertEqual(seen, {('course', slow.id)})
+
+    def test_seq_is_numbered_once_in_order(self):
+        with tenancy.use('default'):
+            teacher = make_teacher()
+            make_course('A100', teacher)
+            self.assertTrue(ChangeLogEntry.objects.filter(seq__isnull=True).exists())
+            changefeed.sequence()
+            first = list(ChangeLogEntry.objects.order_by('id').values_list('seq', flat=True))
+            changefeed.sequence()
+            self.assertEqual(list(ChangeLogEntry.objects.order_by('id').values_list('seq', flat=True)), first)
+        self.assertEqual(first, sorted(first))
+        self.assertNotIn(None, first)
@@ -0,0 +1,135 @@
+import datetime
+import threading
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase
+from schoolApp import prereqs, schedule, services
+from schoolApp.models import Course, Enrollment, WaitlistEntry
+from .base import client_for, make_course, make_school, make_student, make_teacher, no_audit
+
+
+@no_audit
+class EnrollTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.course = make_course('M101', make_teacher(), max_seats=1)
+        self.students = [make_student(i) for i in range(3)]
+
+    def test_full_course_waitlists(self):
+        _, waitlisted = services.enroll(self.students[0], self.course.id)
+        self.assertFalse(waitlisted)
+        entry, waitlisted = services.enroll(self.students[1], self.course.id)
+        self.assertTrue(waitlisted)
+        self.assertEqual(services.waitlist_position(entry), 1)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).enrolled_count, 1)
+
+    def test_duplicates_are_rejected(self):
+        services.enroll(self.students[0], self.course.id)
+        with self.assertRaises(services.AlreadyEnrolled):
+            services.enroll(self.students[0], self.course.id)
+        services.enroll(self.students[1], self.course.id)
+        with self.assertRaises(services.AlreadyWaitlisted):
+            services.enroll(self.students[1], self.course.id)
+
+    def test_unenroll_promotes_head_of_waitlist(self):
+        enrollment, _ = services.enroll(self.students[0], self.course.id)
+        services.enroll(self.students[1], self.course.id)
+        services.enroll(self.students[2], self.course.id)
+        promoted = services.unenroll(enrollment)
+        self.assertEqual(promoted.student_id, self.students[1].id)
+        self.assertEqual(list(WaitlistEntry.objects.values_list('student_id', flat=True)), [self.students[2].id])
+        self.assertEqual(Course.objects.get(pk=self.course.pk).enrolled_count, 1)
+
+    def test_raising_capacity_through_the_api_promotes(self):
+        services.enroll(self.students[0], self.course.id)
+        services.enroll(self.students[1], self.course.id)
+        response = client_for(self.course.teacher.user).patch(
+            f'/api/courses/{self.course.id}/', {'max_seats': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Enrollment.objects.filter(student=self.students[1], course=self.course).exists())
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+
+    def _waitlist_with_ineligible_heads(self):
+        """students[0] holds the seat; students[1] then takes a clashing
+        course and students[2] lacks a new prerequisite, so only students[3]
+        can take a freed seat"""
+        nine = {'day': 0, 'start_time': datetime.time(9), 'end_time': datetime.time(10)}
+        schedule.set_meetings(self.course, [nine])
+        clashing = make_course('P101', self.course.teacher)
+        schedule.set_meetings(clashing, [nine])
+        enrollment, _ = services.enroll(self.students[0], self.course.id)
+        self.students.append(make_student(3))
+        for student in self.students[1:]:
+            services.enroll(student, self.course.id)
+        services.enroll(self.students[1], clashing.id)
+        prereqs.add(self.course.id, make_course('B100', self.course.teacher).id)
+        basics = Course.objects.get(code='B100')
+        services.enroll(self.students[2], basics.id)
+        passed, _ = services.enroll(self.students[3], basics.id)
+        services.set_grade(passed, 'A')
+        return enrollment
+
+    def test_unenroll_passes_over_ineligible_students(self):
+        enrollment = self._waitlist_with_ineligible_heads()
+        promoted = services.unenroll(enrollment)
+        self.assertEqual(promoted.student_id, self.students[3].id)
+        self.assertEqual(list(WaitlistEntry.objects.order_by('id').values_list('student_id', flat=True)),
+                         [self.students[1].id, self.students[2].id])
+
+    def test_promotion_passes_over_ineligible_students(self):
+        self._waitlist_with_ineligible_heads()
+        Course.objects.filter(pk=self.course.pk).update(max_seats=4)
+        promoted = services.promote_waitlist(self.course.id)
+        self.assertEqual([e.student_id for e in promoted], [self.students[3].id])
+        self.assertEqual(Course.objects.get(pk=self.course.pk).enrolled_count, 2)
+
+@no_audit
+class EnrollStressTests(TransactionTestCase):
+    """Many threads racing for the seats of one course"""
+    seats = 10
+    extra = 15
+
+    def setUp(self):
+        make_school()
+        self.course = make_course('HOT1', make_teacher(), max_seats=self.seats)
+        self.students = [make_student(i) for i in range(self.seats + self.extra)]
+
+    def _enroll(self, student, results, start):
+        start.wait()
+        try:
+            for _ in range(50):
+                try:
+                    results[student.id] = services.enroll(student, self.course.id)
+                    return
+                except OperationalError:
+                    # SQLite reports lock contention instead of waiting; like a
+                    # deadlock on MySQL, the whole attempt is retried
+                    continue
+        finally:
+            close_old_connections()
+
+    def test_no_overbooking(self):
+        results, start = {}, threading.Event()
+        threads = [threading.Thread(target=self._enroll, args=(s, results, start)) for s in self.students]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(results), len(self.students))
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual(course.enrolled_count, self.seats)
+        self.assertEqual(Enrollment.objects.filter(course=course).count(), self.seats)
+
+        # The waitlist holds the rest, in the order they were turned away
+        waitlisted = sorted((obj.id, student_id) for student_id, (obj, waitlisted) in results.items() if waitlisted)
+        queue = list(WaitlistEntry.objects.filter(course=course).order_by('created_at', 'id')
+                     .values_list('id', 'student_id'))
+        self.assertEqual(len(queue), self.extra)
+        self.assertEqual(queue, waitlisted)
+
+        # Freed seats go to the head of the queue
+        services.unenroll(Enrollment.objects.filter(course=course).first())
+        self.assertTrue(Enrollment.objects.filter(course=course, student_id=queue[0][1]).exists())
+        self.assertEqual(Course.objects.get(pk=course.pk).enrolled_count, self.seats)
@@ -0,0 +1,71 @@
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from schoolApp import idempotency
+from .base import make_student
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        caches[idempotency.CACHE_ALIAS].clear()
+        self.user = make_student(1).user
+        self.calls = []
+        self.during_view = None
+
+        @api_view(['POST'])
+        @permission_classes([IsAuthenticated])
+        @idempotency.idempotent
+        def view(request):
+            self.calls.append(request.data)
+            if self.during_view:
+                # A second request with the same key arrives while this one runs
+                during, self.during_view = self.during_view, None
+                self.concurrent = during()
+            return Response({'call': len(self.calls)}, status=status.HTTP_201_CREATED)
+        self.view = view
+
+    def post(self, data, key='key-1'):
+        request = APIRequestFactory().post('/api/things/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, self.user)
+        return self.view(request)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post({'course': 1})
+        retry = self.post({'course': 1})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_duplicate_while_the_first_is_running_is_a_conflict(self):
+        self.during_view = lambda: self.post({'course': 1})
+        first = self.post({'course': 1})
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.concurrent.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_response_stored_between_read_and_lock_is_replayed(self):
+        self.post({'course': 1})
+        store = caches[idempotency.CACHE_ALIAS]
+        real_get = store.get
+        reads = []
+
+        def miss_first_read(key, *args, **kwargs):
+            reads.append(key)
+            return None if len(reads) == 1 else real_get(key, *args, **kwargs)
+
+        with mock.patch.object(store, 'get', side_effect=miss_first_read):
+            retry = self.post({'course': 1})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertTrue(store.add(reads[0] + ':lock', True))  # the lock was released
+
+    def test_same_key_with_a_different_body_is_rejected(self):
+        self.post({'course': 1})
+        response = self.post({'course': 2})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(len(self.calls), 1)
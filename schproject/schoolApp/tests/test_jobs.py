@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from schoolApp import jobs, tenancy
+from schoolApp.models import Job
+from .base import make_school
+
+HAS_SCHOOL_DB = 'school2' in settings.DATABASES
+
+
+def _nap(seconds):
+    time.sleep(seconds)
+    return 'rested'
+
+
+TASKS = {
+    'capped': jobs.Task(_nap, 'capped', 0, 3, 1),
+    'open': jobs.Task(_nap, 'open', 0, 3, None),
+}
+
+
+@mock.patch.dict(jobs._registry, TASKS)
+class ClaimTests(TestCase):
+    def setUp(self):
+        make_school()
+
+    def test_concurrency_cap(self):
+        first = TASKS['capped'].enqueue(0, priority=5)
+        TASKS['capped'].enqueue(0, priority=5)
+        other = TASKS['open'].enqueue(0)
+        self.assertEqual(jobs.claim('w1').id, first.id)
+        self.assertEqual(jobs.claim('w2').id, other.id)
+        self.assertIsNone(jobs.claim('w3'))
+
+    def test_reclaims_jobs_without_a_recent_heartbeat(self):
+        long_ago = timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 60)
+        alive = TASKS['open'].enqueue(0)
+        dead = TASKS['open'].enqueue(0)
+        Job.objects.filter(pk=alive.pk).update(status=Job.RUNNING, worker='w1', attempts=1,
+                                               started_at=long_ago, heartbeat_at=timezone.now())
+        Job.objects.filter(pk=dead.pk).update(status=Job.RUNNING, worker='w2', attempts=1,
+                                              started_at=long_ago, heartbeat_at=long_ago)
+        job = jobs.claim('w3')
+        self.assertEqual((job.id, job.attempts), (dead.id, 2))
+        self.assertIsNone(jobs.claim('w4'))
+
+    def test_job_abandoned_on_its_last_attempt_fails(self):
+        long_ago = timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 60)
+        poison = TASKS['open'].enqueue(0)
+        Job.objects.filter(pk=poison.pk).update(status=Job.RUNNING, worker='w1', attempts=3,
+                                                started_at=long_ago, heartbeat_at=long_ago)
+        self.assertIsNone(jobs.claim('w2'))
+        poison.refresh_from_db()
+        self.assertEqual((poison.status, poison.attempts, poison.worker), (Job.FAILED, 3, ''))
+        self.assertIsNotNone(poison.finished_at)
+
+    def test_outcome_of_a_reclaimed_job_is_dropped(self):
+        TASKS['open'].enqueue(0)
+        job = jobs.claim('w1')
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, worker='w2')
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.result), (Job.RUNNING, 'w2', None))
+
+
+@mock.patch.dict(jobs._registry, TASKS)
+@mock.patch.object(jobs, 'HEARTBEAT_SECONDS', 0.05)
+class HeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        make_school()
+
+    def test_running_job_keeps_its_heartbeat_fresh(self):
+        TASKS['open'].enqueue(0.5)
+        job = jobs.claim('w1')
+        claimed_at = job.heartbeat_at
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.DONE, 'rested'))
+        self.assertGreater(job.heartbeat_at, claimed_at)
+
+
+@mock.patch.dict(jobs._registry, TASKS)
+@skipUnless(HAS_SCHOOL_DB, 'needs the school2 database of schproject.test_settings')
+class EnqueueOnSchoolDatabaseTests(TestCase):
+    databases = {'default', 'school2'} if HAS_SCHOOL_DB else {'default'}
+
+    def setUp(self):
+        make_school('east', database='school2')
+
+    def test_insert_waits_for_the_schools_commit(self):
+        with tenancy.use('east'):
+            with self.captureOnCommitCallbacks(using='school2', execute=True):
+                with tenancy.atomic():
+                    job = TASKS['open'].enqueue(0)
+                    self.assertIsNone(job.pk)
+                    self.assertFalse(Job.objects.exists())
+        self.assertTrue(Job.objects.filter(pk=job.pk, school__slug='east').exists())
+
+    def test_rolled_back_enqueue_is_dropped(self):
+        with tenancy.use('east'):
+            with self.captureOnCommitCallbacks(using='school2', execute=True):
+                try:
+                    with tenancy.atomic():
+                        TASKS['open'].enqueue(0)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,141 @@
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.db import OperationalError
+from django.test import TestCase
+from schoolApp import push, services, tenancy
+from schoolApp.models import Enrollment
+from .base import make_course, make_school, make_student, make_teacher, no_audit
+
+HAS_SCHOOL_DB = 'school2' in settings.DATABASES
+
+
+@no_audit
+@skipUnless(HAS_SCHOOL_DB, 'needs the school2 database of schproject.test_settings')
+class ChangeLogBrokerTests(TestCase):
+    databases = {'default', 'school2'} if HAS_SCHOOL_DB else {'default'}
+
+    def setUp(self):
+        make_school()
+        make_school('north', database='school2')
+        self.broker = push.ChangeLogBroker(poll_seconds=1.0)
+        self.broker.poll_all()  # start both cursors at the current end of the log
+        patcher = mock.patch.object(push, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enroll(self, school, number):
+        with tenancy.use(school), self.captureOnCommitCallbacks(using=tenancy.db(), execute=True):
+            student = make_student(number)
+            course = make_course(f'C{number}', make_teacher(number))
+            services.enroll(student, course.id)
+        return student
+
+    def test_every_school_database_is_polled(self):
+        here = self.enroll('default', 1)
+        north = self.enroll('north', 2)
+        with mock.patch.object(self.broker, 'deliver') as deliver:
+            self.broker.poll_all()
+        delivered = [users for (users, _), _ in deliver.call_args_list]
+        self.assertIn(here.user_id, delivered[0])
+        self.assertIn(north.user_id, delivered[1])
+
+    def test_failing_database_backs_off_without_stopping_the_others(self):
+        north = self.enroll('north', 2)
+        poll = self.broker._poll
+
+        def failing(alias):
+            if alias == 'default':
+                raise OperationalError('database away')
+            poll(alias)
+
+        with mock.patch.object(self.broker, '_poll', side_effect=failing), \
+                mock.patch.object(self.broker, 'deliver') as deliver, \
+                self.assertLogs('schoolApp.push', 'WARNING'):
+            self.broker.poll_all()
+            self.broker.poll_all()
+        self.assertEqual(self.broker._failures['default'][0], 1)
+        self.assertIn(north.user_id, deliver.call_args.args[0])
+
+        self.broker.poll_all()
+        self.assertEqual(self.broker._failures['default'][0], 1)  # still waiting out the backoff
+
+    def test_late_event_is_still_delivered(self):
+        self.enroll('default', 1)
+        self.broker.poll_all()
+        late = self.enroll('default', 2)
+        # An event with a lower seq than the cursor that became visible late
+        self.broker._cursors['default'] += 10
+        with mock.patch.object(self.broker, 'deliver') as deliver:
+            self.broker.poll_all()
+            self.broker.poll_all()
+        self.assertEqual(deliver.call_count, 1)
+        self.assertIn(late.user_id, deliver.call_args.args[0])
+
+
+class BrokerEventsMixin:
+    """The same enrollment scenario must reach the same users with the same
+    payloads whichever backend is configured"""
+
+    def make_broker(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        make_school()
+        self.broker = self.make_broker()
+        patcher = mock.patch.object(push, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.delivered = []
+        deliver = self.broker.deliver
+
+        def record(user_ids, event):
+            self.delivered.append((sorted(user_ids), event))
+            deliver(user_ids, event)
+        patcher = mock.patch.object(self.broker, 'deliver', side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self):
+        pass
+
+    def test_enrollment_grade_and_waitlist_events(self):
+        with tenancy.use('default'):
+            teacher = make_teacher()
+            course = make_course('P100', teacher, max_seats=1)
+            first, second = make_student(1), make_student(2)
+            self.drain()
+            with self.captureOnCommitCallbacks(execute=True):
+                enrollment, _ = services.enroll(first, course.id)
+                services.enroll(second, course.id)
+                services.set_grade(enrollment, 'A')
+                services.bulk_set_grade(Enrollment.all_terms.filter(pk=enrollment.pk), 'B')
+                promoted = services.unenroll(enrollment)
+            self.drain()
+
+        both = sorted([first.user_id, teacher.user_id])
+        self.assertEqual(self.delivered, [
+            (both, {'type': 'enrollment', 'action': 'created', 'enrollment': enrollment.pk, 'course': course.id}),
+            ([second.user_id], {'type': 'waitlist', 'action': 'created', 'course': course.id}),
+            ([first.user_id], {'type': 'grade', 'enrollment': enrollment.pk, 'course': course.id, 'grade': 'A'}),
+            ([first.user_id], {'type': 'grade', 'enrollment': enrollment.pk, 'course': course.id, 'grade': 'B'}),
+            (both, {'type': 'enrollment', 'action': 'deleted', 'enrollment': enrollment.pk, 'course': course.id}),
+            (sorted([second.user_id, teacher.user_id]),
+             {'type': 'enrollment', 'action': 'created', 'enrollment': promoted.pk, 'course': course.id}),
+        ])
+
+
+@no_audit
+class LocalBrokerEventTests(BrokerEventsMixin, TestCase):
+    def make_broker(self):
+        return push.LocalBroker()
+
+
+@no_audit
+class ChangeLogBrokerEventTests(BrokerEventsMixin, TestCase):
+    def make_broker(self):
+        broker = push.ChangeLogBroker(poll_seconds=1.0)
+        broker.poll_all()
+        return broker
+
+    def drain(self):
+        self.broker.poll_all()
@@ -0,0 +1,43 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from schoolApp import services, tenancy
+from schoolApp.models import Student
+from .base import make_course, make_school, make_student, make_teacher, no_audit
+
+
+@no_audit
+class GenerateReportCardsTests(TestCase):
+    def setUp(self):
+        make_school()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = os.path.join(directory, 'cards.zip')
+
+    def generate(self, *args):
+        call_command('generate_report_cards', self.output, '--workers', '1', *args, stdout=io.StringIO())
+        with zipfile.ZipFile(self.output) as archive:
+            return archive.namelist()
+
+    def test_unknown_school_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, "Unknown school 'nowhere'"):
+            call_command('generate_report_cards', self.output, '--school', 'nowhere', stdout=io.StringIO())
+
+    def test_unknown_term_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, "Unknown term 'X99'"):
+            call_command('generate_report_cards', self.output, '--term', 'X99', stdout=io.StringIO())
+
+    def test_student_numbers_that_sanitize_alike_get_separate_files(self):
+        with tenancy.use('default'):
+            course = make_course('M100', make_teacher())
+            first, second = make_student(1), make_student(2)
+            Student.objects.filter(pk=first.pk).update(student_id='S/1')
+            Student.objects.filter(pk=second.pk).update(student_id='S1')
+            for student in (first, second):
+                services.enroll(student, course.id)
+        names = self.generate('--transcripts')
+        self.assertEqual(sorted(names), [f'S1-{first.pk}.pdf', f'S1-{second.pk}.pdf'])
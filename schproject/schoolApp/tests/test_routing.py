@@ -0,0 +1,63 @@
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from schoolApp import routing
+from schoolApp.authentication import issue_token
+from schoolApp.models import School
+from .base import make_course, make_school, make_student, make_teacher, no_audit
+
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@no_audit
+@skipUnless(HAS_REPLICA, 'needs the replica database of schproject.test_settings')
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica'], 'STICKY_SECONDS': 60, 'HEALTH_CHECK_INTERVAL': 0})
+class ReplicaRoutingTests(TransactionTestCase):
+    # 'replica' never receives the primary's writes, like a replica lagging
+    # forever: a read that reaches it cannot see the token issued at login.
+    # Being listed as a replica, it is not flushed between tests either.
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.school = make_school()
+        self.student = make_student(1)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'username': 'student1', 'password': 'pass12345', 'device': 'phone'})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+
+    def test_new_token_reads_from_the_primary(self):
+        self.login()
+        self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+
+    def test_reads_go_to_the_replica_once_the_pin_expires(self):
+        self.login()
+        cache.clear()
+        self.assertEqual(self.client.get('/api/courses/').status_code, 401)
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        self.login()
+        cache.clear()
+        with mock.patch.object(routing.health, 'is_healthy', return_value=False):
+            self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+
+    def test_write_pins_the_user_across_clients(self):
+        self.login()
+        # A second device whose token has already replicated
+        other = APIClient()
+        token = issue_token(self.student.user, 'tablet')
+        School.objects.using('replica').filter(slug=self.school.slug).delete()
+        for obj in (self.school, self.student.user, self.student, token):
+            obj.save(using='replica')
+        other.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        make_course('M101', make_teacher())
+        cache.clear()
+        self.assertNotContains(other.get('/api/courses/'), 'M101')
+
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertContains(other.get('/api/courses/'), 'M101')
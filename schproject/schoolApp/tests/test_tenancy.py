@@ -0,0 +1,148 @@
+from unittest import skipUnless
+from django.conf import settings
+from django.test import Client, TestCase
+from rest_framework.test import APIClient
+from schoolApp import admin as school_admin, prereqs, services, tasks, tenancy
+from schoolApp.authentication import issue_token
+from schoolApp.models import Course, Enrollment, WaitlistEntry
+from .base import client_for, make_course, make_school, make_staff, make_student, make_teacher, no_audit
+
+
+@no_audit
+class TenancyTests(TestCase):
+    def setUp(self):
+        make_school()
+        self.north = make_school('north')
+        self.teacher = make_teacher()
+        self.course = make_course('M101', self.teacher)
+        self.student = make_student(1)
+        with tenancy.use('north'):
+            self.north_teacher = make_teacher(2)
+            self.north_course = make_course('N101', self.north_teacher)
+
+    def test_querysets_follow_the_active_school(self):
+        with tenancy.use('north'):
+            self.assertEqual(list(Course.objects.values_list('code', flat=True)), ['N101'])
+        with tenancy.use('default'):
+            self.assertEqual(list(Course.objects.values_list('code', flat=True)), ['M101'])
+
+    def test_unknown_school_header(self):
+        response = client_for(self.teacher.user).get('/api/courses/', HTTP_X_SCHOOL='nowhere')
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_is_refused_outside_its_school(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + issue_token(self.student.user).key)
+        self.assertEqual(client.get('/api/courses/').status_code, 200)
+        self.assertEqual(client.get('/api/courses/', HTTP_X_SCHOOL='north').status_code, 401)
+
+    def test_registered_user_belongs_to_the_school(self):
+        response = APIClient().post('/api/auth/register/admin/', {
+            'username': 'office', 'email': 'office@example.com', 'first_name': 'Front', 'last_name': 'Office',
+            'password': 'pass12345', 'password_confirm': 'pass12345', 'device': 'desk'})
+        self.assertEqual(response.status_code, 201)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        self.assertEqual(client.get('/api/courses/').status_code, 200)
+        self.assertEqual(client.get('/api/courses/', HTTP_X_SCHOOL='north').status_code, 401)
+
+    def test_session_is_refused_outside_its_school(self):
+        client = Client()
+        client.force_login(self.student.user)
+        self.assertEqual(client.get('/api/courses/', HTTP_X_SCHOOL='north').status_code, 403)
+
+    def test_staff_need_membership(self):
+        staff = make_staff()
+        self.assertTrue(tenancy.is_member(staff, tenancy.registry.get(slug='default')))
+        self.assertFalse(tenancy.is_member(staff, tenancy.registry.get(slug='north')))
+
+    def test_sync_only_returns_the_schools_changes(self):
+        staff = make_staff()
+        response = client_for(staff).get('/api/sync/?since=0')
+        seen = {(c['model'], c['id']) for c in response.data['changes']}
+        self.assertIn(('course', self.course.id), seen)
+        self.assertNotIn(('course', self.north_course.id), seen)
+
+    def test_course_lookups_stay_in_the_school(self):
+        services.enroll(self.student, self.course.id)
+        client = client_for(self.north_teacher.user)
+        theirs, ours = self.course.id, self.north_course.id
+        for path in ('students/', 'students/?compact=1', 'recommendations/'):
+            self.assertEqual(client.get(f'/api/courses/{theirs}/{path}', HTTP_X_SCHOOL='north').status_code, 404)
+            self.assertEqual(client.get(f'/api/courses/{ours}/{path}', HTTP_X_SCHOOL='north').status_code, 200)
+        response = client.put(f'/api/courses/{theirs}/meetings/', {'meetings': []}, format='json',
+                              HTTP_X_SCHOOL='north')
+        self.assertEqual(response.status_code, 404)
+
+    def test_enrolling_in_another_schools_course(self):
+        prereqs.add(self.course.id, make_course('M001', self.teacher).id)
+        with tenancy.use('north'):
+            student = make_student(2)
+        response = client_for(student.user).post('/api/students/enroll/', {'course_id': self.course.id},
+                                                  format='json', HTTP_X_SCHOOL='north')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotContains(response, 'M001', status_code=404)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_jobs_belong_to_the_school_that_queued_them(self):
+        with tenancy.use('default'):
+            job = tasks.init_transcript.enqueue(self.student.id)
+        self.assertEqual(job.school_id, tenancy.registry.get(slug='default').id)
+        with tenancy.use('north'):
+            north_staff = make_staff('northstaff')
+        self.assertEqual(client_for(north_staff).get(f'/api/jobs/{job.id}/', HTTP_X_SCHOOL='north').status_code, 404)
+        self.assertEqual(client_for(make_staff()).get(f'/api/jobs/{job.id}/').status_code, 200)
+        metrics = client_for(north_staff).get('/api/metrics/jobs/', HTTP_X_SCHOOL='north').data
+        self.assertEqual(metrics['queued'], 0)
+
+    def test_school_filter_alone_counts_as_unfiltered(self):
+        with tenancy.use('default'):
+            self.assertTrue(school_admin._only_school_filter(Enrollment.all_terms.all()))
+            self.assertFalse(school_admin._only_school_filter(Enrollment.all_terms.filter(grade='A')))
+
+
+HAS_SCHOOL_DB = 'school2' in settings.DATABASES
+
+
+@no_audit
+@skipUnless(HAS_SCHOOL_DB, 'needs the school2 database of schproject.test_settings')
+class SchoolDatabaseTests(TestCase):
+    """A school hosted in a database of its own, driven through the API"""
+    databases = {'default', 'school2'} if HAS_SCHOOL_DB else {'default'}
+
+    def setUp(self):
+        make_school()
+        make_school('east', database='school2')
+        with tenancy.use('east'):
+            self.teacher = make_teacher()
+            self.course = make_course('E101', self.teacher)
+
+    def client_with_token(self, token):
+        client = APIClient(HTTP_X_SCHOOL='east')
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        return client
+
+    def test_register_enroll_grade_and_sync(self):
+        response = APIClient().post('/api/auth/register/student/', {
+            'username': 'eve', 'email': 'eve@example.com', 'first_name': 'Eve', 'last_name': 'East',
+            'password': 'pass12345', 'password_confirm': 'pass12345', 'student_id': 'E1',
+            'phone_number': '555', 'date_of_birth': '2005-01-01', 'address': 'East road',
+            'device': 'phone'},
+            format='json', HTTP_X_SCHOOL='east')
+        self.assertEqual(response.status_code, 201)
+        student = self.client_with_token(response.data['token'])
+        self.assertFalse(Enrollment.all_terms.using('default').exists())
+
+        response = student.post('/api/students/enroll/', {'course_id': self.course.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        enrollment_id = response.data['id']
+        with tenancy.use('east'):
+            teacher = self.client_with_token(issue_token(self.teacher.user).key)
+        response = teacher.put(f'/api/teachers/update-grade/{enrollment_id}/', {'grade': 'A'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        changes = student.get('/api/sync/?since=0').data['changes']
+        self.assertIn(('enrollment', enrollment_id, 'A'),
+                      [(c['model'], c['id'], (c.get('data') or {}).get('grade')) for c in changes])
+        # The token is only good for its own school
+        self.assertEqual(student.get('/api/courses/', HTTP_X_SCHOOL='default').status_code, 401)
@@ -0,0 +1,49 @@
+from django.test import TestCase
+from schoolApp import services, transcripts
+from schoolApp.models import Enrollment, TranscriptSummary
+from .base import make_course, make_school, make_student, make_teacher, no_audit
+
+
+@no_audit
+class TranscriptSummaryTests(TestCase):
+    def setUp(self):
+        make_school()
+        teacher = make_teacher()
+        self.student = make_student(1)
+        self.three = make_course('T300', teacher, credits=3)
+        self.four = make_course('T400', teacher, credits=4)
+
+    def summary(self):
+        return TranscriptSummary.objects.get(student=self.student)
+
+    def enroll(self, course, grade):
+        enrollment, _ = services.enroll(self.student, course.id)
+        return services.set_grade(enrollment, grade)
+
+    def test_gpa_follows_enroll_grade_change_and_unenroll(self):
+        first = self.enroll(self.three, 'A-')
+        self.assertEqual(self.summary().gpa, 3.7)
+
+        second = self.enroll(self.four, 'B+')
+        # (3.7 x 3 + 3.3 x 4) / 7
+        self.assertEqual((self.summary().quality_tenths, self.summary().gpa), (243, 3.47))
+
+        services.set_grade(second, 'C-')
+        self.assertEqual((self.summary().quality_tenths, self.summary().gpa), (179, 2.56))
+
+        services.unenroll(first)
+        self.assertEqual((self.summary().graded_credits, self.summary().gpa), (4, 1.7))
+        services.unenroll(Enrollment.all_terms.get(pk=second.pk))
+        summary = self.summary()
+        self.assertEqual((summary.course_count, summary.quality_tenths, summary.gpa), (0, 0, None))
+
+    def test_repeated_grade_changes_match_a_rebuild(self):
+        enrollment = self.enroll(self.three, 'A-')
+        for grade in ['B+', 'D-', 'C+', 'A-', 'B-'] * 20:
+            services.set_grade(enrollment, grade)
+        running = self.summary()
+        transcripts.rebuild([self.student.id])
+        rebuilt = self.summary()
+        self.assertEqual(running.quality_tenths, rebuilt.quality_tenths)
+        self.assertEqual(rebuilt.quality_tenths, 81)
+        self.assertEqual(rebuilt.gpa, 2.7)
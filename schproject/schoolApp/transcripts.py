@@ -0,0 +1,134 @@
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from .analytics import GRADE_POINTS, load_grades, student_totals
+from .models import Course, Enrollment, EnrollmentArchive, Student, TranscriptSummary
+from . import tenancy
+
+
+def grade_points(grade):
+    """Grade points for a letter grade, or None if it does not count towards GPA"""
+    if not grade:
+        return None
+    return GRADE_POINTS.get(grade.strip().upper())
+
+
+def _tenths(points, credits):
+    """Quality points of a course in tenths, or 0 if it is not graded"""
+    return round(points * 10) * credits if points is not None else 0
+
+
+def _apply(student_id, **deltas):
+    """Add deltas to a student's summary in one UPDATE.
+
+    Must run after the enrollment change is written: a student without a
+    summary row yet gets one rebuilt from the source tables instead.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    changes['updated_at'] = timezone.now()
+    if not TranscriptSummary.objects.filter(student_id=student_id).update(**changes):
+        rebuild([student_id])
+
+
+def _credits(course_id):
+    return Course.all_terms.values_list('credits', flat=True).get(pk=course_id)
+
+
+def record_enrollment(enrollment):
+    credits = _credits(enrollment.course_id)
+    points = grade_points(enrollment.grade)
+    _apply(enrollment.student_id,
+           course_count=1, total_credits=credits,
+           graded_credits=credits if points is not None else 0,
+           quality_tenths=_tenths(points, credits))
+
+
+def record_unenrollment(enrollment):
+    credits = _credits(enrollment.course_id)
+    points = grade_points(enrollment.grade)
+    _apply(enrollment.student_id,
+           course_count=-1, total_credits=-credits,
+           graded_credits=-credits if points is not None else 0,
+           quality_tenths=-_tenths(points, credits))
+
+
+def record_grade_change(enrollment, old_grade):
+    old, new = grade_points(old_grade), grade_points(enrollment.grade)
+    if old == new:
+        return
+    credits = _credits(enrollment.course_id)
+    graded = (new is not None) - (old is not None)
+    _apply(enrollment.student_id,
+           graded_credits=graded * credits,
+           quality_tenths=_tenths(new, credits) - _tenths(old, credits))
+
+
+def rebuild(student_ids=None, batch_size=1000):
+    """Recompute summaries from Enrollment and EnrollmentArchive, one chunk of
+    students per transaction"""
+    if student_ids is None:
+        student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+    rebuilt = 0
+    for start in range(0, len(student_ids), batch_size):
+        chunk = student_ids[start:start + batch_size]
+        enrollments = Enrollment.all_terms.filter(student_id__in=chunk)
+        archived = EnrollmentArchive.objects.filter(student_id__in=chunk)
+        totals = {}
+        for qs in (enrollments, archived):
+            for student_id, count, credits in (qs.values('student_id').order_by()
+                                               .annotate(n=Count('id'), c=Sum('course__credits'))
+                                               .values_list('student_id', 'n', 'c')):
+                n, c = totals.get(student_id, (0, 0))
+                totals[student_id] = (n + count, c + (credits or 0))
+        ids, graded_credits, quality_points = student_totals(load_grades(enrollments, archived))
+        graded = {int(i): (int(c), round(float(q) * 10))
+                  for i, c, q in zip(ids, graded_credits, quality_points)}
+
+        now = timezone.now()
+        summaries = []
+        for student_id in chunk:
+            course_count, total_credits = totals.get(student_id, (0, 0))
+            credits, quality = graded.get(student_id, (0, 0))
+            summaries.append(TranscriptSummary(
+                student_id=student_id,
+                course_count=course_count,
+                total_credits=total_credits,
+                graded_credits=credits,
+                quality_tenths=quality,
+                updated_at=now,
+            ))
+        with tenancy.atomic():
+            TranscriptSummary.objects.filter(student_id__in=chunk).delete()
+            TranscriptSummary.objects.bulk_create(summaries, batch_size=batch_size)
+        rebuilt += len(summaries)
+    return rebuilt
+
+
+def summary_for(student):
+    """The student's summary, building it on first access"""
+    try:
+        return student.transcript
+    except TranscriptSummary.DoesNotExist:
+        rebuild([student.id])
+        return TranscriptSummary.objects.get(student_id=student.id)
+
+
+def history(student):
+    """Every course the student has taken, current and archived terms alike,
+    as dicts ordered by term start"""
+    fields = ('id', 'course_id', 'course__code', 'course__name', 'course__credits',
+              'term__code', 'term__start_date', 'grade', 'enrollment_date')
+    rows = list(Enrollment.all_terms.filter(student=student).values(*fields))
+    rows += EnrollmentArchive.objects.filter(student=student).values(*fields)
+    rows.sort(key=lambda r: (r['term__start_date'] is None, r['term__start_date'] or 0, r['enrollment_date']))
+    return [{
+        'enrollment': r['id'],
+        'course': r['course_id'],
+        'code': r['course__code'],
+        'name': r['course__name'],
+        'credits': r['course__credits'],
+        'term': r['term__code'],
+        'grade': r['grade'],
+        'grade_points': grade_points(r['grade']),
+    } for r in rows]
@@ -87,6 +87,9 @@ urlpatterns = [
     path('students/unenroll/<int:enrollment_id>/', views.unenroll_student, name='unenroll_student'),
     path('students/dashboard/', views.student_dashboard, name='student_dashboard'),
     path('students/<int:student_id>/courses/', views.student_courses, name='student_courses'),
+    path('students/recommendations/', views.my_recommendations, name='my_recommendations'),
+    path('students/autocomplete/', views.autocomplete_students, name='autocomplete_students'),
+    path('students/<int:student_id>/transcript/', views.student_transcript, name='student_transcript'),
     
     # Teacher URLs
     path('teachers/', views.TeacherListView.as_view(), name='teacher_list'),
@@ -103,14 +106,51 @@ urlpatterns = [
     path('courses/create/', views.create_course, name='create_course'),
     path('courses/<int:pk>/', views.CourseDetailView.as_view(), name='course_detail'),
     path('courses/<int:course_id>/students/', views.course_students, name='course_students'),
+    path('courses/<int:course_id>/meetings/', views.course_meetings, name='course_meetings'),
+    path('courses/<int:course_id>/prerequisites/', views.course_prerequisites, name='course_prerequisites'),
+    path('courses/<int:course_id>/recommendations/', views.course_recommendations, name='course_recommendations'),
     path('courses/search/', views.search_courses, name='search_courses'),
+    path('courses/autocomplete/', views.autocomplete_courses, name='autocomplete_courses'),
     
     # Enrollment URLs
     path('enrollments/', views.EnrollmentListView.as_view(), name='enrollment_list'),
     path('enrollments/create/', views.create_enrollment, name='create_enrollment'),
+    path('enrollments/bulk/', views.bulk_create_enrollments, name='bulk_create_enrollments'),
     path('enrollments/<int:pk>/', views.EnrollmentDetailView.as_view(), name='enrollment_detail'),
     
     # Search URLs
     path('search/students/', views.search_students, name='search_students'),
+    
+    # Analytics URLs
+    path('analytics/students/<int:student_id>/gpa/', views.student_gpa, name='student_gpa'),
+    path('analytics/courses/<int:course_id>/grades/', views.course_grade_stats, name='course_grade_stats'),
+    path('analytics/teachers/<int:teacher_id>/grades/', views.teacher_grade_stats, name='teacher_grade_stats'),
+    
+    # Sync URLs
+    path('sync/', views.sync, name='sync'),
+    
+    # Push URLs
+    path('events/', views.event_stream, name='event_stream'),
+    
+    # Batch URLs
+    path('batch/', views.batch, name='batch'),
+    
+    # Background job URLs
+    path('jobs/', views.enqueue_job, name='enqueue_job'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('report-cards/', views.report_cards, name='report_cards'),
+    path('report-cards/<int:job_id>/download/', views.report_card_download, name='report_card_download'),
+    
+    # Audit trail URLs
+    path('audit/students/<int:student_id>/', views.student_audit, name='student_audit'),
+    path('audit/courses/<int:course_id>/', views.course_audit, name='course_audit'),
+    
+    # Operational URLs
+    path('metrics/admission/', views.admission_metrics, name='admission_metrics'),
+    path('metrics/push/', views.push_metrics, name='push_metrics'),
+    path('metrics/jobs/', views.job_metrics, name='job_metrics'),
+    path('metrics/profiles/', views.profile_list, name='profile_list'),
+    path('metrics/profiles/<int:profile_id>/', views.profile_detail, name='profile_detail'),
+    path('metrics/profiles/<int:profile_id>/pstats/', views.profile_download, name='profile_download'),
 ]
 
@@ -0,0 +1,47 @@
+from .models import Student, Teacher
+
+# Attribute on the Django HttpRequest holding (user_id, profile)
+PROFILE_CACHE_ATTR = '_schoolapp_profile'
+# Attribute on the Django HttpRequest holding an identity map shared by
+# every serializer of the request (set on batched sub-requests)
+IDENTITY_MAP_ATTR = '_schoolapp_identity_map'
+
+
+def lookup_profile(user):
+    """Fetch a user's Student or Teacher profile (or None) in one query"""
+    if not user.is_authenticated:
+        return None
+    row = (type(user).objects.select_related('student', 'teacher')
+           .filter(pk=user.pk).first())
+    for attr in ('student', 'teacher'):
+        profile = getattr(row, attr, None) if row else None
+        if profile is not None:
+            # Reuse the authenticated user rather than lazily refetching it
+            profile.user = user
+            return profile
+    return None
+
+
+def get_profile(request):
+    """The caller's Student or Teacher profile, resolved once per request.
+
+    Permission classes and the view share the cached lookup; batched
+    sub-requests inherit it from their parent request.
+    """
+    http_request = getattr(request, '_request', request)
+    cached = getattr(http_request, PROFILE_CACHE_ATTR, None)
+    if cached is not None and cached[0] == request.user.pk:
+        return cached[1]
+    profile = lookup_profile(request.user)
+    setattr(http_request, PROFILE_CACHE_ATTR, (request.user.pk, profile))
+    return profile
+
+
+def get_student(request):
+    profile = get_profile(request)
+    return profile if isinstance(profile, Student) else None
+
+
+def get_teacher(request):
+    profile = get_profile(request)
+    return profile if isinstance(profile, Teacher) else None
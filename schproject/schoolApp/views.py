@@ -1,47 +1,63 @@
+import os
 from django.shortcuts import render
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Student, Teacher, Course, Enrollment
+from django.db.models import Sum
+from django.utils.dateparse import parse_datetime
+from .models import (
+    Student, Teacher, Course, Enrollment, EnrollmentArchive, RosterEntry, ChangeLogEntry, Job,
+    CoursePrerequisite, PrerequisiteClosure, StaffMember, Term,
+)
+from . import (
+    analytics, audit, autocomplete, batch as batching, changefeed, jobs, prereqs, profiling, push,
+    recommendations, schedule, services, tasks, tenancy, transcripts,
+)
+from .util import get_profile, get_student, get_teacher, lookup_profile
+from .admission import admission_controlled, get_controller
+from .authentication import DEVICE_REQUIRED, device_id, issue_token, revoke_token, user_for_key
+from .idempotency import idempotent
 from .serializers import (
     StudentSerializer, TeacherSerializer, CourseSerializer, EnrollmentSerializer,
     StudentCreateSerializer, TeacherCreateSerializer, CourseCreateSerializer,
     EnrollmentCreateSerializer, UserRegistrationSerializer, LoginSerializer,
-    StudentRegistrationSerializer, TeacherRegistrationSerializer
+    StudentRegistrationSerializer, TeacherRegistrationSerializer, RosterEntrySerializer,
+    TranscriptSummarySerializer, MeetingSlotSerializer, AuditEntrySerializer
 )
 
 # Helper function to get user type
-def get_user_type(user):
+def get_user_type(user, profile=None):
     """Determine user type based on profile"""
     if user.is_superuser or user.is_staff:
         return 'admin'
     
-    try:
-        student = Student.objects.get(user=user)
-        return 'student', student.id
-    except Student.DoesNotExist:
-        pass
-    
-    try:
-        teacher = Teacher.objects.get(user=user)
-        return 'teacher', teacher.id
-    except Teacher.DoesNotExist:
-        pass
+    if profile is None:
+        profile = lookup_profile(user)
+    if isinstance(profile, Student):
+        return 'student', profile.id
+    if isinstance(profile, Teacher):
+        return 'teacher', profile.id
     
     return 'admin', None
 
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@idempotent
 def register_student(request):
     """Register a new student with user account"""
+    device = device_id(request)
+    if not device:
+        return Response({'error': DEVICE_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
     serializer = StudentRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         student = serializer.save()
-        token, created = Token.objects.get_or_create(user=student.user)
+        token = issue_token(student.user, device)
+        tasks.init_transcript.enqueue(student.id)
         return Response({
             'token': token.key,
             'user_id': student.user.id,
@@ -57,12 +73,16 @@ def register_student(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@idempotent
 def register_teacher(request):
     """Register a new teacher with user account"""
+    device = device_id(request)
+    if not device:
+        return Response({'error': DEVICE_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
     serializer = TeacherRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         teacher = serializer.save()
-        token, created = Token.objects.get_or_create(user=teacher.user)
+        token = issue_token(teacher.user, device)
         return Response({
             'token': token.key,
             'user_id': teacher.user.id,
@@ -78,12 +98,19 @@ def register_teacher(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@idempotent
 def register_user(request):
     """Register a basic user (admin)"""
+    device = device_id(request)
+    if not device:
+        return Response({'error': DEVICE_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
+        with tenancy.atomic():
+            user = serializer.save()
+            # No Student or Teacher profile to tie the user to this school
+            StaffMember.objects.create(user=user)
+        token = issue_token(user, device)
         return Response({
             'token': token.key,
             'user_id': user.id,
@@ -100,13 +127,17 @@ def register_user(request):
 @permission_classes([permissions.AllowAny])
 def login(request):
     """Single login endpoint for all user types"""
+    device = device_id(request)
+    if not device:
+        return Response({'error': DEVICE_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        token = issue_token(user, device)
         
         # Get user type and profile info
-        user_info = get_user_type(user)
+        profile = lookup_profile(user)
+        user_info = get_user_type(user, profile)
         if len(user_info) == 2:
             user_type, profile_id = user_info
         else:
@@ -126,11 +157,9 @@ def login(request):
         
         # Add specific profile info
         if user_type == 'student':
-            student = Student.objects.get(user=user)
-            response_data['student_id'] = student.student_id
+            response_data['student_id'] = profile.student_id
         elif user_type == 'teacher':
-            teacher = Teacher.objects.get(user=user)
-            response_data['employee_id'] = teacher.employee_id
+            response_data['employee_id'] = profile.employee_id
         
         return Response(response_data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -153,31 +182,25 @@ def logout_user(request):
     elif 'token' in request.data:
         token_key = request.data.get('token')
     
-    # Method 3: If user is authenticated, get from user
-    elif hasattr(request, 'user') and request.user.is_authenticated:
-        try:
-            token_key = request.user.auth_token.key
-        except:
-            pass
+    # Method 3: The token this request authenticated with
+    elif request.auth is not None:
+        token_key = request.auth.key
     
     if not token_key:
         return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        token = Token.objects.get(key=token_key)
-        token.delete()
+    # Only this device's token is revoked; other devices stay signed in
+    if revoke_token(token_key):
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
-    except Token.DoesNotExist:
-        return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        return Response({'error': f'Error logging out: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
 def user_profile(request):
     """Get current user profile with role info"""
     user = request.user
-    user_info = get_user_type(user)
+    profile = get_profile(request)
+    user_info = get_user_type(user, profile)
     
     if len(user_info) == 2:
         user_type, profile_id = user_info
@@ -188,17 +211,12 @@ def user_profile(request):
     profile_data = None
     
     if user_type == 'student':
-        try:
-            student = Student.objects.get(user=user)
-            profile_data = StudentSerializer(student).data
-        except Student.DoesNotExist:
-            pass
+        profile_data = StudentSerializer(profile).data
+        profile_data['transcript'] = TranscriptSummarySerializer(
+            transcripts.summary_for(profile)
+        ).data
     elif user_type == 'teacher':
-        try:
-            teacher = Teacher.objects.get(user=user)
-            profile_data = TeacherSerializer(teacher).data
-        except Teacher.DoesNotExist:
-            pass
+        profile_data = TeacherSerializer(profile).data
     
     return Response({
         'user_type': user_type,
@@ -211,35 +229,19 @@ class IsStudent(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            Student.objects.get(user=request.user)
-            return True
-        except Student.DoesNotExist:
-            return False
+        return get_student(request) is not None
 
 class IsTeacher(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            Teacher.objects.get(user=request.user)
-            return True
-        except Teacher.DoesNotExist:
-            return False
+        return get_teacher(request) is not None
 
 class IsStudentOrTeacher(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            Student.objects.get(user=request.user)
-            return True
-        except Student.DoesNotExist:
-            try:
-                Teacher.objects.get(user=request.user)
-                return True
-            except Teacher.DoesNotExist:
-                return False
+        return get_profile(request) is not None
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -249,18 +251,24 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     
 # Student Views with role-based permissions
 class StudentListView(generics.ListAPIView):
-    queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        # Built per request so it picks up the request's school
+        return Student.objects.with_user().order_by('id')
 
 @api_view(['POST'])
 @permission_classes([IsAdminOrReadOnly])
+@idempotent
 def create_student(request):
     """Create a new student with user account (Admin only)"""
     serializer = StudentCreateSerializer(data=request.data)
     if serializer.is_valid():
         student = serializer.save()
-        token, created = Token.objects.get_or_create(user=student.user)
+        # The staff member's device is not the student's
+        token = issue_token(student.user)
+        tasks.init_transcript.enqueue(student.id)
         
         response_data = StudentSerializer(student).data
         response_data['token'] = token.key
@@ -269,10 +277,12 @@ def create_student(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_queryset(self):
+        return Student.objects.with_user()
+    
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             # Only admin or the student themselves can modify
@@ -281,18 +291,21 @@ class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # Teacher Views with role-based permissions
 class TeacherListView(generics.ListAPIView):
-    queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Teacher.objects.with_user().order_by('id')
 
 @api_view(['POST'])
 @permission_classes([IsAdminOrReadOnly])
+@idempotent
 def create_teacher(request):
     """Create a new teacher with user account (Admin only)"""
     serializer = TeacherCreateSerializer(data=request.data)
     if serializer.is_valid():
         teacher = serializer.save()
-        token, created = Token.objects.get_or_create(user=teacher.user)
+        token = issue_token(teacher.user)
         
         response_data = TeacherSerializer(teacher).data
         response_data['token'] = token.key
@@ -301,22 +314,26 @@ def create_teacher(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class TeacherDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Teacher.objects.with_user()
 
 # Course Views with role-based permissions
 class CourseListView(generics.ListAPIView):
-    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Course.objects.with_teacher().order_by('id')
 
 @api_view(['POST'])
 @permission_classes([IsTeacher])
 def create_course(request):
     """Create a new course (Teachers only)"""
     # Automatically assign the logged-in teacher
-    teacher = Teacher.objects.get(user=request.user)
+    teacher = get_teacher(request)
     
     serializer = CourseCreateSerializer(data=request.data)
     if serializer.is_valid():
@@ -326,90 +343,211 @@ def create_course(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_queryset(self):
+        return Course.objects.with_teacher()
+    
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             # Only the course teacher or admin can modify
             return [IsTeacher()]
         return [permissions.IsAuthenticated()]
+    
+    def perform_update(self, serializer):
+        old_credits = serializer.instance.credits
+        old_term = serializer.instance.term_id
+        old_seats = serializer.instance.max_seats
+        course = serializer.save()
+        if old_seats is not None and (course.max_seats is None or course.max_seats > old_seats):
+            # New seats go to the waitlist first, as in the admin
+            services.promote_waitlist(course.pk)
+        if course.term_id != old_term:
+            services.sync_course_term(course)
+        if course.credits != old_credits:
+            # Credit weights feed every enrolled student's transcript totals
+            transcripts.rebuild(list(
+                Enrollment.all_terms.for_course(course).values_list('student_id', flat=True)
+            ))
+
+@api_view(['PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def course_meetings(request, course_id):
+    """Replace the weekly meeting times of a course (its teacher or admin)"""
+    courses = Course.objects.all()
+    if not request.user.is_staff:
+        courses = courses.for_teacher(request.user)
+    course = courses.filter(id=course_id).first()
+    if course is None:
+        return Response({'error': 'Course not found or you do not have permission'},
+                        status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = MeetingSlotSerializer(data=request.data.get('meetings'), many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    schedule.set_meetings(course, serializer.validated_data)
+    return Response(CourseSerializer(Course.objects.with_teacher().get(id=course.id)).data)
+
+@api_view(['GET', 'PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def course_prerequisites(request, course_id):
+    """Direct and transitive prerequisites of a course; PUT replaces the direct ones
+    (its teacher or admin)"""
+    courses = Course.all_terms.all()
+    if request.method == 'PUT' and not request.user.is_staff:
+        courses = courses.for_teacher(request.user)
+    if not courses.filter(id=course_id).exists():
+        return Response({'error': 'Course not found or you do not have permission'},
+                        status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'PUT':
+        ids = request.data.get('prerequisites')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({'error': 'prerequisites must be a list of course ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if Course.all_terms.filter(id__in=ids).count() != len(set(ids)):
+            return Response({'error': 'Unknown course in prerequisites'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            prereqs.set_prerequisites(course_id, ids)
+        except prereqs.PrerequisiteCycle as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    
+    return Response({
+        'course': course_id,
+        'prerequisites': list(CoursePrerequisite.objects.filter(course_id=course_id)
+                              .order_by('prerequisite_id').values_list('prerequisite_id', flat=True)),
+        'all_prerequisites': list(PrerequisiteClosure.objects.filter(course_id=course_id)
+                                  .order_by('ancestor_id').values_list('ancestor_id', flat=True)),
+    })
 
 # Enrollment Views with role-based permissions
 class EnrollmentListView(generics.ListAPIView):
-    queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Enrollment.objects.with_serialization_graph().order_by('id')
 
 @api_view(['POST'])
 @permission_classes([IsAdminOrReadOnly])
+@idempotent
+@admission_controlled
 def create_enrollment(request):
     """Create a new enrollment (Admin only)"""
     serializer = EnrollmentCreateSerializer(data=request.data)
     if serializer.is_valid():
-        student_id = serializer.validated_data['student'].id
-        course_id = serializer.validated_data['course'].id
+        student = serializer.validated_data['student']
+        course = serializer.validated_data['course']
         
-        if Enrollment.objects.filter(student_id=student_id, course_id=course_id).exists():
-            return Response(
-                {'error': 'Student is already enrolled in this course'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        try:
+            obj, waitlisted = services.enroll(student, course.id)
+        except services.EnrollmentError as e:
+            return Response({'error': str(e)}, status=e.status_code)
         
-        enrollment = serializer.save()
-        response_data = EnrollmentSerializer(enrollment).data
+        if waitlisted:
+            return Response({
+                'message': 'Course is full, student added to waitlist',
+                'waitlist_position': services.waitlist_position(obj)
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        grade = serializer.validated_data.get('grade')
+        if grade:
+            services.set_grade(obj, grade)
+        response_data = EnrollmentSerializer(obj).data
         return Response(response_data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAdminOrReadOnly])
+@idempotent
+@admission_controlled
+def bulk_create_enrollments(request):
+    """Enroll a list of students in one course (Admin only)"""
+    course_id = request.data.get('course_id')
+    student_ids = request.data.get('student_ids')
+    if not course_id or not isinstance(student_ids, list) or not student_ids \
+            or not all(isinstance(i, int) for i in student_ids):
+        return Response({'error': 'course_id and a non-empty list of student_ids are required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    students = Student.objects.filter(id__in=set(student_ids))
+    results = services.enroll_many(students, course_id)
+    response = []
+    for student_id in dict.fromkeys(student_ids):
+        if student_id not in results:
+            response.append({'student': student_id, 'status': 404, 'error': 'Student not found'})
+            continue
+        obj, waitlisted, error = results.pop(student_id)
+        if error is not None:
+            response.append({'student': student_id, 'status': error.status_code, 'error': str(error)})
+        elif waitlisted:
+            response.append({'student': student_id, 'status': 202,
+                             'waitlist_position': services.waitlist_position(obj)})
+        else:
+            response.append({'student': student_id, 'status': 201, 'enrollment': obj.id})
+    return Response({'results': response}, status=status.HTTP_200_OK)
+
 class EnrollmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Enrollment.objects.with_serialization_graph()
+    
+    def perform_update(self, serializer):
+        # Only grade is writable here; keep the roster copy in step
+        if 'grade' in serializer.validated_data:
+            services.set_grade(serializer.instance, serializer.validated_data['grade'])
+    
+    def perform_destroy(self, instance):
+        # Go through the service so the seat is released or handed on
+        services.unenroll(instance)
 
 # Student-specific endpoints
 @api_view(['GET'])
 @permission_classes([IsStudent])
 def my_courses(request):
     """Get courses for the currently logged-in student"""
-    student = Student.objects.get(user=request.user)
-    enrollments = Enrollment.objects.filter(student=student)
+    enrollments = Enrollment.objects.for_student(get_student(request)).with_serialization_graph()
     serializer = EnrollmentSerializer(enrollments, many=True)
     return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsStudent])
+@idempotent
+@admission_controlled
 def enroll_student(request):
     """Enroll the currently logged-in student in a course"""
-    student = Student.objects.get(user=request.user)
+    student = get_student(request)
     course_id = request.data.get('course_id')
     
     if not course_id:
         return Response({'error': 'Course ID is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        course = Course.objects.get(id=course_id)
-    except Course.DoesNotExist:
-        return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        obj, waitlisted = services.enroll(student, course_id)
+    except services.EnrollmentError as e:
+        return Response({'error': str(e)}, status=e.status_code)
     
-    if Enrollment.objects.filter(student=student, course=course).exists():
-        return Response(
-            {'error': 'Already enrolled in this course'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    if waitlisted:
+        return Response({
+            'message': 'Course is full, added to waitlist',
+            'waitlist_position': services.waitlist_position(obj)
+        }, status=status.HTTP_202_ACCEPTED)
     
-    enrollment = Enrollment.objects.create(student=student, course=course)
-    serializer = EnrollmentSerializer(enrollment)
+    serializer = EnrollmentSerializer(obj)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 @api_view(['DELETE'])
 @permission_classes([IsStudent])
+@admission_controlled
 def unenroll_student(request, enrollment_id):
     """Unenroll the currently logged-in student from a course"""
-    student = Student.objects.get(user=request.user)
+    student = get_student(request)
     try:
-        enrollment = Enrollment.objects.get(id=enrollment_id, student=student)
-        enrollment.delete()
+        enrollment = Enrollment.objects.for_student(student).get(id=enrollment_id)
+        services.unenroll(enrollment)
         return Response({'message': 'Successfully unenrolled'}, status=status.HTTP_200_OK)
     except Enrollment.DoesNotExist:
         return Response({'error': 'Enrollment not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -419,9 +557,10 @@ def unenroll_student(request, enrollment_id):
 @permission_classes([IsTeacher])
 def my_students(request):
     """Get students for courses taught by the currently logged-in teacher"""
-    teacher = Teacher.objects.get(user=request.user)
-    courses = Course.objects.filter(teacher=teacher)
-    enrollments = Enrollment.objects.filter(course__in=courses)
+    if request.GET.get('compact'):
+        entries = RosterEntry.objects.for_teacher(request.user)
+        return Response(RosterEntrySerializer(entries, many=True).data)
+    enrollments = Enrollment.objects.for_teacher(request.user).with_serialization_graph()
     serializer = EnrollmentSerializer(enrollments, many=True)
     return Response(serializer.data)
 
@@ -429,25 +568,25 @@ def my_students(request):
 @permission_classes([IsTeacher])
 def my_courses_teacher(request):
     """Get courses taught by the currently logged-in teacher"""
-    teacher = Teacher.objects.get(user=request.user)
-    courses = Course.objects.filter(teacher=teacher)
+    courses = Course.objects.for_teacher(request.user).with_teacher()
     serializer = CourseSerializer(courses, many=True)
     return Response(serializer.data)
 
 @api_view(['PUT'])
 @permission_classes([IsTeacher])
+@idempotent
 def update_grade(request, enrollment_id):
     """Update grade for an enrollment (teachers only for their courses)"""
-    teacher = Teacher.objects.get(user=request.user)
     try:
-        enrollment = Enrollment.objects.get(id=enrollment_id, course__teacher=teacher)
+        # Grades of the previous term may still be entered until it is closed
+        enrollment = (Enrollment.all_terms.open_terms().for_teacher(request.user)
+                      .with_serialization_graph().get(id=enrollment_id))
         
         grade = request.data.get('grade')
         if not grade:
             return Response({'error': 'Grade is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        enrollment.grade = grade
-        enrollment.save()
+        services.set_grade(enrollment, grade)
         
         serializer = EnrollmentSerializer(enrollment)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -463,15 +602,18 @@ def update_grade(request, enrollment_id):
 @permission_classes([IsStudent])
 def student_dashboard(request):
     """Get dashboard data for student"""
-    student = Student.objects.get(user=request.user)
-    enrollments = Enrollment.objects.filter(student=student)
+    student = get_student(request)
+    enrollments = Enrollment.objects.for_student(student).with_serialization_graph()
+    # One identity map for the whole response: both lists repeat the same courses
+    context = {'request': request}
     
     dashboard_data = {
         'student_info': StudentSerializer(student).data,
+        'transcript': TranscriptSummarySerializer(transcripts.summary_for(student)).data,
         'total_courses': enrollments.count(),
-        'enrollments': EnrollmentSerializer(enrollments, many=True).data,
+        'enrollments': EnrollmentSerializer(enrollments, many=True, context=context).data,
         'recent_enrollments': EnrollmentSerializer(
-            enrollments.order_by('-enrollment_date')[:5], many=True
+            enrollments.newest_first()[:5], many=True, context=context
         ).data
     }
     
@@ -481,17 +623,18 @@ def student_dashboard(request):
 @permission_classes([IsTeacher])
 def teacher_dashboard(request):
     """Get dashboard data for teacher"""
-    teacher = Teacher.objects.get(user=request.user)
-    courses = Course.objects.filter(teacher=teacher)
-    enrollments = Enrollment.objects.filter(course__in=courses)
+    teacher = get_teacher(request)
+    courses = Course.objects.taught_by(teacher).with_teacher()
+    enrollments = Enrollment.objects.taught_by(teacher).with_serialization_graph()
+    context = {'request': request}
     
     dashboard_data = {
         'teacher_info': TeacherSerializer(teacher).data,
         'total_courses': courses.count(),
-        'total_students': enrollments.count(),
-        'courses': CourseSerializer(courses, many=True).data,
+        'total_students': courses.aggregate(total=Sum('enrolled_count'))['total'] or 0,
+        'courses': CourseSerializer(courses, many=True, context=context).data,
         'recent_enrollments': EnrollmentSerializer(
-            enrollments.order_by('-enrollment_date')[:10], many=True
+            enrollments.newest_first()[:10], many=True, context=context
         ).data
     }
     
@@ -501,49 +644,55 @@ def teacher_dashboard(request):
 @api_view(['GET'])
 def student_courses(request, student_id):
     """Get all courses for a specific student"""
-    try:
-        student = Student.objects.get(id=student_id)
-        enrollments = Enrollment.objects.filter(student=student)
-        serializer = EnrollmentSerializer(enrollments, many=True)
-        return Response(serializer.data)
-    except Student.DoesNotExist:
+    enrollments = list(Enrollment.objects.for_student(student_id).with_serialization_graph())
+    if not enrollments and not Student.objects.filter(id=student_id).exists():
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = EnrollmentSerializer(enrollments, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+def student_transcript(request, student_id):
+    """Full course history of a student across current and archived terms"""
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'student': student_id,
+        'summary': TranscriptSummarySerializer(transcripts.summary_for(student)).data,
+        'courses': transcripts.history(student),
+    })
 
 @api_view(['GET'])
 def course_students(request, course_id):
     """Get all students enrolled in a specific course"""
-    try:
-        course = Course.objects.get(id=course_id)
-        enrollments = Enrollment.objects.filter(course=course)
-        serializer = EnrollmentSerializer(enrollments, many=True)
-        return Response(serializer.data)
-    except Course.DoesNotExist:
+    if request.GET.get('compact'):
+        # Roster rows carry no school; the course decides whose they are
+        if not Course.objects.filter(id=course_id).exists():
+            return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(RosterEntrySerializer(RosterEntry.objects.for_course(course_id), many=True).data)
+    rows = list(Enrollment.objects.roster(course_id))
+    # An empty roster is the only case that needs a second query
+    if not rows and not Course.objects.filter(id=course_id).exists():
         return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(EnrollmentSerializer(rows, many=True).data)
 
 @api_view(['GET'])
 def courses_by_teacher(request, teacher_id):
     """Get all courses taught by a specific teacher"""
-    try:
-        teacher = Teacher.objects.get(id=teacher_id)
-        courses = Course.objects.filter(teacher=teacher)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data)
-    except Teacher.DoesNotExist:
+    courses = list(Course.objects.taught_by(teacher_id).with_teacher())
+    if not courses and not Teacher.objects.filter(id=teacher_id).exists():
         return Response({'error': 'Teacher not found'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = CourseSerializer(courses, many=True)
+    return Response(serializer.data)
 
 # Search endpoints
 @api_view(['GET'])
 def search_courses(request):
     """Search courses by name or code"""
     query = request.GET.get('q', '')
+    courses = Course.objects.with_teacher()
     if query:
-        courses = Course.objects.filter(
-            name__icontains=query
-        ) | Course.objects.filter(
-            code__icontains=query
-        )
-    else:
-        courses = Course.objects.all()
+        courses = courses.search(query)
     
     serializer = CourseSerializer(courses, many=True)
     return Response(serializer.data)
@@ -553,16 +702,294 @@ def search_courses(request):
 def search_students(request):
     """Search students by name or student ID (Teachers only)"""
     query = request.GET.get('q', '')
+    students = Student.objects.with_user()
     if query:
-        students = Student.objects.filter(
-            user__first_name__icontains=query
-        ) | Student.objects.filter(
-            user__last_name__icontains=query
-        ) | Student.objects.filter(
-            student_id__icontains=query
-        )
-    else:
-        students = Student.objects.all()
+        students = students.search(query)
     
     serializer = StudentSerializer(students, many=True)
     return Response(serializer.data)
+
+@api_view(['GET'])
+def autocomplete_courses(request):
+    """Compact [id, label] matches for a course code or name prefix"""
+    return Response({'results': autocomplete.complete('course', request.GET.get('q', ''))})
+
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def autocomplete_students(request):
+    """Compact [id, label] matches for a student name or ID prefix (Teachers only)"""
+    return Response({'results': autocomplete.complete('student', request.GET.get('q', ''))})
+
+# Recommendation endpoints
+@api_view(['GET'])
+def course_recommendations(request, course_id):
+    """Courses most often taken by students of this course"""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    # Neighbour rows carry no school; the course decides whose they are
+    if not Course.all_terms.filter(id=course_id).exists():
+        return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'course': course_id, 'recommendations': recommendations.for_course(course_id, limit)})
+
+@api_view(['GET'])
+@permission_classes([IsStudent])
+def my_recommendations(request):
+    """Course recommendations for the currently logged-in student"""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'recommendations': recommendations.for_student(get_student(request), limit)})
+
+# Grade analytics endpoints: every term, hot and archived, as in transcripts
+@api_view(['GET'])
+def student_gpa(request, student_id):
+    """Credit-weighted GPA for a specific student"""
+    if not Student.objects.filter(id=student_id).exists():
+        return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+    table = analytics.load_grades(Enrollment.all_terms.for_student(student_id),
+                                  EnrollmentArchive.objects.filter(student_id=student_id))
+    gpa, credits = analytics.student_gpa(table).get(student_id, (None, 0))
+    return Response({'student': student_id, 'gpa': gpa, 'graded_credits': credits,
+                     'graded_courses': len(table)})
+
+@api_view(['GET'])
+def course_grade_stats(request, course_id):
+    """Grade distribution, average and percentiles for a course"""
+    if not Course.all_terms.filter(id=course_id).exists():
+        return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+    table = analytics.load_grades(Enrollment.all_terms.for_course(course_id),
+                                  EnrollmentArchive.objects.filter(course_id=course_id))
+    return Response({'course': course_id, **analytics.group_report(table, by='course')})
+
+@api_view(['GET'])
+def teacher_grade_stats(request, teacher_id):
+    """Grade distribution, average and percentiles across a teacher's courses"""
+    if not Teacher.objects.filter(id=teacher_id).exists():
+        return Response({'error': 'Teacher not found'}, status=status.HTTP_404_NOT_FOUND)
+    table = analytics.load_grades(Enrollment.all_terms.taught_by(teacher_id),
+                                  EnrollmentArchive.objects.filter(course__teacher_id=teacher_id))
+    return Response({'teacher': teacher_id, **analytics.group_report(table, by='teacher')})
+
+# Batched reads
+@api_view(['POST'])
+def batch(request):
+    """Run several GET calls to this API with one authentication"""
+    specs = request.data.get('requests')
+    if not isinstance(specs, list) or not specs:
+        return Response({'error': 'A non-empty list of requests is required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(specs) > batching.MAX_SUB_REQUESTS:
+        return Response({'error': f'At most {batching.MAX_SUB_REQUESTS} requests per batch'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({'responses': batching.run_batch(request, specs)})
+
+# Delta sync for offline-capable clients
+def _sync_sources():
+    # Built per request: managers scope to the school active at call time
+    return {
+        'course': (Course.objects.with_teacher(), CourseSerializer),
+        'enrollment': (Enrollment.objects.with_serialization_graph(),
+                       EnrollmentSerializer),
+        'student': (Student.objects.with_user(), StudentSerializer),
+        'teacher': (Teacher.objects.with_user(), TeacherSerializer),
+    }
+
+@api_view(['GET'])
+def sync(request):
+    """Changes visible to the caller since a sequence number"""
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return Response({'error': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    compacted = changefeed.compacted_through()
+    if since < compacted:
+        # The log no longer covers this cursor; the client must refetch everything
+        latest = max(changefeed.latest_seq(), compacted)
+        return Response({'reset': True, 'seq': latest, 'has_more': False, 'changes': []})
+    
+    entries, next_seq, has_more = changefeed.changes_since(request.user, get_profile(request), since)
+    
+    # Load the current state of every upserted object with one query per model
+    wanted = {}
+    for entry in entries:
+        if entry.action != ChangeLogEntry.DELETED:
+            wanted.setdefault(entry.model, set()).add(entry.object_id)
+    current = {}
+    sources = _sync_sources()
+    for model, ids in wanted.items():
+        queryset, serializer_class = sources[model]
+        for obj in queryset.filter(pk__in=ids):
+            current[(model, obj.pk)] = serializer_class(obj).data
+    
+    changes = []
+    for entry in entries:
+        data = current.get((entry.model, entry.object_id))
+        deleted = entry.action == ChangeLogEntry.DELETED or data is None
+        changes.append({
+            'seq': entry.seq,
+            'model': entry.model,
+            'id': entry.object_id,
+            'action': 'delete' if deleted else 'upsert',
+            'data': None if deleted else data,
+        })
+    return Response({'reset': False, 'seq': next_seq, 'has_more': has_more, 'changes': changes})
+
+# Push channel (served by the ASGI app; plain async Django view, not DRF)
+async def _stream_user(request):
+    """Token from the Authorization header or ?token= (EventSource cannot set headers)"""
+    auth_header = request.headers.get('Authorization', '')
+    key = auth_header[6:] if auth_header.startswith('Token ') else request.GET.get('token')
+    if key:
+        return await sync_to_async(user_for_key)(key)
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+async def event_stream(request):
+    """Server-sent events for grade and enrollment changes of the current user"""
+    user = await _stream_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response = StreamingHttpResponse(push.stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Audit trail of grade and enrollment changes (see schoolApp/audit.py)
+def _audit_response(request, **filters):
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 500)
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return Response({'error': 'limit and before must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    since = request.GET.get('since')
+    if since and parse_datetime(since) is None:
+        return Response({'error': 'since must be an ISO 8601 datetime'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    entries = list(audit.history(action=request.GET.get('action'), since=since and parse_datetime(since),
+                                 before=before, limit=limit, **filters))
+    return Response({
+        'results': AuditEntrySerializer(entries, many=True).data,
+        'next_before': entries[-1].id if len(entries) == limit else None,
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def student_audit(request, student_id):
+    """Grade and enrollment history of a student, newest first (Staff only)"""
+    return _audit_response(request, student_id=student_id)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def course_audit(request, course_id):
+    """Grade and enrollment history of a course, newest first (Staff only)"""
+    return _audit_response(request, course_id=course_id)
+
+# Operational endpoints
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def admission_metrics(request):
+    """Queue depth and wait times of the write admission queue (Staff only)"""
+    return Response(get_controller().metrics())
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def job_metrics(request):
+    """Background job queue depth, latency and throughput of the school (Staff only)"""
+    return Response(jobs.stats(school_id=tenancy.current_id()))
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def enqueue_job(request):
+    """Schedule a registered background task (Staff only)"""
+    name = request.data.get('task')
+    task = jobs.get_task(name)
+    if task is None:
+        return Response({'error': f'Unknown task {name!r}'}, status=status.HTTP_400_BAD_REQUEST)
+    job = task.enqueue(*request.data.get('args', []), **request.data.get('kwargs', {}))
+    return Response({'id': job.id, 'task': job.task, 'status': job.status},
+                    status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def job_detail(request, job_id):
+    """Status and result of a background job (Staff only)"""
+    # Jobs live in the registry database; each belongs to the school that queued it
+    job = Job.objects.filter(id=job_id, school_id=tenancy.current_id()).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'id': job.id, 'task': job.task, 'status': job.status, 'attempts': job.attempts,
+        'created_at': job.created_at, 'started_at': job.started_at,
+        'finished_at': job.finished_at, 'result': job.result, 'error': job.last_error or None,
+    })
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def report_cards(request):
+    """Queue PDF report cards (or transcripts) for the school as a zip (Staff only)"""
+    term = request.data.get('term')
+    if term and not Term.objects.filter(code=term).exists():
+        return Response({'error': f'Unknown term {term!r}'}, status=status.HTTP_400_BAD_REQUEST)
+    student_ids = request.data.get('student_ids')
+    if student_ids is not None and (not isinstance(student_ids, list)
+                                    or not all(isinstance(i, int) for i in student_ids)):
+        return Response({'error': 'student_ids must be a list of integers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    job = tasks.generate_report_cards.enqueue(
+        term=term, transcripts=bool(request.data.get('transcripts')), student_ids=student_ids)
+    return Response({'id': job.id, 'task': job.task, 'status': job.status},
+                    status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def report_card_download(request, job_id):
+    """The zip produced by a finished report card job (Staff only)"""
+    job = Job.objects.filter(id=job_id, task=tasks.generate_report_cards.name,
+                             school_id=tenancy.current_id()).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != Job.DONE:
+        return Response({'error': f'Job is {job.status}'}, status=status.HTTP_409_CONFLICT)
+    path = job.result['output']
+    try:
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path),
+                            content_type='application/zip')
+    except FileNotFoundError:
+        return Response({'error': 'Output no longer exists'}, status=status.HTTP_410_GONE)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def push_metrics(request):
+    """Open push connections and fan-out latency (Staff only)"""
+    return Response(push.get_broker().metrics())
+
+# Request profiles captured by schoolApp.profiling.ProfilingMiddleware
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_list(request):
+    """Recently captured request profiles, newest first (Staff only)"""
+    return Response([profiling.summary(p) for p in profiling.get_store().list()])
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_detail(request, profile_id):
+    """Top functions, allocations and slowest queries of one profile (Staff only)"""
+    profile = profiling.get_store().get(profile_id)
+    if profile is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(profiling.detail(profile))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_download(request, profile_id):
+    """Raw cProfile stats of one profile as a .pstats file (Staff only)"""
+    profile = profiling.get_store().get(profile_id)
+    if profile is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    response = HttpResponse(profile['pstats'], content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="profile-{profile_id}.pstats"'
+    return response
@@ -3,6 +3,9 @@ ASGI config for schproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server (e.g. ``uvicorn schproject.asgi:application``) so the
+long-lived /api/events/ push streams do not tie up worker threads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
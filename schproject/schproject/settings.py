@@ -42,7 +42,7 @@ INSTALLED_APPS = [
 # Update REST_FRAMEWORK configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'schoolApp.authentication.ExpiringTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -54,15 +54,39 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Per-device API tokens with sliding expiry (see schoolApp/authentication.py);
+# run `manage.py purge_tokens` periodically to drop expired rows
+AUTH_TOKEN = {
+    'TTL_DAYS': 30,
+    'RENEW_AFTER_SECONDS': 3600,
+    'MAX_PER_USER': 10,
+}
+
+# Admission control for write endpoints during registration spikes
+# (see schoolApp/admission.py for the defaults)
+ADMISSION_CONTROL = {
+    'MAX_CONCURRENT': 8,
+    'MAX_QUEUE': 64,
+    'QUEUE_TIMEOUT': 2.0,
+    'RATE': 2.0,
+    'BURST': 5,
+}
+
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'schoolApp.tenancy.TenantMiddleware',
+    'schoolApp.audit.AuditMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'schoolApp.tenancy.MembershipMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'schoolApp.routing.ReplicaRoutingMiddleware',
+    'schoolApp.sqllog.SlowQueryMiddleware',
+    'schoolApp.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'schproject.urls'
@@ -95,7 +119,112 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': 'localhost',
         'PORT': '3306',
-    }
+    },
+    # Read replicas of 'default'; list their aliases in DATABASE_REPLICAS below.
+    # 'replica1': {
+    #     'ENGINE': 'django.db.backends.mysql',
+    #     'NAME': 'schooldb',
+    #     'USER': 'readonly',
+    #     'PASSWORD': '',
+    #     'HOST': 'replica1.local',
+    #     'PORT': '3306',
+    #     'TEST': {'MIRROR': 'default'},
+    # },
+    # A database for schools placed off 'default' (School.database); set one up
+    # with `manage.py create_school <slug> <name> --database school_db2`.
+    # 'school_db2': {
+    #     'ENGINE': 'django.db.backends.mysql',
+    #     'NAME': 'schooldb2',
+    #     'USER': 'root',
+    #     'PASSWORD': '',
+    #     'HOST': 'db2.local',
+    #     'PORT': '3306',
+    # },
+}
+
+DATABASE_ROUTERS = ['schoolApp.tenancy.TenantRouter', 'schoolApp.routing.ReplicaRouter']
+
+# Schools (tenants) are resolved per request from the X-School header or the
+# host name (see schoolApp/tenancy.py), falling back to DEFAULT_SCHOOL
+TENANCY = {
+    'HEADER': 'X-School',
+    'DEFAULT_SCHOOL': 'default',
+    'CACHE_SECONDS': 60,
+}
+
+# Server-sent events at /api/events/ (see schoolApp/push.py). LocalBroker only
+# reaches clients of the same process; use schoolApp.push.ChangeLogBroker when
+# running several ASGI workers.
+PUSH = {
+    'BACKEND': 'schoolApp.push.LocalBroker',
+    'HEARTBEAT_SECONDS': 15,
+}
+
+# Per-view SQL fingerprint statistics (see schoolApp/sqllog.py); queries
+# slower than SLOW_MS are logged. Report with `manage.py sql_report`.
+SQL_LOG = {
+    'ENABLED': True,
+    'SLOW_MS': 100,
+    'FLUSH_SECONDS': 30,
+}
+
+# On-demand request profiling (see schoolApp/profiling.py). Staff trigger it
+# with an X-Profile header or ?profile=1; SAMPLE_EVERY > 0 also samples 1 in N.
+# Results: /api/metrics/profiles/
+PROFILING = {
+    'SAMPLE_EVERY': 0,
+    'BUFFER_SIZE': 20,
+}
+
+# "Students also took" neighbours (see schoolApp/recommendations.py), rebuilt
+# offline by the build_recommendations command or task
+RECOMMENDATIONS = {
+    'TOP_K': 10,
+    'MIN_SHARED': 3,
+}
+
+# In-process prefix index behind the autocomplete endpoints (see
+# schoolApp/autocomplete.py); each process refreshes its copy this often
+AUTOCOMPLETE = {
+    'REFRESH_SECONDS': 300,
+    'MAX_KEYS': 500000,
+}
+
+# Grade/enrollment audit trail (see schoolApp/audit.py). Entries are journaled
+# to SPOOL_DIR on commit and inserted in batches; `manage.py flush_audit`
+# forces a flush, including journals left by crashed processes.
+AUDIT_LOG = {
+    'BATCH_SIZE': 500,
+    'FLUSH_SECONDS': 5,
+    'SPOOL_DIR': str(BASE_DIR / 'var' / 'audit'),
+}
+
+# PDF report cards and transcripts (see schoolApp/reportcards.py), rendered in
+# a process pool by `manage.py generate_report_cards` or POST /api/report-cards/
+REPORT_CARDS = {
+    'WORKERS': None,  # one render process per CPU
+    'OUTPUT_DIR': str(BASE_DIR / 'var' / 'reportcards'),
+}
+
+# Safe-method schoolApp requests read from these aliases (see schoolApp/routing.py)
+DATABASE_REPLICAS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 5,
+    'HEALTH_CHECK_INTERVAL': 10,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # First responses to requests carrying an Idempotency-Key (schoolApp/idempotency.py).
+    # Bounded: the oldest keys are culled once MAX_ENTRIES is reached.
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
 # Password validation
@@ -0,0 +1,38 @@
+"""Settings for running the test suite without MySQL:
+python manage.py test --settings=schproject.test_settings"""
+import os
+import tempfile
+from .settings import *  # noqa: F401,F403
+
+_TEST_DIR = os.path.join(tempfile.gettempdir(), 'schoolapp-tests')
+os.makedirs(_TEST_DIR, exist_ok=True)
+
+# 'replica' is a separate database rather than a test mirror of 'default', so
+# tests can tell which of the two a read went to. Tests that need it turn it on
+# with override_settings(DATABASE_REPLICAS=...).
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(_TEST_DIR, 'default.sqlite3'),
+        'TEST': {'NAME': os.path.join(_TEST_DIR, 'test-default.sqlite3')},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(_TEST_DIR, 'replica.sqlite3'),
+        'TEST': {'NAME': os.path.join(_TEST_DIR, 'test-replica.sqlite3')},
+    },
+    # A school database of its own, for schools created with database='school2'
+    'school2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(_TEST_DIR, 'school2.sqlite3'),
+        'TEST': {'NAME': os.path.join(_TEST_DIR, 'test-school2.sqlite3')},
+    },
+}
+DATABASE_REPLICAS = {**DATABASE_REPLICAS, 'ALIASES': []}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+AUDIT_LOG = {**AUDIT_LOG, 'SPOOL_DIR': os.path.join(_TEST_DIR, 'audit'), 'FSYNC': False}
+REPORT_CARDS = {**REPORT_CARDS, 'OUTPUT_DIR': os.path.join(_TEST_DIR, 'reportcards')}
+AUTOCOMPLETE = {**AUTOCOMPLETE, 'WARM_ON_STARTUP': False}
+# Its background flush would write to the test database from another thread
+SQL_LOG = {**SQL_LOG, 'ENABLED': False}